@@ -1,7 +1,10 @@
 import logging
 import os
+import re
+import time
+import uuid
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request
 from dotenv import load_dotenv
 
 from models.account_model import AccountModel
@@ -11,33 +14,107 @@ from services.account_service import AccountService
 from services.ping_service import PingService
 from services.transaction_service import TransactionService
 from services.cashin_service import CashinService
+from services.cashin_job_service import CashinJobService
+from services.cashin_batch_service import CashinBatchError, CashinBatchService, read_cashin_rows
 from services.payment_status_service import PaymentStatusService
+from services.transaction_tracker import TransactionTracker
+from lazy_service import LazyService
+from configuration import get_configuration
+from deadline import Deadline
+import metrics
+from sdk_logging import request_logger
+from json_serializer import dumps, get_encoder
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Initialize services. Each one is built on first use, so importing the app
+# stays cheap and routes that are never called never load their service.
+ping_service = LazyService(PingService)
+account_service = LazyService(AccountService)
+transaction_service = LazyService(TransactionService)
+payment_status_service = LazyService(PaymentStatusService)
+transaction_tracker = LazyService(lambda: TransactionTracker(payment_status_service=payment_status_service))
 
-# Initialize services
-ping_service = PingService()
-account_service = AccountService()
-transaction_service = TransactionService()
-cashin_service = CashinService()
-payment_status_service = PaymentStatusService()
+def track_collection(collect_data):
+    """
+    Collect listener handing every new transaction to the status tracker; the ASGI app's client uses it too.
+    """
+    transaction_tracker.track_collection(collect_data)
+
+def _create_cashin_service():
+    service = CashinService()
+    service.add_collect_listener(track_collection)
+    return service
+
+cashin_service = LazyService(_create_cashin_service)
+cashin_job_service = LazyService(lambda: CashinJobService(cashin_service=cashin_service))
+
+# Compiled once: turns a PaymentStatusModel into a JSON-ready dict without per-field checks
+_encode_payment_status = get_encoder(PaymentStatusModel)
+
+def _json_response(payload, status_code=200):
+    """
+    Build a JSON response with the shared serializer, which writes bytes directly.
+    """
+    return Response(dumps(payload), status=status_code, mimetype='application/json')
+
+def _cashin_deadline(headers):
+    """
+    Build the time budget of a synchronous cashin: the configured deadline, or the
+    X-Request-Timeout header (seconds) when the caller gives up sooner.
+    """
+    budget = get_configuration().cashin_deadline
+    try:
+        requested = float(headers.get('X-Request-Timeout', ''))
+        if 0 < requested < budget:
+            budget = requested
+    except ValueError:
+        pass
+    return Deadline(budget)
+
+@app.before_request
+def _start_route_metrics():
+    if request.url_rule is None or request.url_rule.rule == '/metrics':
+        return
+    g.metrics_route = request.url_rule.rule
+    g.metrics_start = time.perf_counter()
+    metrics.ROUTE_IN_FLIGHT.labels(g.metrics_route).inc()
+
+@app.after_request
+def _record_route_metrics(response):
+    # Streamed responses are measured up to the first byte
+    route = g.get('metrics_route')
+    if route is not None:
+        metrics.ROUTE_LATENCY.labels(route, request.method).observe(time.perf_counter() - g.metrics_start)
+        metrics.ROUTE_RESPONSES.labels(route, request.method, str(response.status_code)).inc()
+    return response
+
+@app.teardown_request
+def _finish_route_metrics(exc):
+    route = g.pop('metrics_route', None)
+    if route is not None:
+        metrics.ROUTE_IN_FLIGHT.labels(route).dec()
 
 # Routes
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Expose latency histograms, status counters and in-flight gauges in the Prometheus text format.
+    """
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/api/ping', methods=['GET'])
 def ping():
      """
      Check the availability of the Smobilpay API.
      """
-     logging.info("Received request on /api/ping")
+     request_logger.info("Received request on /api/ping")
      response = ping_service.ping()
 
-     if isinstance(response, PingModel):
-         logging.info(f"Ping successful: {response}")
+     if isinstance(response, PingModel) and response.error is None:
+         request_logger.info("Ping successful: %s", response)
          return jsonify({
              "status": "success",
              "time": response.time,
@@ -54,11 +131,11 @@ def get_account_info():
      """
      Retrieve account information from the Smobilpay API.
      """
-     logging.info("Received request on /api/account")
+     request_logger.info("Received request on /api/account")
      account_info = account_service.fetch_account_info()
 
      if isinstance(account_info, AccountModel):
-         logging.info(f"Account information fetched: {account_info}")
+         request_logger.info("Account information fetched: %s", account_info)
          return jsonify({
              "status": "success",
              "balance": account_info.balance,
@@ -72,12 +149,21 @@ def get_account_info():
 def create_cashin():
     """
     Create and process a new cashin request.
+
+    Query Parameters:
+    - async: When "true", validate the cashin, queue it and return 202 with a job ID
+      right away. Poll /api/cashin/<job_id> for the outcome.
+
+    Headers:
+    - X-Request-Timeout: Seconds the caller will wait; shortens the synchronous cashin's deadline.
     """
     try:
         data = request.get_json()
         if not data:
             return jsonify({"status": "error", "message": "Invalid request format"}), 400
-        result = cashin_service.process_cashin(data)
+        if request.args.get('async', 'false').lower() == 'true':
+            return _submit_cashin_job(data)
+        result = cashin_service.process_cashin(data, deadline=_cashin_deadline(request.headers))
         if result['status'] == 'success':
             return jsonify(result), 201
         else:
@@ -86,6 +172,132 @@ def create_cashin():
         logging.error(f"Error processing cashin request: {str(e)}")
         return jsonify({"status": "error", "message": "An error occurred while processing the cashin"}), 500
 
+def _submit_cashin_job(data):
+    result = cashin_job_service.submit(data)
+    if result['status'] == 'accepted':
+        job = result['job']
+        response = jsonify({
+            "status": "accepted",
+            "message": "Cashin accepted for processing",
+            "job_id": job.job_id,
+            "trid": job.trid,
+            "status_url": f"/api/cashin/{job.job_id}"
+        })
+        response.headers['Location'] = f"/api/cashin/{job.job_id}"
+        return response, 202
+    elif result['status'] == 'busy':
+        return jsonify({"status": "error", "message": result['message']}), 503
+    else:
+        return jsonify(result), 400
+
+@app.route('/api/cashin/<job_id>', methods=['GET'])
+def get_cashin_job(job_id):
+    """
+    Retrieve the outcome of a cashin submitted with async=true.
+    """
+    job = cashin_job_service.get_job(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": f"Unknown or expired cashin job: {job_id}"}), 404
+    return jsonify({"status": "success", "job": job.to_dict()}), 200
+
+_BATCH_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+def _cashin_batch_path(batch_id):
+    return os.path.join(cashin_service.config.cashin_batch_dir, f"{batch_id}.db")
+
+@app.route('/api/cashin/batch', methods=['POST'])
+def create_cashin_batch():
+    """
+    Pay many cashins in one request, with progress kept so the batch can be resumed.
+
+    Body: CSV (text/csv) or NDJSON (application/x-ndjson) with one cashin per row, or
+    JSON {"cashins": [...]}. Each row needs the fields of POST /api/cashin.
+
+    Progress is kept in the local cashin_batch_dir, so resuming and the running-batch
+    lock only hold on a single instance. Use cashin_batch.py for large payouts.
+
+    Query Parameters:
+    - batch_id: Identifies the batch; send the same body with the same batch_id to resume
+      it. Finished rows are not paid again. A new ID is generated when omitted.
+    - concurrency: Maximum number of cashins processed in parallel (optional, capped by configuration)
+    - retry_failed: When "true", send again the rows that failed before any payment was requested
+
+    Returns:
+    - NDJSON stream with one line per row in completion order, followed by a summary line
+      with the counts and throughput. The X-Batch-Id header holds the batch ID.
+    """
+    batch_id = request.args.get('batch_id') or uuid.uuid4().hex
+    if not _BATCH_ID.match(batch_id):
+        return jsonify({"status": "error", "message": "'batch_id' may only contain letters, digits, '-' and '_'"}), 400
+    config = cashin_service.config
+    try:
+        concurrency = int(request.args.get('concurrency', config.cashin_batch_concurrency))
+    except ValueError:
+        concurrency = 0
+    if concurrency < 1:
+        return jsonify({"status": "error", "message": "'concurrency' must be a positive integer"}), 400
+    concurrency = min(concurrency, config.cashin_batch_concurrency)
+
+    try:
+        if request.mimetype == 'application/json':
+            data = request.get_json(silent=True)
+            rows = data.get('cashins') if isinstance(data, dict) else data
+            if not isinstance(rows, list):
+                return jsonify({"status": "error", "message": "'cashins' must be a list"}), 400
+        else:
+            file_format = 'csv' if request.mimetype == 'text/csv' else \
+                'ndjson' if request.mimetype == 'application/x-ndjson' else None
+            rows = list(read_cashin_rows(request.get_data(as_text=True).splitlines(), file_format))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid batch: {str(e)}"}), 400
+    if not rows:
+        return jsonify({"status": "error", "message": "The batch is empty"}), 400
+    if len(rows) > config.cashin_batch_max_rows:
+        return jsonify({
+            "status": "error",
+            "message": f"A batch may contain at most {config.cashin_batch_max_rows} cashins"
+        }), 400
+
+    os.makedirs(config.cashin_batch_dir, exist_ok=True)
+    batch = CashinBatchService(_cashin_batch_path(batch_id), cashin_service=cashin_service,
+                               payment_status_service=payment_status_service, max_workers=concurrency)
+    results = batch.run(rows, retry_failed=request.args.get('retry_failed', 'false').lower() == 'true')
+    try:
+        # Starts the run, so a batch that is already running is refused before streaming
+        first = next(results)
+    except CashinBatchError as e:
+        batch.close()
+        return jsonify({"status": "error", "message": str(e)}), 409
+    logging.info("Running cashin batch %s with %s row(s) and concurrency %s", batch_id, len(rows), concurrency)
+
+    def generate():
+        try:
+            yield dumps(first.to_dict()) + b"\n"
+            for row in results:
+                yield dumps(row.to_dict()) + b"\n"
+        finally:
+            results.close()
+            batch.close()
+        yield dumps({"summary": dict(batch.stats, batch_id=batch_id)}) + b"\n"
+
+    response = Response(generate(), mimetype='application/x-ndjson')
+    response.headers['X-Batch-Id'] = batch_id
+    return response
+
+@app.route('/api/cashin/batch/<batch_id>', methods=['GET'])
+def get_cashin_batch(batch_id):
+    """
+    Return the number of rows of a cashin batch in each state.
+    """
+    path = _cashin_batch_path(batch_id) if _BATCH_ID.match(batch_id) else None
+    if path is None or not os.path.exists(path):
+        return jsonify({"status": "error", "message": f"Unknown cashin batch: {batch_id}"}), 404
+    batch = CashinBatchService(path, cashin_service=cashin_service, payment_status_service=payment_status_service)
+    try:
+        return jsonify({"status": "success", "batch_id": batch_id, "rows": batch.progress()}), 200
+    finally:
+        batch.close()
+
 @app.route('/api/verifytx', methods=['GET'])
 def verify_transaction_status():
     """
@@ -110,50 +322,42 @@ def verify_transaction_status():
                 "message": "Either 'ptn' (Payment Transaction Number) or 'trid' (Transaction Reference ID) must be provided"
             }), 400
         
-        logging.info(f"Verifying transaction status - PTN: {ptn}, TRID: {trid}")
+        request_logger.info("Verifying transaction status - PTN: %s, TRID: %s", ptn, trid)
         
-        # Call the payment status service
-        result = payment_status_service.fetch_payment_status(ptn=ptn, trid=trid)
+        # Terminal statuses never change, so answer them from the tracker's local store
+        tracked_status = transaction_tracker.get_terminal_status(ptn=ptn, trid=trid)
+        if tracked_status is not None:
+            result = [tracked_status]
+        else:
+            result = payment_status_service.fetch_payment_status(ptn=ptn, trid=trid)
+            if isinstance(result, list):
+                transaction_tracker.record(result)
         
         # Check if the result is a list of PaymentStatusModel objects (success case)
-        if isinstance(result, list) and all(isinstance(item, PaymentStatusModel) for item in result):
+        if isinstance(result, list):
             # Convert PaymentStatusModel objects to dictionaries for JSON serialization
             status_data = []
             for status in result:
+                if not isinstance(status, PaymentStatusModel):
+                    logging.error(f"Unexpected item type from service: {type(status)}")
+                    return jsonify({
+                        "status": "error",
+                        "message": "Unexpected response format from service"
+                    }), 500
                 try:
-                    status_dict = {
-                        "ptn": status.ptn,
-                        "serviceid": status.serviceid,
-                        "merchant": status.merchant,
-                        "timestamp": status.timestamp.isoformat() if status.timestamp and hasattr(status.timestamp, 'isoformat') else str(status.timestamp) if status.timestamp else None,
-                        "receiptNumber": status.receiptNumber,
-                        "veriCode": status.veriCode,
-                        "clearingDate": status.clearingDate.isoformat() if status.clearingDate and hasattr(status.clearingDate, 'isoformat') else str(status.clearingDate) if status.clearingDate else None,
-                        "trid": status.trid,
-                        "priceLocalCur": status.priceLocalCur,
-                        "priceSystemCur": status.priceSystemCur,
-                        "localCur": status.localCur,
-                        "systemCur": status.systemCur,
-                        "pin": status.pin,
-                        "status": status.status,
-                        "payItemId": status.payItemId,
-                        "payItemDescr": status.payItemDescr,
-                        "errorCode": status.errorCode,
-                        "tag": status.tag
-                    }
-                    status_data.append(status_dict)
+                    status_data.append(_encode_payment_status(status))
                 except Exception as e:
                     logging.error(f"Error serializing transaction status: {str(e)}")
                     # Continue with other transactions if one fails
                     continue
             
             if status_data:
-                logging.info(f"Successfully retrieved transaction status for {len(status_data)} transaction(s)")
-                return jsonify({
+                request_logger.info("Successfully retrieved transaction status for %s transaction(s)", len(status_data))
+                return _json_response({
                     "status": "success",
                     "message": "Transaction status retrieved successfully",
                     "data": status_data
-                }), 200
+                }, 200)
             else:
                 logging.error("No valid transaction data could be serialized")
                 return jsonify({
@@ -184,10 +388,78 @@ def verify_transaction_status():
             "message": "An unexpected error occurred while verifying transaction status"
         }), 500
 
+@app.route('/api/verifytx/batch', methods=['POST'])
+def verify_transaction_status_batch():
+    """
+    Check the current status of many transactions in a single request.
+
+    JSON Body:
+    - ptns: List of Payment Transaction Numbers (optional if trids is provided)
+    - trids: List of Transaction Reference IDs (optional if ptns is provided)
+    - concurrency: Maximum number of parallel upstream lookups (optional, capped by configuration)
+
+    Returns:
+    - NDJSON stream with one line per lookup in completion order, followed by a summary line.
+      A failed lookup produces an error line and does not fail the batch.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"status": "error", "message": "Invalid request format"}), 400
+
+    ptns = data.get('ptns') or []
+    trids = data.get('trids') or []
+    if not isinstance(ptns, list) or not isinstance(trids, list) \
+            or not all(isinstance(value, str) and value for value in ptns + trids):
+        return jsonify({
+            "status": "error",
+            "message": "'ptns' and 'trids' must be lists of non-empty strings"
+        }), 400
+    if not ptns and not trids:
+        return jsonify({
+            "status": "error",
+            "message": "Either 'ptns' (Payment Transaction Numbers) or 'trids' (Transaction Reference IDs) must be provided"
+        }), 400
+
+    config = payment_status_service.config
+    if len(ptns) + len(trids) > config.verifytx_batch_max_items:
+        return jsonify({
+            "status": "error",
+            "message": f"A batch may contain at most {config.verifytx_batch_max_items} transactions"
+        }), 400
+
+    concurrency = data.get('concurrency', config.verifytx_batch_concurrency)
+    if not isinstance(concurrency, int) or isinstance(concurrency, bool) or concurrency < 1:
+        return jsonify({"status": "error", "message": "'concurrency' must be a positive integer"}), 400
+    concurrency = min(concurrency, config.verifytx_batch_concurrency)
+
+    logging.info(f"Verifying batch of {len(ptns)} PTN(s) and {len(trids)} TRID(s) with concurrency {concurrency}")
+
+    def generate():
+        succeeded = failed = 0
+        for lookup, result in payment_status_service.fetch_payment_statuses(ptns=ptns, trids=trids, max_workers=concurrency):
+            item = dict(lookup)
+            if isinstance(result, list) and all(isinstance(status, PaymentStatusModel) for status in result):
+                try:
+                    item.update({"status": "success", "data": [_encode_payment_status(status) for status in result]})
+                    succeeded += 1
+                except Exception as e:
+                    logging.error(f"Error serializing transaction status for {lookup}: {str(e)}")
+                    item.update({"status": "error", "message": "Failed to process transaction data"})
+                    failed += 1
+            else:
+                item.update({"status": "error", "message": result if isinstance(result, str) else "Unexpected response format from service"})
+                failed += 1
+            yield dumps(item) + b"\n"
+        logging.info(f"Batch verification finished: {succeeded} succeeded, {failed} failed")
+        yield dumps({"summary": {"total": succeeded + failed, "succeeded": succeeded, "failed": failed}}) + b"\n"
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
 @app.errorhandler(500)
 def internal_server_error(e):
      logging.error(f"An internal error occurred: {e}")
      return jsonify({"status": "error", "message": "An internal server error occurred."}), 500
 
 if __name__ == '__main__':
+    get_configuration()  # Sets up logging before the server starts
     app.run(host='0.0.0.0', port=5001, debug=True)
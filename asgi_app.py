@@ -0,0 +1,258 @@
+"""
+ASGI version of the HTTP facade.
+
+/api/ping, /api/account, /api/cashin and /api/verifytx are served by async
+handlers that await the S3P API through AsyncSmobilpayClient, so one worker
+process keeps many upstream calls in flight without a thread per request.
+Every other route is handed to the Flask app in app.py, which keeps working
+unchanged.
+
+Run it with asgi_server.py.
+"""
+import asyncio
+import functools
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+
+import app as flask_app
+import metrics
+from configuration import get_configuration
+from json_serializer import dumps, get_encoder
+from models.account_model import AccountModel
+from models.payment_status_model import PaymentStatusModel
+from sdk_logging import request_logger
+from services.async_client import AsyncSmobilpayClient
+from single_flight import AsyncSingleFlight
+
+_encode_payment_status = get_encoder(PaymentStatusModel)
+
+
+def _json_response(payload, status_code=200, headers=None):
+    return Response(dumps(payload), status_code=status_code, headers=headers, media_type='application/json')
+
+
+def _instrumented(path, handler):
+    """
+    Record route latency, status codes and in-flight requests of an async handler,
+    as the Flask app does for its own routes.
+    """
+    in_flight = metrics.ROUTE_IN_FLIGHT.labels(path)
+
+    @functools.wraps(handler)
+    async def instrumented(request):
+        start = time.perf_counter()
+        status_code = 500
+        in_flight.inc()
+        try:
+            response = await handler(request)
+            status_code = response.status_code
+            return response
+        finally:
+            in_flight.dec()
+            metrics.ROUTE_LATENCY.labels(path, request.method).observe(time.perf_counter() - start)
+            metrics.ROUTE_RESPONSES.labels(path, request.method, str(status_code)).inc()
+    return instrumented
+
+
+async def _fetch_payment_status(app, ptn, trid):
+    """
+    Look up a transaction through the async client, sharing PaymentStatusService's
+    result cache so Flask and async lookups see the same cached statuses.
+    Concurrent lookups for the same PTN/TRID await one upstream request.
+    """
+    service = flask_app.payment_status_service
+    key = service.status_key(ptn, trid)
+    cached = service.cached_status(key)
+    if cached is not None:
+        return cached
+
+    async def fetch_and_cache():
+        result = await app.state.client.fetch_payment_status(ptn=ptn, trid=trid)
+        service.cache_status(key, result)
+        return result
+
+    result = await app.state.verifytx_single_flight.do(key, fetch_and_cache)
+    return list(result) if isinstance(result, list) else result
+
+
+async def ping(request):
+    """
+    Check the availability of the Smobilpay API.
+    """
+    request_logger.info("Received request on /api/ping")
+    response = await request.app.state.client.ping()
+    if response.error is None:
+        request_logger.info("Ping successful: %s", response)
+        return _json_response({
+            "status": "success",
+            "time": response.time,
+            "version": response.version,
+            "nonce": response.nonce,
+            "key": response.key
+        })
+    logging.error(f"Ping failed: {response}")
+    return _json_response({"status": "error", "message": "Ping to Smobilpay API failed"}, 500)
+
+
+async def get_account_info(request):
+    """
+    Retrieve account information from the Smobilpay API.
+    """
+    request_logger.info("Received request on /api/account")
+    account_info = await request.app.state.client.fetch_account_info()
+    if isinstance(account_info, AccountModel):
+        request_logger.info("Account information fetched: %s", account_info)
+        return _json_response({
+            "status": "success",
+            "balance": account_info.balance,
+            "currency": account_info.currency
+        })
+    logging.error(f"Failed to fetch account information: {account_info}")
+    return _json_response({"status": "error", "message": "Failed to fetch account information"}, 500)
+
+
+async def create_cashin(request):
+    """
+    Create and process a new cashin request.
+
+    Query Parameters:
+    - async: When "true", validate the cashin, queue it and return 202 with a job ID
+      right away. Poll /api/cashin/<job_id> for the outcome.
+
+    Headers:
+    - X-Request-Timeout: Seconds the caller will wait; shortens the synchronous cashin's deadline.
+    """
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        if not data or not isinstance(data, dict):
+            return _json_response({"status": "error", "message": "Invalid request format"}, 400)
+        if request.query_params.get('async', 'false').lower() == 'true':
+            # The first submit builds the cashin services and their HTTP session, so keep it off the event loop
+            return await asyncio.get_running_loop().run_in_executor(None, _submit_cashin_job, data)
+        result = await request.app.state.client.process_cashin(data, deadline=flask_app._cashin_deadline(request.headers))
+        if result['status'] == 'success':
+            return _json_response(result, 201)
+        return _json_response(result, 400)
+    except Exception as e:
+        logging.error(f"Error processing cashin request: {str(e)}")
+        return _json_response({"status": "error", "message": "An error occurred while processing the cashin"}, 500)
+
+
+def _submit_cashin_job(data):
+    result = flask_app.cashin_job_service.submit(data)
+    if result['status'] == 'accepted':
+        job = result['job']
+        return _json_response({
+            "status": "accepted",
+            "message": "Cashin accepted for processing",
+            "job_id": job.job_id,
+            "trid": job.trid,
+            "status_url": f"/api/cashin/{job.job_id}"
+        }, 202, headers={'Location': f"/api/cashin/{job.job_id}"})
+    elif result['status'] == 'busy':
+        return _json_response({"status": "error", "message": result['message']}, 503)
+    return _json_response(result, 400)
+
+
+async def verify_transaction_status(request):
+    """
+    Check the current status of a transaction using PTN or TRID.
+
+    Same query parameters and responses as the Flask route.
+    """
+    try:
+        ptn = request.query_params.get('ptn')
+        trid = request.query_params.get('trid')
+        if not ptn and not trid:
+            return _json_response({
+                "status": "error",
+                "message": "Either 'ptn' (Payment Transaction Number) or 'trid' (Transaction Reference ID) must be provided"
+            }, 400)
+
+        request_logger.info("Verifying transaction status - PTN: %s, TRID: %s", ptn, trid)
+
+        tracker = flask_app.transaction_tracker
+        tracked_status = tracker.get_terminal_status(ptn=ptn, trid=trid)
+        if tracked_status is not None:
+            result = [tracked_status]
+        else:
+            result = await _fetch_payment_status(request.app, ptn, trid)
+            if isinstance(result, list):
+                tracker.record(result)
+
+        if isinstance(result, list):
+            status_data = []
+            for status in result:
+                if not isinstance(status, PaymentStatusModel):
+                    logging.error(f"Unexpected item type from service: {type(status)}")
+                    return _json_response({
+                        "status": "error",
+                        "message": "Unexpected response format from service"
+                    }, 500)
+                status_data.append(_encode_payment_status(status))
+            if status_data:
+                request_logger.info("Successfully retrieved transaction status for %s transaction(s)", len(status_data))
+                return _json_response({
+                    "status": "success",
+                    "message": "Transaction status retrieved successfully",
+                    "data": status_data
+                })
+            logging.error("No valid transaction data could be serialized")
+            return _json_response({"status": "error", "message": "Failed to process transaction data"}, 500)
+        elif isinstance(result, str):
+            logging.error(f"Service returned error: {result}")
+            return _json_response({"status": "error", "message": result}, 500)
+        logging.error(f"Unexpected result type from service: {type(result)}")
+        return _json_response({"status": "error", "message": "Unexpected response format from service"}, 500)
+    except Exception as e:
+        logging.error(f"Unexpected error in verify_transaction_status: {str(e)}")
+        return _json_response({
+            "status": "error",
+            "message": "An unexpected error occurred while verifying transaction status"
+        }, 500)
+
+
+async def internal_server_error(request, exc):
+    logging.error(f"An internal error occurred: {exc}")
+    return _json_response({"status": "error", "message": "An internal server error occurred."}, 500)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    config = get_configuration()
+    client = AsyncSmobilpayClient(config=config)
+    client.add_collect_listener(flask_app.track_collection)
+    app.state.client = client
+    app.state.verifytx_single_flight = AsyncSingleFlight()
+    logging.info("ASGI application started")
+    try:
+        yield
+    finally:
+        # Runs once in-flight requests have drained during a graceful shutdown
+        await client.close()
+        if flask_app.cashin_job_service.is_initialized():
+            flask_app.cashin_job_service.shutdown(wait=True)
+        logging.info("ASGI application stopped")
+
+
+app = Starlette(
+    routes=[
+        Route('/api/ping', _instrumented('/api/ping', ping), methods=['GET']),
+        Route('/api/account', _instrumented('/api/account', get_account_info), methods=['GET']),
+        Route('/api/cashin', _instrumented('/api/cashin', create_cashin), methods=['POST']),
+        Route('/api/verifytx', _instrumented('/api/verifytx', verify_transaction_status), methods=['GET']),
+        # Everything else (cashin jobs, batch verification, ...) is served by the Flask app
+        Mount('/', app=WSGIMiddleware(flask_app.app)),
+    ],
+    exception_handlers={Exception: internal_server_error},
+    lifespan=lifespan
+)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Production entry point for the ASGI application (asgi_app.py).
+
+Runs uvicorn in a single worker process: cashin jobs and tracked transactions
+live in the memory of the process that accepted them, so more workers are
+refused. Scale out with more instances instead. On SIGTERM, which is how Cloud
+Run stops an instance, the worker stops accepting connections, lets in-flight
+requests finish for up to the graceful shutdown timeout, and then runs the
+application's shutdown hooks.
+
+Usage:
+    python asgi_server.py [--port 8080]
+"""
+import argparse
+import logging
+
+import uvicorn
+
+from configuration import get_configuration
+
+
+def main():
+    config = get_configuration()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=config.server_host)
+    parser.add_argument('--port', type=int, default=config.server_port)
+    parser.add_argument('--workers', type=int, default=config.server_workers)
+    parser.add_argument('--graceful-timeout', type=float, default=config.server_graceful_timeout)
+    parser.add_argument('--forwarded-allow-ips', default=config.server_forwarded_allow_ips,
+                        help="Proxy addresses whose X-Forwarded-* headers are trusted")
+    args = parser.parse_args()
+    if args.workers != 1:
+        # A job accepted by one worker could not be polled through another
+        parser.error("only 1 worker is supported while cashin jobs and tracked transactions are kept in memory")
+
+    logging.info("Starting ASGI server on %s:%s with %s worker(s)", args.host, args.port, args.workers)
+    uvicorn.run(
+        'asgi_app:app',
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        lifespan='on',
+        proxy_headers=True,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+        access_log=config.debug_mode
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite with saved results and comparison against a baseline.
+
+Micro-benchmarks time request signing (S3ApiAuth.create_authorization_header),
+model construction from S3P JSON (PaymentStatusModel, PaymentHistoryModel,
+ServiceModel) and the /api/verifytx response serialization. Macro-benchmarks
+call the Flask routes through the test client against the in-process fake S3P
+server (fake_s3p_server.py). Upstream latency is zero by default, so they
+measure the SDK's own overhead per request.
+
+Each benchmark is run several times; the median run is reported as operations
+per second, along with per-call latency percentiles for the routes. Results are
+written as JSON to benchmarks/results/ and compared with the baseline, by
+default the most recent earlier result file. A benchmark whose throughput falls
+by more than --max-regression makes the command exit with status 1.
+
+Usage:
+    python benchmarks/benchmark_suite.py [--runs 5] [--quick] [--filter route.]
+    python benchmarks/benchmark_suite.py --baseline benchmarks/results/main.json --max-regression 0.1
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCHMARKS_DIR))
+
+from fake_s3p_server import DEFAULT_PUBLIC_TOKEN, DEFAULT_SECRET_KEY, FakeS3PServer, parse_latency
+
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, 'results')
+
+STATUS_JSON = json.dumps([{
+    'ptn': '99999166542651400095315364801168', 'serviceid': '20053', 'merchant': 'MTNMOMO',
+    'timestamp': '2024-03-01T10:15:42.123Z', 'receiptNumber': 'R1', 'veriCode': 'V1',
+    'clearingDate': '2024-03-01T10:20:42.123Z', 'trid': 'eabd12-7494984-494044-d0', 'priceLocalCur': 1000.0,
+    'priceSystemCur': 1000.0, 'localCur': 'XAF', 'systemCur': 'XAF', 'pin': '', 'status': 'SUCCESS',
+    'payItemId': 'S-112-951-MTNMOMO-20053-200050001-1', 'payItemDescr': 'Cash in', 'errorCode': 0, 'tag': ''
+}])
+
+SERVICE_JSON = json.dumps([{
+    'serviceid': 20053, 'merchant': 'MTNMOMO', 'title': 'MTN Mobile Money cashin', 'description': 'Cashin',
+    'category': 'Mobile Money', 'country': 'CM', 'localCur': 'XAF', 'type': 'CASHIN', 'status': 'ACTIVE',
+    'isReqCustomerName': False, 'isReqCustomerAddress': False, 'isReqCustomerNumber': False,
+    'isReqServiceNumber': True, 'isVerifiable': True, 'validationMask': '^6[0-9]{8}$', 'denomination': 1,
+    'labelCustomerNumber': [{'language': 'en', 'localText': 'Phone number'}],
+    'labelServiceNumber': [{'language': 'en', 'localText': 'Phone number'}], 'hint': []
+}] * 20)
+
+
+def _history_json(rows):
+    records = json.loads(STATUS_JSON) * rows
+    return json.dumps([dict(record, ptn=f"{index:032d}") for index, record in enumerate(records)])
+
+
+def bench_signing():
+    from s3_api_auth import S3ApiAuth
+    api_auth = S3ApiAuth('https://s3p.smobilpay.staging.maviance.info/v2/verifytx', 'benchmark-token', 'benchmark-secret')
+    params = {'ptn': '99999166542651400095315364801168'}
+    return lambda: api_auth.create_authorization_header('GET', params)
+
+
+def bench_payment_status_model():
+    from datetime_decoder import get_datetime_decoder
+    from models.payment_status_model import PaymentStatusModel
+    decoder = get_datetime_decoder()
+
+    def run():
+        return [PaymentStatusModel(**decoder.decode_record(item, PaymentStatusModel)) for item in json.loads(STATUS_JSON)]
+    return run
+
+
+def bench_payment_history_models():
+    from datetime_decoder import get_datetime_decoder
+    from models.payment_history_model import PaymentHistoryModel
+    decoder = get_datetime_decoder()
+    body = _history_json(1000)
+
+    def run():
+        return [PaymentHistoryModel(**decoder.decode_record(item, PaymentHistoryModel)) for item in json.loads(body)]
+    return run
+
+
+def bench_service_models():
+    from models.service_model import ServiceModel
+    return lambda: [ServiceModel(**item) for item in json.loads(SERVICE_JSON)]
+
+
+def bench_verifytx_serialization():
+    from datetime_decoder import get_datetime_decoder
+    from json_serializer import dumps, get_encoder
+    from models.payment_status_model import PaymentStatusModel
+    decoder = get_datetime_decoder()
+    statuses = [PaymentStatusModel(**decoder.decode_record(item, PaymentStatusModel)) for item in json.loads(STATUS_JSON)]
+    encode = get_encoder(PaymentStatusModel)
+
+    def run():
+        return dumps({
+            "status": "success",
+            "message": "Transaction status retrieved successfully",
+            "data": [encode(status) for status in statuses]
+        })
+    return run
+
+
+def _client():
+    from app import app
+    return app.test_client()
+
+
+def _checked(response, expected_status):
+    if response.status_code != expected_status:
+        raise RuntimeError(f"Expected {expected_status}, got {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response
+
+
+def bench_route_ping():
+    client = _client()
+    return lambda: _checked(client.get('/api/ping'), 200)
+
+
+def bench_route_account():
+    client = _client()
+    return lambda: _checked(client.get('/api/account'), 200)
+
+
+def bench_route_verifytx():
+    client = _client()
+    counter = iter(range(10 ** 12))
+    # A new PTN per call, so neither the verifytx cache nor the tracker answers it
+    return lambda: _checked(client.get(f'/api/verifytx?ptn=bench{next(counter):020d}'), 200)
+
+
+def bench_route_cashin():
+    from services.cashin_service import CashinService
+    client = _client()
+    channel = next((name for name, pay_item_id in CashinService.CHANNEL_PAYITEMID_MAP.items() if pay_item_id), None)
+    if channel is None:
+        raise RuntimeError("Set SMOBILE_PAY_CASH_IN_MTN_MOMO_PAY_ID or SMOBILE_PAY_CASH_IN_ORANGE_MONEY_PAY_ID")
+    counter = iter(range(10 ** 12))
+
+    def run():
+        return _checked(client.post('/api/cashin', json={
+            'channel': channel, 'amount': 1000, 'serviceNumber': '690000000', 'customerPhonenumber': '237690000000',
+            'customerEmailaddress': 'bench@example.com', 'trid': f"bench-{next(counter)}"
+        }), 201)
+    return run
+
+
+# name: (setup returning the callable to time, iterations per run, record per-call latency)
+BENCHMARKS = {
+    'sign.create_authorization_header': (bench_signing, 20000, False),
+    'decode.payment_status_model': (bench_payment_status_model, 20000, False),
+    'decode.payment_history_1000_models': (bench_payment_history_models, 20, False),
+    'decode.service_20_models': (bench_service_models, 2000, False),
+    'serialize.verifytx_response': (bench_verifytx_serialization, 50000, False),
+    'route.ping': (bench_route_ping, 500, True),
+    'route.account': (bench_route_account, 500, True),
+    'route.verifytx': (bench_route_verifytx, 500, True),
+    'route.cashin': (bench_route_cashin, 300, True),
+}
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def measure(func, iterations, runs, per_call):
+    """
+    Time `runs` runs of `iterations` calls after a warm-up run; return the median run's figures.
+    """
+    for _ in range(max(1, iterations // 10)):
+        func()
+    rates = []
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        if per_call:
+            for _ in range(iterations):
+                call_start = time.perf_counter()
+                func()
+                latencies.append(time.perf_counter() - call_start)
+        else:
+            for _ in range(iterations):
+                func()
+        rates.append(iterations / (time.perf_counter() - start))
+    median = statistics.median(rates)
+    result = {
+        'ops_per_sec': median,
+        'us_per_op': 1e6 / median,
+        'stdev_pct': statistics.stdev(rates) / median * 100 if len(rates) > 1 else 0.0,
+        'iterations': iterations,
+        'runs': runs,
+    }
+    if latencies:
+        latencies.sort()
+        result.update({f"{name}_ms": _percentile(latencies, fraction) * 1000
+                       for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))})
+        result['max_ms'] = latencies[-1] * 1000
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARKS_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def latest_result(exclude=None):
+    paths = [path for path in glob.glob(os.path.join(RESULTS_DIR, '*.json')) if path != exclude]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def compare(results, baseline, max_regression):
+    """
+    Print each benchmark's change against the baseline; return the names that regressed beyond max_regression.
+    """
+    regressions = []
+    print(f"\n{'benchmark':<38} {'baseline ops/s':>15} {'ops/s':>13} {'change':>9}")
+    for name, result in results['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            print(f"{name:<38} {'-':>15} {result['ops_per_sec']:>13,.1f} {'new':>9}")
+            continue
+        change = result['ops_per_sec'] / previous['ops_per_sec'] - 1
+        flag = ''
+        if change < -max_regression:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<38} {previous['ops_per_sec']:>15,.1f} {result['ops_per_sec']:>13,.1f} {change:>+9.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Timed runs per benchmark')
+    parser.add_argument('--quick', action='store_true', help='Run a tenth of the iterations, for a smoke test')
+    parser.add_argument('--filter', help='Only run benchmarks whose name contains this text')
+    parser.add_argument('--upstream-latency', default='fixed:0', help='Fake S3P latency, e.g. fixed:20 (ms)')
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/<UTC time>.json)')
+    parser.add_argument('--baseline', help='Result file to compare with (default: the latest earlier result)')
+    parser.add_argument('--no-compare', action='store_true')
+    parser.add_argument('--max-regression', type=float, default=0.15,
+                        help='Throughput drop, as a fraction, that fails the run (default 0.15)')
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if not args.filter or args.filter in name]
+    if not names:
+        parser.error(f"No benchmark matches '{args.filter}'")
+
+    server = None
+    if any(name.startswith('route.') for name in names):
+        server = FakeS3PServer(latency={'*': parse_latency(args.upstream_latency)}).start()
+        # Set before app.py loads its configuration; the routes then talk to the fake server
+        os.environ.update({
+            'SMOBIL_PAY_API_URL': server.api_url, 'SMOBIL_PAY_API_KEY': DEFAULT_PUBLIC_TOKEN,
+            'SMOBIL_PAY_API_SECRET': DEFAULT_SECRET_KEY, 'SMOBIL_PAY_LOG_REQUEST_SAMPLE_RATE': '0',
+        })
+        os.environ.setdefault('SMOBILE_PAY_CASH_IN_MTN_MOMO_PAY_ID', 'S-20052-CASHIN')
+    # Keep startup and per-request INFO lines out of the measurements and the report
+    logging.basicConfig(level=logging.WARNING)
+
+    started_at = datetime.now(timezone.utc)
+    results = {
+        'created': started_at.isoformat(),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'upstream_latency': args.upstream_latency if server else None,
+        'results': {},
+    }
+    try:
+        for name in names:
+            setup, iterations, per_call = BENCHMARKS[name]
+            if args.quick:
+                iterations = max(1, iterations // 10)
+            result = measure(setup(), iterations, args.runs, per_call)
+            results['results'][name] = result
+            latency = f"  p50 {result['p50_ms']:.2f} ms  p99 {result['p99_ms']:.2f} ms" if per_call else ''
+            print(f"{name:<38} {result['ops_per_sec']:>13,.1f} ops/s  {result['us_per_op']:>10.1f} us/op  "
+                  f"±{result['stdev_pct']:.1f}%{latency}")
+    finally:
+        if server is not None:
+            server.stop()
+
+    output = args.output or os.path.join(RESULTS_DIR, started_at.strftime('%Y%m%dT%H%M%SZ') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    baseline_path = None if args.no_compare else args.baseline or latest_result(exclude=os.path.abspath(output))
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        print(f"Compared with {baseline_path} (commit {baseline.get('git_commit')}, {baseline.get('created')})")
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than the baseline by more than {args.max_regression:.0%}: "
+                  f"{', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for datetime decoding of S3P responses.
+
+Compares the previous PaymentStatusService._parse_datetime (fromisoformat after
+a "Z" replacement, then a loop over strptime formats) with the shared
+format-learning DatetimeDecoder. It reports the cost per value and per
+verifytx row (two date fields) for the layouts S3P returns.
+
+Usage:
+    python benchmarks/datetime_benchmark.py [--rows 100000]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime_decoder import DatetimeDecoder
+from models.payment_status_model import PaymentStatusModel
+
+LAYOUTS = {
+    'UTC "Z" suffix': '2024-05-01T10:15:30Z',
+    'UTC offset': '2024-05-01T10:15:30+01:00',
+    'Milliseconds and "Z"': '2024-05-01T10:15:30.123Z',
+    'No offset': '2024-05-01T10:15:30',
+    'Space separated': '2024-05-01 10:15:30',
+}
+
+
+def legacy_parse_datetime(date_string):
+    if not date_string:
+        return None
+    try:
+        return datetime.fromisoformat(date_string.replace('Z', '+00:00'))
+    except ValueError:
+        for fmt in ['%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d']:
+            try:
+                return datetime.strptime(date_string, fmt)
+            except ValueError:
+                continue
+        return None
+
+
+def legacy_row(status):
+    if status.get('timestamp'):
+        status['timestamp'] = legacy_parse_datetime(status['timestamp'])
+    if status.get('clearingDate'):
+        status['clearingDate'] = legacy_parse_datetime(status['clearingDate'])
+    return status
+
+
+def time_per_call(func, values):
+    start = time.perf_counter()
+    for value in values:
+        func(value)
+    return (time.perf_counter() - start) / len(values) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"Python {sys.version.split()[0]}, {args.rows} values per layout")
+    print(f"{'Layout':<22}{'legacy ns/value':>18}{'decoder ns/value':>18}")
+    for label, value in LAYOUTS.items():
+        values = [value] * args.rows
+        decoder = DatetimeDecoder()
+        assert decoder.decode(value, 'timestamp') is not None
+        legacy = time_per_call(legacy_parse_datetime, values)
+        learned = time_per_call(lambda item: decoder.decode(item, 'timestamp'), values)
+        print(f"{label:<22}{legacy:>18,.0f}{learned:>18,.0f}")
+
+    decoder = DatetimeDecoder()
+    rows = [{'timestamp': '2024-05-01T10:15:30.123Z', 'clearingDate': '2024-05-01T10:20:00Z'} for _ in range(args.rows)]
+    legacy = time_per_call(legacy_row, [dict(row) for row in rows])
+    learned = time_per_call(lambda row: decoder.decode_record(row, PaymentStatusModel), [dict(row) for row in rows])
+    print(f"\nverifytx row (timestamp + clearingDate): legacy {legacy:,.0f} ns/row, decoder {learned:,.0f} ns/row")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,536 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the S3P v2 API, for load testing without the sandbox.
+
+Serves ping, account, quotestd, collectstd, verifytx, historystd, bill,
+subscription, service, merchant, product, cashin, cashout, topup, voucher and
+verify with payloads shaped like the real API, so every service, app.py and
+asgi_app.py can run against it unchanged. Requests must carry a valid s3pAuth
+header: the signature is recomputed with HMACSignature.get_base_string over the
+query or body parameters and the s3pAuth_* fields, as S3P does.
+
+Collections start PENDING and turn SUCCESS after --settle-after seconds;
+verifytx reports them, and makes up a settled transaction for PTNs/TRIDs it has
+never seen. Payment history is generated deterministically, one transaction
+every --history-interval seconds, so overlapping windows return the same rows.
+
+Latency, error rates and 401/498 injection are configurable for all endpoints
+or per endpoint ("endpoint=value", repeatable):
+
+    --latency lognormal:40:0.5 --latency verifytx=uniform:5:20
+    --error-rate 0.01 --error-rate collectstd=0.05
+    --unauthorized-rate 0.001 --expired-quote-rate 0.02
+
+Latency distributions, in milliseconds: fixed:MS, uniform:MIN:MAX,
+normal:MEAN:STDDEV and lognormal:MEDIAN:SIGMA.
+
+GET /_stats returns request counts per endpoint and status.
+
+Usage:
+    python benchmarks/fake_s3p_server.py [--port 8100] [--latency fixed:20] [--error-rate 0.01]
+    SMOBIL_PAY_API_URL=http://127.0.0.1:8100/v2 python asgi_server.py
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import math
+import os
+import random
+import re
+import socket
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qsl
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+
+from datetime_decoder import get_datetime_decoder
+from json_serializer import dumps
+from s3_api_auth import HMACSignature
+
+DEFAULT_PUBLIC_TOKEN = 'fake-s3p-public-token'
+DEFAULT_SECRET_KEY = 'fake-s3p-secret-key'
+
+ENDPOINTS = (
+    'ping', 'account', 'quotestd', 'collectstd', 'verifytx', 'historystd', 'bill', 'subscription', 'service',
+    'merchant', 'product', 'cashin', 'cashout', 'topup', 'voucher', 'verify'
+)
+
+_AUTH_FIELD = re.compile(r'(s3pAuth_\w+)="([^"]*)"')
+
+MERCHANTS = (
+    {'merchant': 'MTNMOMO', 'name': 'MTN Mobile Money', 'description': 'MTN Mobile Money Cameroon',
+     'category': 'Mobile Money', 'country': 'CM', 'status': 'ACTIVE', 'logo': None, 'logoHash': None},
+    {'merchant': 'CMORANGEOM', 'name': 'Orange Money', 'description': 'Orange Money Cameroon',
+     'category': 'Mobile Money', 'country': 'CM', 'status': 'ACTIVE', 'logo': None, 'logoHash': None},
+    {'merchant': 'ENEO', 'name': 'ENEO', 'description': 'Electricity bills', 'category': 'Utilities',
+     'country': 'CM', 'status': 'ACTIVE', 'logo': None, 'logoHash': None},
+)
+
+SERVICES = (
+    (20052, 'MTNMOMO', 'MTN Mobile Money cashin', 'CASHIN'),
+    (30052, 'CMORANGEOM', 'Orange Money cashin', 'CASHIN'),
+    (10039, 'ENEO', 'ENEO postpaid bills', 'BILL'),
+)
+
+
+def _service(serviceid, merchant, title, service_type):
+    label = [{'language': 'en', 'localText': 'Phone number'}]
+    return {
+        'serviceid': serviceid, 'merchant': merchant, 'title': title, 'description': title, 'category': 'Payments',
+        'country': 'CM', 'localCur': 'XAF', 'type': service_type, 'status': 'ACTIVE', 'isReqCustomerName': False,
+        'isReqCustomerAddress': False, 'isReqCustomerNumber': service_type == 'BILL', 'isReqServiceNumber': True,
+        'isVerifiable': True, 'validationMask': '^6[0-9]{8}$', 'denomination': 1,
+        'labelCustomerNumber': label, 'labelServiceNumber': label, 'hint': []
+    }
+
+
+def _pay_item(serviceid, merchant, name, amount_type='CUSTOM', amount=None):
+    return {
+        'serviceid': serviceid, 'merchant': merchant, 'payItemId': f"S-{serviceid}-{name.upper()}",
+        'payItemDescr': name, 'amountType': amount_type, 'localCur': 'XAF', 'name': name,
+        'amountLocalCur': amount, 'description': f"{name} for service {serviceid}", 'optStrg': None, 'optNmb': None
+    }
+
+
+def _iso(value):
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.') + f"{value.microsecond // 1000:03d}Z"
+
+
+def _stable_int(*parts):
+    return int.from_bytes(hashlib.sha1('|'.join(str(part) for part in parts).encode()).digest()[:8], 'big')
+
+
+def parse_latency(spec):
+    """
+    Return a function giving a latency in seconds for a "kind:params" spec in milliseconds.
+    """
+    kind, _, params = spec.partition(':')
+    values = [float(value) / 1000 for value in params.split(':')] if params else []
+    if kind == 'fixed' and len(values) == 1:
+        return lambda: values[0]
+    if kind == 'uniform' and len(values) == 2:
+        return lambda: random.uniform(values[0], values[1])
+    if kind == 'normal' and len(values) == 2:
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == 'lognormal' and len(values) == 2:
+        # The sigma is unitless, so undo the millisecond conversion applied to it
+        median, sigma = values[0], values[1] * 1000
+        return lambda: random.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+    raise argparse.ArgumentTypeError(f"Invalid latency '{spec}'")
+
+
+def per_endpoint(values, parse, default):
+    """
+    Turn repeated "value" / "endpoint=value" options into {endpoint: parsed value}, with '*' as the fallback.
+    """
+    result = {'*': parse(default)}
+    for value in values or ():
+        endpoint, separator, setting = value.partition('=')
+        if separator:
+            if endpoint not in ENDPOINTS:
+                raise argparse.ArgumentTypeError(f"Unknown endpoint '{endpoint}'")
+            result[endpoint] = parse(setting)
+        else:
+            result['*'] = parse(value)
+    return result
+
+
+class FakeS3PState:
+    """
+    Quotes, collections and request counters of one server process.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        self.quotes = {}
+        self.transactions_by_ptn = {}
+        self.transactions_by_trid = {}
+        self.counts = Counter()
+        self.decoder = get_datetime_decoder()
+
+    def setting(self, name, endpoint):
+        values = self.options[name]
+        return values.get(endpoint, values['*'])
+
+    def check_signature(self, request, endpoint, params):
+        """
+        Return None if the s3pAuth header is valid, else the reason it is not.
+        """
+        header = request.headers.get('authorization', '')
+        if not header.startswith('s3pAuth'):
+            return 'Missing s3pAuth authorization header'
+        fields = dict(_AUTH_FIELD.findall(header))
+        signature = fields.pop('s3pAuth_signature', None)
+        if fields.get('s3pAuth_token') != self.options['public_token']:
+            return 'Unknown public token'
+        if fields.get('s3pAuth_signature_method') != 'HMAC-SHA1' or not signature:
+            return 'Unsupported signature method'
+        max_skew = self.options['max_clock_skew']
+        if max_skew and abs(time.time() - float(fields.get('s3pAuth_timestamp') or 0)) > max_skew:
+            return 'Timestamp outside the accepted window'
+        url = str(request.url.replace(query=''))
+        expected = HMACSignature(request.method, url, {**params, **fields}).generate(self.options['secret_key'])
+        if not hmac.compare_digest(expected, signature):
+            return 'Invalid signature'
+        return None
+
+    def record(self, status, collected_trid=None, ptn=None):
+        now = datetime.now(timezone.utc)
+        ptn = ptn or f"{int(now.timestamp() * 1e6)}{random.randrange(10 ** 15):015d}"
+        return {
+            'ptn': ptn, 'serviceid': str(SERVICES[0][0]), 'merchant': SERVICES[0][1], 'timestamp': _iso(now),
+            'receiptNumber': f"R{_stable_int(ptn) % 10 ** 10:010d}", 'veriCode': f"{_stable_int(ptn, 'v') % 10 ** 6:06d}",
+            'clearingDate': _iso(now), 'trid': collected_trid, 'priceLocalCur': 1000.0, 'priceSystemCur': 1000.0,
+            'localCur': 'XAF', 'systemCur': 'XAF', 'pin': None, 'status': status, 'payItemId': f"S-{SERVICES[0][0]}-CASHIN",
+            'payItemDescr': 'Cashin', 'errorCode': None, 'tag': None
+        }
+
+    def remember(self, transaction):
+        if len(self.transactions_by_ptn) >= self.options['max_transactions']:
+            oldest = self.transactions_by_ptn.pop(next(iter(self.transactions_by_ptn)))
+            self.transactions_by_trid.pop(oldest['trid'], None)
+        self.transactions_by_ptn[transaction['ptn']] = transaction
+        if transaction['trid']:
+            self.transactions_by_trid[transaction['trid']] = transaction
+
+    def settled(self, transaction):
+        if transaction['status'] == 'PENDING' and time.monotonic() - transaction['_created'] >= self.options['settle_after']:
+            transaction['status'] = 'SUCCESS'
+            transaction['clearingDate'] = _iso(datetime.now(timezone.utc))
+        return {key: value for key, value in transaction.items() if not key.startswith('_')}
+
+
+async def _params(request):
+    if request.method == 'GET':
+        return dict(request.query_params)
+    body = await request.body()
+    if request.headers.get('content-type', '').startswith('application/x-www-form-urlencoded'):
+        # Parsed here rather than with request.form(), which needs python-multipart
+        return dict(parse_qsl(body.decode(), keep_blank_values=True))
+    return json.loads(body) if body else {}
+
+
+def _json(payload, status_code=200):
+    return Response(dumps(payload), status_code=status_code, media_type='application/json')
+
+
+def _error(status_code, error_code, message):
+    return _json({'respCode': error_code, 'errorCode': error_code, 'devMsg': message, 'usrMsg': message}, status_code)
+
+
+def _missing(params, *names):
+    missing = [name for name in names if not params.get(name)]
+    return _error(400, 40001, f"Missing parameters: {', '.join(missing)}") if missing else None
+
+
+def _pay_items(suffixes, serviceid):
+    items = [
+        _pay_item(sid, merchant, suffix)
+        for sid, merchant, _, _ in SERVICES for suffix in suffixes
+    ]
+    if serviceid:
+        items = [item for item in items if str(item['serviceid']) == str(serviceid)]
+    return items
+
+
+def _handle(state, endpoint, params, request):
+    now = datetime.now(timezone.utc)
+    if endpoint == 'ping':
+        fields = dict(_AUTH_FIELD.findall(request.headers.get('authorization', '')))
+        return _json({'time': _iso(now), 'version': '3.0.0', 'nonce': fields.get('s3pAuth_nonce'),
+                      'key': state.options['public_token']})
+    if endpoint == 'account':
+        return _json({
+            'balance': 1_000_000.0, 'currency': 'XAF', 'key': state.options['public_token'], 'agentId': 'AGENT-1',
+            'agentName': 'Load Test Agent', 'agentAddress': 'Douala', 'agentPhonenumber': '237600000000',
+            'companyName': 'Load Test', 'companyAddress': 'Douala', 'companyPhonenumber': '237600000000',
+            'limitMax': 10_000_000.0, 'limitRemaining': 9_000_000.0
+        })
+    if endpoint == 'quotestd':
+        error = _missing(params, 'payItemId', 'amount')
+        if error:
+            return error
+        quote_id = str(uuid.uuid4())
+        expires_at = now + timedelta(seconds=state.options['quote_ttl'])
+        amount = float(params['amount'])
+        state.quotes[quote_id] = (time.monotonic() + state.options['quote_ttl'], params['payItemId'], amount)
+        return _json({
+            'quoteId': quote_id, 'expiresAt': _iso(expires_at), 'payItemId': params['payItemId'],
+            'amountLocalCur': amount, 'priceLocalCur': amount, 'priceSystemCur': amount, 'localCur': 'XAF',
+            'systemCur': 'XAF', 'promotion': None
+        })
+    if endpoint == 'collectstd':
+        error = _missing(params, 'quoteId', 'serviceNumber', 'trid')
+        if error:
+            return error
+        if random.random() < state.setting('expired_quote_rate', endpoint):
+            return _error(498, 40602, 'Quote has expired')
+        quote = state.quotes.pop(params['quoteId'], None)
+        if quote is None:
+            return _error(404, 40601, 'Unknown quote')
+        if quote[0] < time.monotonic():
+            return _error(498, 40602, 'Quote has expired')
+        transaction = state.record('PENDING', collected_trid=params['trid'])
+        transaction.update({'priceLocalCur': quote[2], 'priceSystemCur': quote[2], 'payItemId': quote[1],
+                            '_created': time.monotonic()})
+        state.remember(transaction)
+        collection = state.settled(transaction)
+        collection['agentBalance'] = 1_000_000.0
+        for name in ('serviceid', 'merchant', 'clearingDate', 'errorCode'):
+            collection.pop(name)
+        return _json(collection)
+    if endpoint == 'verifytx':
+        ptn, trid = params.get('ptn'), params.get('trid')
+        if not ptn and not trid:
+            return _error(400, 40001, 'ptn or trid is required')
+        transaction = state.transactions_by_ptn.get(ptn) if ptn else state.transactions_by_trid.get(trid)
+        if transaction is None:
+            if not state.options['synthesize_unknown']:
+                return _json([])
+            transaction = state.record('SUCCESS', collected_trid=trid, ptn=ptn)
+            transaction['_created'] = 0.0
+            state.remember(transaction)
+        return _json([state.settled(transaction)])
+    if endpoint == 'historystd':
+        return _json(_history(state, params))
+    if endpoint == 'bill':
+        error = _missing(params, 'merchant', 'serviceid', 'serviceNumber')
+        if error:
+            return error
+        return _json([_bill(params, order) for order in (1, 2)])
+    if endpoint == 'subscription':
+        error = _missing(params, 'merchant', 'serviceid')
+        if error:
+            return error
+        number = params.get('serviceNumber') or params.get('customerNumber') or '600000000'
+        return _json([{
+            'serviceNumber': number, 'serviceid': params['serviceid'], 'merchant': params['merchant'],
+            'payItemId': f"S-{params['serviceid']}-SUBSCRIPTION", 'payItemDescr': 'Monthly plan', 'amountType': 'FIXED',
+            'name': 'Monthly plan', 'localCur': 'XAF', 'amountLocalCur': 5000.0, 'customerReference': number,
+            'customerName': 'Load Test Customer', 'customerNumber': params.get('customerNumber') or number,
+            'startDate': _iso(now - timedelta(days=30)), 'dueDate': _iso(now + timedelta(days=5)),
+            'endDate': _iso(now + timedelta(days=335)), 'optStrg': None, 'optNmb': None
+        }])
+    if endpoint == 'service':
+        service_id = request.path_params.get('service_id')
+        services = [_service(*service) for service in SERVICES]
+        if service_id is None:
+            return _json(services)
+        for service in services:
+            if str(service['serviceid']) == service_id:
+                return _json(service)
+        return _error(404, 40401, 'Service does not exist')
+    if endpoint == 'merchant':
+        return _json(list(MERCHANTS))
+    if endpoint in ('product', 'cashin', 'cashout', 'topup', 'voucher'):
+        return _json(_pay_items((endpoint,), params.get('serviceid')))
+    if endpoint == 'verify':
+        error = _missing(params, 'merchant', 'serviceid', 'serviceNumber')
+        if error:
+            return error
+        return _json({'is_valid': bool(re.fullmatch(r'6[0-9]{8}', str(params['serviceNumber'])))})
+    return _error(404, 40400, 'Unknown endpoint')
+
+
+def _bill(params, order):
+    now = datetime.now(timezone.utc)
+    return {
+        'billType': 'REGULAR', 'penaltyAmount': 0.0, 'payOrder': order, 'payItemId': f"S-{params['serviceid']}-BILL-{order}",
+        'payItemDescr': f"Bill {order}", 'serviceNumber': params['serviceNumber'], 'serviceid': int(params['serviceid']),
+        'merchant': params['merchant'], 'amountType': 'FIXED', 'localCur': 'XAF', 'amountLocalCur': 7500.0 * order,
+        'billNumber': f"B{_stable_int(params['serviceNumber'], order) % 10 ** 8:08d}", 'customerNumber': params['serviceNumber'],
+        'billMonth': f"{now.month:02d}", 'billYear': str(now.year), 'billDate': _iso(now - timedelta(days=20)),
+        'billDueDate': _iso(now + timedelta(days=10)), 'optStrg': None, 'optNmb': None
+    }
+
+
+def _to_epoch(state, value, default):
+    parsed = state.decoder.decode(value) if value else None
+    if parsed is None:
+        return default
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _history(state, params):
+    interval = state.options['history_interval']
+    end = _to_epoch(state, params.get('timestamp_to'), time.time())
+    start = _to_epoch(state, params.get('timestamp_from'), end - 86400)
+    first = math.ceil(start / interval)
+    last = min(math.floor(end / interval), first + state.options['history_max_rows'] - 1)
+    rows = []
+    for slot in range(first, last + 1):
+        timestamp = datetime.fromtimestamp(slot * interval, timezone.utc)
+        ptn = f"{slot:012d}{_stable_int(slot) % 10 ** 20:020d}"
+        rows.append({
+            'ptn': ptn, 'serviceid': str(SERVICES[slot % 2][0]), 'merchant': SERVICES[slot % 2][1],
+            'timestamp': _iso(timestamp), 'receiptNumber': f"R{slot % 10 ** 10:010d}", 'veriCode': f"{slot % 10 ** 6:06d}",
+            'clearingDate': _iso(timestamp + timedelta(seconds=30)), 'trid': f"trid-{slot}",
+            'priceLocalCur': float(500 + slot % 50 * 100), 'priceSystemCur': float(500 + slot % 50 * 100),
+            'localCur': 'XAF', 'systemCur': 'XAF', 'pin': None,
+            'status': 'ERRORED' if slot % 97 == 0 else 'SUCCESS', 'payItemId': f"S-{SERVICES[slot % 2][0]}-CASHIN",
+            'payItemDescr': 'Cashin', 'errorCode': 703202 if slot % 97 == 0 else None, 'tag': None
+        })
+    return rows
+
+
+def create_app(**options):
+    """
+    Build the stand-in ASGI app. Options are those of the command line, with
+    latency/error_rate/unauthorized_rate/expired_quote_rate as {endpoint or '*': value} dicts.
+    """
+    settings = {
+        'public_token': DEFAULT_PUBLIC_TOKEN, 'secret_key': DEFAULT_SECRET_KEY, 'prefix': '/v2',
+        'latency': {'*': parse_latency('fixed:0')}, 'error_rate': {'*': 0.0}, 'unauthorized_rate': {'*': 0.0},
+        'expired_quote_rate': {'*': 0.0}, 'quote_ttl': 300.0, 'settle_after': 5.0, 'synthesize_unknown': True,
+        'history_interval': 60.0, 'history_max_rows': 10000, 'max_clock_skew': 300.0, 'max_transactions': 1_000_000,
+    }
+    settings.update(options)
+    state = FakeS3PState(settings)
+
+    async def endpoint_handler(request):
+        endpoint = request.url.path[len(settings['prefix']):].strip('/').split('/', 1)[0]
+        try:
+            params = await _params(request)
+        except ValueError:
+            state.counts[(endpoint, 400)] += 1
+            return _error(400, 40000, 'Malformed request body')
+        delay = state.setting('latency', endpoint)()
+        if delay:
+            await asyncio.sleep(delay)
+
+        reason = state.check_signature(request, endpoint, params)
+        if reason is None and random.random() < state.setting('unauthorized_rate', endpoint):
+            reason = 'Injected authentication failure'
+        if reason is not None:
+            response = _error(401, 4009, reason)
+        elif random.random() < state.setting('error_rate', endpoint):
+            response = _error(random.choice((500, 503)), 50000, 'Injected upstream error')
+        else:
+            response = _handle(state, endpoint, params, request)
+        state.counts[(endpoint, response.status_code)] += 1
+        return response
+
+    async def stats(request):
+        by_endpoint = {}
+        for (endpoint, status_code), count in state.counts.items():
+            by_endpoint.setdefault(endpoint, {})[str(status_code)] = count
+        return _json({'requests': sum(state.counts.values()), 'endpoints': by_endpoint,
+                      'collections': len(state.transactions_by_ptn), 'open_quotes': len(state.quotes)})
+
+    prefix = settings['prefix']
+    routes = [Route('/_stats', stats, methods=['GET']),
+              Route(f"{prefix}/service/{{service_id}}", endpoint_handler, methods=['GET'])]
+    routes.extend(
+        Route(f"{prefix}/{endpoint}", endpoint_handler,
+              methods=['POST'] if endpoint in ('quotestd', 'collectstd') else ['GET'])
+        for endpoint in ENDPOINTS
+    )
+    app = Starlette(routes=routes)
+    app.state.fake_s3p = state
+    return app
+
+
+class FakeS3PServer:
+    """
+    Runs the stand-in in a background thread of the current process.
+
+    Usage:
+        with FakeS3PServer(latency={'*': parse_latency('fixed:5')}) as server:
+            os.environ['SMOBIL_PAY_API_URL'] = server.api_url
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, **options):
+        self.host = host
+        self.port = port or _free_port(host)
+        self.app = create_app(**options)
+        self.api_url = f"http://{self.host}:{self.port}{options.get('prefix', '/v2')}"
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host=self.host, port=self.port, log_level='warning',
+                                                     lifespan='off'))
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.run, name='fake-s3p', daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            if not self._thread.is_alive():
+                raise RuntimeError(f"Fake S3P server failed to start on {self.host}:{self.port}")
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def _free_port(host):
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def _rate(value):
+    rate = float(value)
+    if not 0 <= rate <= 1:
+        raise argparse.ArgumentTypeError(f"Rate must be between 0 and 1, got {value}")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--prefix', default='/v2', help='Path prefix of the API, as in SMOBIL_PAY_API_URL')
+    parser.add_argument('--public-token', default=os.getenv('SMOBIL_PAY_API_KEY', DEFAULT_PUBLIC_TOKEN))
+    parser.add_argument('--secret-key', default=os.getenv('SMOBIL_PAY_API_SECRET', DEFAULT_SECRET_KEY))
+    parser.add_argument('--latency', action='append', help='[endpoint=]kind:params in ms (default fixed:0)')
+    parser.add_argument('--error-rate', action='append', help='[endpoint=]fraction answered with 500/503')
+    parser.add_argument('--unauthorized-rate', action='append', help='[endpoint=]fraction answered with 401')
+    parser.add_argument('--expired-quote-rate', action='append', help='[collectstd=]fraction of collects answered with 498')
+    parser.add_argument('--quote-ttl', type=float, default=300.0, help='Seconds before a quote expires')
+    parser.add_argument('--settle-after', type=float, default=5.0, help='Seconds before a collection turns SUCCESS')
+    parser.add_argument('--no-synthesize-unknown', action='store_true',
+                        help='Answer verifytx for unknown PTNs/TRIDs with an empty list')
+    parser.add_argument('--history-interval', type=float, default=60.0, help='Seconds between generated history rows')
+    parser.add_argument('--history-max-rows', type=int, default=10000)
+    parser.add_argument('--max-clock-skew', type=float, default=300.0, help='Accepted s3pAuth_timestamp skew; 0 disables')
+    args = parser.parse_args()
+
+    options = dict(
+        public_token=args.public_token, secret_key=args.secret_key, prefix=args.prefix.rstrip('/'),
+        latency=per_endpoint(args.latency, parse_latency, 'fixed:0'),
+        error_rate=per_endpoint(args.error_rate, _rate, '0'),
+        unauthorized_rate=per_endpoint(args.unauthorized_rate, _rate, '0'),
+        expired_quote_rate=per_endpoint(args.expired_quote_rate, _rate, '0'),
+        quote_ttl=args.quote_ttl, settle_after=args.settle_after, synthesize_unknown=not args.no_synthesize_unknown,
+        history_interval=args.history_interval, history_max_rows=args.history_max_rows,
+        max_clock_skew=args.max_clock_skew
+    )
+    print(f"Fake S3P API on http://{args.host}:{args.port}{options['prefix']} "
+          f"(token {options['public_token']!r}); stats at /_stats")
+    uvicorn.run(create_app(**options), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Load generator for the HTTP facade (/api/verifytx, /api/cashin, /api/ping).
+
+Sends a weighted mix of requests either at a fixed rate (--rate, open loop: the
+requests are sent on schedule whether or not earlier ones have answered) or
+from a fixed number of concurrent clients (--concurrency, closed loop: each
+client sends its next request once the previous one has answered). In rate
+mode latency is measured from the time a request was due, so a saturated
+server shows up as latency rather than as a lower send rate.
+
+verifytx lookups use a PTN or a TRID according to --trid-fraction. The values
+come from --ids-file, a CSV file with ptn and trid columns, or are made up
+(fake_s3p_server.py answers unknown ones). Each cashin has a new TRID.
+
+Cashins move real money unless the API is pointed at the S3P stand-in, so the
+default mix has none: a mix with cashin is refused without --allow-cashin.
+
+The report gives throughput, p50/p95/p99/max latency per endpoint and errors
+by kind (HTTP status, timeout, connection error). With --max-error-rate or
+--max-p99 the command exits with status 1 when the run exceeds them, so it can
+gate a deploy.
+
+Usage:
+    python benchmarks/load_generator.py --url http://127.0.0.1:5001 --rate 200 --duration 60
+    python benchmarks/load_generator.py --concurrency 50 --mix verifytx=80,cashin=10,ping=10 --allow-cashin
+    python benchmarks/load_generator.py --rate 100 --duration 30 --max-error-rate 0.01 --max-p99 500 --json out.json
+"""
+
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+
+import aiohttp
+
+ENDPOINTS = ('verifytx', 'cashin', 'ping')
+
+# Statuses that count as a successful answer, per endpoint
+EXPECTED_STATUS = {'verifytx': (200,), 'cashin': (201, 202), 'ping': (200,)}
+
+
+def parse_mix(value):
+    """
+    Parse "verifytx=70,cashin=10,ping=20" into {endpoint: weight}.
+    """
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint '{name}', expected one of {', '.join(ENDPOINTS)}")
+        try:
+            mix[name] = float(weight) if weight else 1.0
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid weight in '{part}'")
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("The mix needs at least one endpoint with a positive weight")
+    return mix
+
+
+def load_ids(path):
+    """
+    Read (ptn, trid) pairs from a CSV file with ptn and/or trid columns.
+    """
+    with open(path, newline='') as f:
+        rows = [(row.get('ptn') or None, row.get('trid') or None) for row in csv.DictReader(f)]
+    if not rows:
+        raise SystemExit(f"No identifiers in {path}")
+    return rows
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))]
+
+
+class LoadStats:
+    """
+    Latencies and outcomes of the requests completed after the warm-up.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.outcomes = defaultdict(Counter)
+        self.skipped = 0
+
+    def record(self, endpoint, latency, outcome):
+        self.latencies[endpoint].append(latency)
+        self.outcomes[endpoint][outcome] += 1
+
+    def completed(self):
+        return sum(len(values) for values in self.latencies.values())
+
+    def summary(self, elapsed):
+        endpoints = {}
+        for endpoint in sorted(self.latencies):
+            endpoints[endpoint] = self._summarize(self.latencies[endpoint], self.outcomes[endpoint], elapsed)
+        all_outcomes = sum(self.outcomes.values(), Counter())
+        overall = self._summarize(list(itertools.chain(*self.latencies.values())), all_outcomes, elapsed)
+        overall['skipped'] = self.skipped
+        return {'duration_s': elapsed, 'overall': overall, 'endpoints': endpoints}
+
+    @staticmethod
+    def _summarize(latencies, outcomes, elapsed):
+        latencies = sorted(latencies)
+        total = len(latencies)
+        errors = {outcome: count for outcome, count in outcomes.items() if outcome != 'ok'}
+        error_count = sum(errors.values())
+        return {
+            'requests': total,
+            'throughput_rps': total / elapsed if elapsed else 0.0,
+            'errors': error_count,
+            'error_rate': error_count / total if total else 0.0,
+            'error_breakdown': dict(sorted(errors.items(), key=lambda item: -item[1])),
+            'p50_ms': _ms(percentile(latencies, 0.50)),
+            'p95_ms': _ms(percentile(latencies, 0.95)),
+            'p99_ms': _ms(percentile(latencies, 0.99)),
+            'max_ms': _ms(latencies[-1] if latencies else None),
+            'mean_ms': _ms(sum(latencies) / total if total else None),
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+class LoadGenerator:
+    def __init__(self, args):
+        self.args = args
+        self.base_url = args.url.rstrip('/')
+        self.endpoints = [name for name, weight in args.mix.items() if weight > 0]
+        self.weights = [args.mix[name] for name in self.endpoints]
+        self.ids = load_ids(args.ids_file) if args.ids_file else None
+        self.stats = LoadStats()
+        self.sent = 0
+        self.measure_from = None
+        self.run_id = uuid.uuid4().hex[:8]
+        self._counter = itertools.count()
+
+    def _request_for(self, endpoint):
+        if endpoint == 'ping':
+            return 'GET', f"{self.base_url}/api/ping", None, None
+        if endpoint == 'verifytx':
+            use_trid = random.random() < self.args.trid_fraction
+            if self.ids:
+                ptn, trid = random.choice(self.ids)
+                value = trid if (use_trid and trid) or not ptn else ptn
+                use_trid = value == trid
+            else:
+                value = f"load-{self.run_id}-{next(self._counter)}" if use_trid else \
+                    f"{random.randrange(10 ** 31, 10 ** 32)}"
+            return 'GET', f"{self.base_url}/api/verifytx", {'trid' if use_trid else 'ptn': value}, None
+        body = {
+            'channel': self.args.cashin_channel, 'amount': self.args.cashin_amount,
+            'serviceNumber': self.args.service_number, 'customerPhonenumber': self.args.customer_phone,
+            'customerEmailaddress': 'load-test@example.com', 'trid': f"load-{self.run_id}-{next(self._counter)}"
+        }
+        params = {'async': 'true'} if self.args.cashin_async else None
+        return 'POST', f"{self.base_url}/api/cashin", params, body
+
+    async def _one(self, session, due):
+        """
+        Send one request; latency counts from `due`, the time it was scheduled for.
+        """
+        endpoint = random.choices(self.endpoints, self.weights)[0]
+        method, url, params, body = self._request_for(endpoint)
+        self.sent += 1
+        try:
+            async with session.request(method, url, params=params, json=body) as response:
+                await response.read()
+                outcome = 'ok' if response.status in EXPECTED_STATUS[endpoint] else f"HTTP {response.status}"
+        except asyncio.TimeoutError:
+            outcome = 'timeout'
+        except aiohttp.ClientError as e:
+            outcome = type(e).__name__
+        finished = time.perf_counter()
+        if due >= self.measure_from:
+            self.stats.record(endpoint, finished - due, outcome)
+
+    async def _run_rate(self, session, stop_at):
+        interval = 1.0 / self.args.rate
+        start = time.perf_counter()
+        in_flight = set()
+        for index in itertools.count():
+            due = start + index * interval
+            if due >= stop_at or (self.args.requests and index >= self.args.requests):
+                break
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) >= self.args.max_in_flight:
+                # The client itself is saturated; count the request rather than queue it
+                if due >= self.measure_from:
+                    self.stats.skipped += 1
+                continue
+            task = asyncio.ensure_future(self._one(session, due))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.wait(in_flight)
+
+    async def _run_concurrency(self, session, stop_at):
+        budget = itertools.count() if self.args.requests else None
+
+        async def client():
+            while time.perf_counter() < stop_at:
+                if budget is not None and next(budget) >= self.args.requests:
+                    return
+                await self._one(session, time.perf_counter())
+
+        await asyncio.gather(*(client() for _ in range(self.args.concurrency)))
+
+    async def _progress(self):
+        last_completed, last_time = 0, time.perf_counter()
+        while True:
+            await asyncio.sleep(self.args.report_interval)
+            now, completed = time.perf_counter(), self.stats.completed()
+            errors = sum(sum(count for outcome, count in counter.items() if outcome != 'ok')
+                         for counter in self.stats.outcomes.values())
+            print(f"  {completed:>8} done  {(completed - last_completed) / (now - last_time):>8.1f} req/s  "
+                  f"{errors} errors", file=sys.stderr)
+            last_completed, last_time = completed, now
+
+    async def run(self):
+        timeout = aiohttp.ClientTimeout(total=self.args.timeout)
+        connector = aiohttp.TCPConnector(limit=self.args.max_in_flight if self.args.rate else self.args.concurrency)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            start = time.perf_counter()
+            self.measure_from = start + self.args.warmup
+            stop_at = start + self.args.warmup + self.args.duration
+            progress = asyncio.ensure_future(self._progress()) if self.args.report_interval else None
+            try:
+                if self.args.rate:
+                    await self._run_rate(session, stop_at)
+                else:
+                    await self._run_concurrency(session, stop_at)
+            finally:
+                if progress is not None:
+                    progress.cancel()
+            elapsed = time.perf_counter() - max(self.measure_from, start)
+        return self.stats.summary(elapsed)
+
+
+def print_report(summary, args):
+    mode = f"rate {args.rate:g} req/s" if args.rate else f"concurrency {args.concurrency}"
+    overall = summary['overall']
+    print(f"\n{mode}, {summary['duration_s']:.1f} s measured, {overall['requests']} requests, "
+          f"{overall['throughput_rps']:.1f} req/s, {overall['error_rate']:.2%} errors")
+    if overall['skipped']:
+        print(f"{overall['skipped']} requests not sent: --max-in-flight ({args.max_in_flight}) was reached")
+    header = f"\n{'endpoint':<10} {'requests':>9} {'req/s':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    print(header)
+    rows = list(summary['endpoints'].items()) + [('all', overall)]
+    for name, stats in rows:
+        figures = ' '.join(f"{stats[key]:>9.1f}" if stats[key] is not None else f"{'-':>9}"
+                           for key in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms'))
+        print(f"{name:<10} {stats['requests']:>9} {stats['throughput_rps']:>8.1f} {stats['errors']:>7} {figures}")
+    if overall['error_breakdown']:
+        print('\nerrors:')
+        for name, stats in summary['endpoints'].items():
+            for outcome, count in stats['error_breakdown'].items():
+                print(f"  {name:<10} {outcome:<30} {count:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=f"http://127.0.0.1:{os.getenv('PORT', '5001')}", help='Base URL of the API')
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument('--rate', type=float, help='Requests per second (open loop)')
+    load.add_argument('--concurrency', type=int, default=10, help='Concurrent clients (closed loop, default 10)')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds measured, after the warm-up')
+    parser.add_argument('--warmup', type=float, default=0.0, help='Seconds of load before measuring starts')
+    parser.add_argument('--requests', type=int, help='Stop after this many requests, even if time is left')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('verifytx=90,ping=10'),
+                        help='Weights per endpoint (default verifytx=90,ping=10)')
+    parser.add_argument('--allow-cashin', action='store_true',
+                        help='Allow cashins in the mix; only use it against the S3P stand-in or a sandbox')
+    parser.add_argument('--trid-fraction', type=float, default=0.5, help='Fraction of verifytx lookups by TRID')
+    parser.add_argument('--ids-file', help='CSV file with ptn and trid columns to look up')
+    parser.add_argument('--cashin-channel', default='MTN', help='Cashin channel: MTN or ORANGE')
+    parser.add_argument('--cashin-amount', type=float, default=100)
+    parser.add_argument('--cashin-async', action='store_true', help='Submit cashins with ?async=true')
+    parser.add_argument('--service-number', default='690000000')
+    parser.add_argument('--customer-phone', default='237690000000')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Seconds before a request counts as timed out')
+    parser.add_argument('--max-in-flight', type=int, default=1000, help='Outstanding requests allowed in rate mode')
+    parser.add_argument('--report-interval', type=float, default=5.0, help='Seconds between progress lines; 0 disables')
+    parser.add_argument('--json', help='Also write the report as JSON to this file')
+    parser.add_argument('--max-error-rate', type=float, help='Exit with status 1 above this error rate')
+    parser.add_argument('--max-p99', type=float, help='Exit with status 1 above this overall p99, in milliseconds')
+    args = parser.parse_args()
+    if args.rate is not None and args.rate <= 0:
+        parser.error('--rate must be positive')
+    if not 0 <= args.trid_fraction <= 1:
+        parser.error('--trid-fraction must be between 0 and 1')
+    if args.mix.get('cashin', 0) > 0 and not args.allow_cashin:
+        parser.error('cashins send real payouts; pass --allow-cashin to include them in the mix')
+
+    summary = asyncio.run(LoadGenerator(args).run())
+    print_report(summary, args)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'arguments': vars(args), **summary}, f, indent=2)
+
+    overall = summary['overall']
+    failures = []
+    if args.max_error_rate is not None and overall['error_rate'] > args.max_error_rate:
+        failures.append(f"error rate {overall['error_rate']:.2%} above {args.max_error_rate:.2%}")
+    if args.max_p99 is not None and (overall['p99_ms'] or 0) > args.max_p99:
+        failures.append(f"p99 {overall['p99_ms']:.1f} ms above {args.max_p99:g} ms")
+    if failures:
+        print(f"\nFAILED: {'; '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark for verifytx/history payloads.
+
+Compares the hand-written per-field dict building that app.py used before
+(with hasattr/isoformat checks, followed by the standard json module) against
+the compiled encoders of json_serializer, and reports rows per second for a
+payload of PaymentStatusModel and PaymentHistoryModel rows. The fast path uses
+orjson when it is installed.
+
+Usage:
+    python benchmarks/serialization_benchmark.py [--rows 10000] [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json_serializer
+from json_serializer import dumps, get_encoder
+from models.payment_history_model import PaymentHistoryModel
+from models.payment_status_model import PaymentStatusModel
+
+
+def legacy_serialize(status):
+    return {
+        "ptn": status.ptn,
+        "serviceid": status.serviceid,
+        "merchant": status.merchant,
+        "timestamp": status.timestamp.isoformat() if status.timestamp and hasattr(status.timestamp, 'isoformat') else str(status.timestamp) if status.timestamp else None,
+        "receiptNumber": status.receiptNumber,
+        "veriCode": status.veriCode,
+        "clearingDate": status.clearingDate.isoformat() if status.clearingDate and hasattr(status.clearingDate, 'isoformat') else str(status.clearingDate) if status.clearingDate else None,
+        "trid": status.trid,
+        "priceLocalCur": status.priceLocalCur,
+        "priceSystemCur": status.priceSystemCur,
+        "localCur": status.localCur,
+        "systemCur": status.systemCur,
+        "pin": status.pin,
+        "status": status.status,
+        "payItemId": status.payItemId,
+        "payItemDescr": status.payItemDescr,
+        "errorCode": status.errorCode,
+        "tag": status.tag
+    }
+
+
+def make_rows(model_class, count):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        model_class(
+            ptn=f"99999166542651400095315{index:09d}", serviceid="20053", merchant="MTNMOMO",
+            timestamp=start + timedelta(seconds=index), receiptNumber=f"R{index}", veriCode=f"V{index}",
+            clearingDate=start + timedelta(seconds=index, minutes=5), trid=f"trid-{index}",
+            priceLocalCur=1000.0 + index % 7, priceSystemCur=1000.0, localCur="XAF", systemCur="XAF", pin="",
+            status="SUCCESS", payItemId="S-112-951-MTNMOMO-20053-200050001-1", payItemDescr="Cash in",
+            errorCode=0, tag=""
+        )
+        for index in range(count)
+    ]
+
+
+def legacy_payload(rows):
+    if all(isinstance(row, (PaymentStatusModel, PaymentHistoryModel)) for row in rows):
+        data = []
+        for row in rows:
+            data.append(legacy_serialize(row))
+        return json.dumps({"status": "success", "data": data}).encode('utf-8')
+
+
+def compiled_payload(rows):
+    encode = get_encoder(type(rows[0]))
+    return dumps({"status": "success", "data": [encode(row) for row in rows]})
+
+
+def measure(func, rows, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(rows)
+        samples.append(time.perf_counter() - start)
+    return len(rows) / statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    backend = "orjson" if json_serializer.orjson is not None else "json (install orjson for the fast backend)"
+    print(f"JSON backend: {backend}")
+    for model_class in (PaymentStatusModel, PaymentHistoryModel):
+        rows = make_rows(model_class, args.rows)
+        assert json.loads(legacy_payload(rows)) == json.loads(compiled_payload(rows)), "payloads differ"
+        legacy = measure(legacy_payload, rows, args.runs)
+        compiled = measure(compiled_payload, rows, args.runs)
+        print(f"{model_class.__name__:<22} {args.rows} rows   legacy {legacy:12,.0f} rows/s   "
+              f"compiled {compiled:12,.0f} rows/s   speed-up {compiled / legacy:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for S3P request signing.
+
+Compares the per-call HMACSignature path with the precomputed S3RequestSigner
+used by S3ApiAuth, checks that both produce identical signatures, and reports
+signatures per second for a single thread and for several concurrent threads.
+
+Usage:
+    python benchmarks/signing_benchmark.py [--iterations 100000] [--threads 4]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from s3_api_auth import HMACSignature, S3ApiAuth, S3RequestSigner
+
+API_URL = "https://s3p.smobilpay.staging.maviance.info/v2/verifytx"
+PUBLIC_TOKEN = "benchmark-public-token"
+SECRET_KEY = "benchmark-secret-key"
+PARAMS = {'ptn': '99999166542651400095315364801168', 'trid': 'eabd12-7494984-494044-d0'}
+
+
+def legacy_header(nonce, timestamp):
+    parameters = {
+        's3pAuth_nonce': nonce,
+        's3pAuth_signature_method': "HMAC-SHA1",
+        's3pAuth_timestamp': timestamp,
+        's3pAuth_token': PUBLIC_TOKEN,
+        **PARAMS
+    }
+    return HMACSignature('GET', API_URL, parameters).generate(SECRET_KEY)
+
+
+def check_equivalence():
+    signer = S3RequestSigner(PUBLIC_TOKEN, SECRET_KEY)
+    for params in ({}, PARAMS, {'amount': 1500, 'payItemId': 'S-112-951-CMORANGE-20062-CM_ORANGE_VTU_CUSTOM-1'}):
+        expected = HMACSignature('POST', API_URL, {
+            's3pAuth_nonce': '1', 's3pAuth_signature_method': 'HMAC-SHA1',
+            's3pAuth_timestamp': '2', 's3pAuth_token': PUBLIC_TOKEN, **params
+        }).generate(SECRET_KEY)
+        assert signer.sign('POST', API_URL, '1', '2', params) == expected, params
+
+
+def run(label, func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {iterations / elapsed:>12,.0f} signatures/s  ({elapsed / iterations * 1e6:.2f} us/op)")
+    return elapsed
+
+
+def run_threaded(label, func, iterations, threads):
+    per_thread = iterations // threads
+
+    def worker(_):
+        for _ in range(per_thread):
+            func()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(worker, range(threads)))
+    elapsed = time.perf_counter() - start
+    total = per_thread * threads
+    print(f"{label:<40} {total / elapsed:>12,.0f} signatures/s  ({threads} threads)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=100000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    os.environ['SMOBIL_PAY_API_DEBUG'] = 'False'
+    check_equivalence()
+
+    auth = S3ApiAuth(API_URL, PUBLIC_TOKEN, SECRET_KEY)
+    legacy = run("HMACSignature (per call)", lambda: legacy_header(auth.timestamp(), auth.timestamp()), args.iterations)
+    current = run("S3ApiAuth.create_authorization_header", lambda: auth.create_authorization_header('GET', PARAMS),
+                  args.iterations)
+    print(f"Speed-up: {legacy / current:.2f}x")
+    run_threaded("S3ApiAuth.create_authorization_header", lambda: auth.create_authorization_header('GET', PARAMS),
+                 args.iterations, args.threads)
+
+    nonces = set()
+    run_threaded("S3RequestSigner.nonce uniqueness", lambda: nonces.add(auth.signer.nonce()),
+                 args.iterations, args.threads)
+    expected = (args.iterations // args.threads) * args.threads
+    print(f"Unique nonces: {len(nonces):,} of {expected:,}")
+
+
+if __name__ == "__main__":
+    main()
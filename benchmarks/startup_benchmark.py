@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark.
+
+Measures:
+1. Constructing every service with a fresh Configuration each time (the
+   previous behaviour) versus sharing the process-wide configuration.
+2. Cold-start time of importing app.py in a fresh interpreter, which is what a
+   Cloud Run instance pays before serving its first request.
+
+Placeholder credentials are used when none are set, so no network access or
+real API key is needed.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs 10]
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+os.environ.setdefault('SMOBIL_PAY_API_KEY', 'benchmark-key')
+os.environ.setdefault('SMOBIL_PAY_API_SECRET', 'benchmark-secret')
+os.environ.setdefault('SMOBIL_PAY_API_URL', 'http://127.0.0.1:9/v2')
+
+import configuration
+from configuration import Configuration, get_configuration
+from services.account_service import AccountService
+from services.bill_service import BillService
+from services.cashin_service import CashinService
+from services.cashout_service import CashoutService
+from services.collection_service import CollectionService
+from services.merchant_service import MerchantService
+from services.payment_history_service import PaymentHistoryService
+from services.payment_status_service import PaymentStatusService
+from services.ping_service import PingService
+from services.product_service import ProductService
+from services.quote_service import QuoteService
+from services.service_api import ServiceApi
+from services.service_number_verification_api import ServiceNumberVerificationApi
+from services.subscription_service import SubscriptionService
+from services.topup_service import TopupService
+from services.voucher_service import VoucherService
+
+SERVICES = [
+    AccountService, BillService, CashinService, CashoutService, CollectionService, MerchantService,
+    PaymentHistoryService, PaymentStatusService, PingService, ProductService, QuoteService, ServiceApi,
+    ServiceNumberVerificationApi, SubscriptionService, TopupService, VoucherService
+]
+
+
+def build_all_services():
+    return [service() for service in SERVICES]
+
+
+def time_services(runs, per_service_config):
+    samples = []
+    for _ in range(runs):
+        configuration._configuration = None
+        start = time.perf_counter()
+        if per_service_config:
+            # Previous behaviour: every constructor loaded its own Configuration
+            for _ in SERVICES:
+                Configuration()
+        build_all_services()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def time_app_import(runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'import app'], cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(label, samples):
+    print(f"{label:<48} median {statistics.median(samples) * 1000:8.2f} ms   min {min(samples) * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    get_configuration()
+
+    per_service = time_services(args.runs, per_service_config=True)
+    shared = time_services(args.runs, per_service_config=False)
+    report(f"{len(SERVICES)} services, one Configuration each", per_service)
+    report(f"{len(SERVICES)} services, shared Configuration", shared)
+    print(f"Speed-up: {statistics.median(per_service) / statistics.median(shared):.1f}x")
+
+    report("Cold start: python -c 'import app'", time_app_import(args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Pay a file of cashins (CSV or NDJSON) with resumable progress.
+
+Each row needs the fields of POST /api/cashin: channel, amount, serviceNumber,
+customerPhonenumber, customerEmailaddress and trid. Progress is kept in a
+SQLite file next to the input (or --state); if the run is interrupted, run
+the same command again: finished rows are skipped, and rows whose payment may
+already have been sent are checked with verifytx instead of being paid again.
+
+Per-row results are written as NDJSON to stdout (or --output) as they finish,
+and progress and throughput are reported on stderr.
+
+Usage:
+    python cashin_batch.py payouts.csv [--concurrency 8] [--output results.ndjson]
+    python cashin_batch.py payouts.ndjson --state payouts.progress.db --retry-failed
+"""
+import argparse
+import logging
+import sys
+import time
+
+from configuration import get_configuration
+from json_serializer import dumps
+from services.cashin_batch_service import CashinBatchError, CashinBatchService, read_cashin_rows
+
+
+def main():
+    config = get_configuration()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='CSV or NDJSON file of cashins')
+    parser.add_argument('--format', choices=('csv', 'ndjson'), help='Input format (default: from the file extension)')
+    parser.add_argument('--state', help='Progress file (default: <input>.progress.db)')
+    parser.add_argument('--concurrency', type=int, default=config.cashin_batch_concurrency,
+                        help='Cashins processed in parallel')
+    parser.add_argument('--retry-failed', action='store_true',
+                        help='Send again the rows that failed before any payment was requested')
+    parser.add_argument('--output', help='Write the per-row results here instead of stdout')
+    parser.add_argument('--report-interval', type=float, default=10.0, help='Seconds between progress lines')
+    args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error('--concurrency must be positive')
+
+    batch = CashinBatchService(args.state or f"{args.input}.progress.db", max_workers=args.concurrency)
+    output = open(args.output, 'ab') if args.output else sys.stdout.buffer
+    results = batch.run(read_cashin_rows(args.input, args.format), retry_failed=args.retry_failed)
+    last_report = time.perf_counter()
+    try:
+        for row in results:
+            output.write(dumps(row.to_dict()) + b"\n")
+            output.flush()
+            if time.perf_counter() - last_report >= args.report_interval:
+                last_report = time.perf_counter()
+                print(f"{batch.stats['rows']} rows done, {batch.stats['sent']} sent, "
+                      f"{batch.stats[batch.SUCCEEDED]} succeeded, {batch.stats[batch.FAILED]} failed, "
+                      f"{batch.stats[batch.UNCERTAIN]} uncertain", file=sys.stderr)
+    except CashinBatchError as e:
+        logging.error(str(e))
+        sys.exit(2)
+    except KeyboardInterrupt:
+        print("Interrupted; rows in flight were recorded, run the same command again to resume", file=sys.stderr)
+        sys.exit(130)
+    finally:
+        # Waits for the rows in flight to record their outcome before the progress file is closed
+        results.close()
+        if args.output:
+            output.close()
+        batch.close()
+
+    stats = batch.stats
+    print(f"{stats['rows']} rows in {stats['elapsed_s']:.1f}s: {stats['sent']} sent "
+          f"({stats['rows_per_second']:.1f}/s), {stats[batch.SUCCEEDED]} succeeded, {stats[batch.FAILED]} failed, "
+          f"{stats[batch.UNCERTAIN]} uncertain, {stats[batch.INVALID]} invalid, {stats['resumed']} from earlier runs",
+          file=sys.stderr)
+    if stats[batch.UNCERTAIN]:
+        print("Run again later to resolve the uncertain rows with verifytx", file=sys.stderr)
+    sys.exit(0 if not (stats[batch.FAILED] or stats[batch.UNCERTAIN] or stats[batch.INVALID]) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import logging
+import threading
+import time
+
+import requests
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of calling an endpoint whose circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast while an upstream endpoint keeps failing.
+
+    After failure_threshold consecutive failures the circuit opens and every
+    call is rejected for recovery_timeout seconds. The circuit then becomes
+    half-open: a single probe call is let through, which closes the circuit
+    when it succeeds and opens it again when it fails.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30.0, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def allow_request(self):
+        """
+        Return True if a call may be made now. In half-open state only one probe is allowed at a time.
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = True
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logging.info("Circuit for %s closed", self.name)
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            # Late failures of calls made before the circuit opened do not extend the open period
+            if self._state != self.OPEN and (self._state == self.HALF_OPEN or self._failures >= self.failure_threshold):
+                logging.warning("Circuit for %s opened after %s consecutive failure(s)", self.name, self._failures)
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """
+        End a call that neither succeeded nor failed (e.g. it was cancelled), so the next call may probe.
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self._current_state(),
+                'consecutive_failures': self._failures,
+                'rejected': self._rejected
+            }
+
+    def _current_state(self):
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.recovery_timeout:
+            return self.HALF_OPEN
+        return self._state
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(endpoint, config):
+    """
+    Return the process-wide circuit breaker of an endpoint (e.g. "verifytx"),
+    shared by the synchronous transport and the async client.
+    """
+    breaker = _breakers.get(endpoint)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(endpoint)
+            if breaker is None:
+                breaker = _breakers[endpoint] = CircuitBreaker(
+                    endpoint,
+                    failure_threshold=config.circuit_failure_threshold,
+                    recovery_timeout=config.circuit_recovery_timeout
+                )
+    return breaker
+
+
+def circuit_breaker_stats():
+    """
+    Return the state of every circuit breaker created so far, by endpoint.
+    """
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {endpoint: breaker.stats() for endpoint, breaker in breakers.items()}
@@ -1,11 +1,21 @@
 import os
+import threading
 from dotenv import load_dotenv
 import logging
 
+from sdk_logging import LOG_FORMAT, configure_logging
+
 class Configuration:
+    """
+    Settings read from the environment.
+
+    Instances are immutable once initialized. Use get_configuration() to share
+    the process-wide instance instead of loading the environment again.
+    """
+
     def __init__(self):
         # Initialize logging
-        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
 
         # Load environment variables
         load_dotenv()
@@ -15,30 +25,132 @@ class Configuration:
         if self.debug_mode:
             logging.getLogger().setLevel(logging.DEBUG)  # Set logging to debug level if debug mode is enabled
 
+        # Logging: background queue, its size, and the fraction of per-request records kept
+        self.log_async = os.getenv('SMOBIL_PAY_LOG_ASYNC', 'True').lower() == 'true'
+        self.log_queue_size = int(os.getenv('SMOBIL_PAY_LOG_QUEUE_SIZE', '10000'))
+        self.log_request_sample_rate = float(os.getenv('SMOBIL_PAY_LOG_REQUEST_SAMPLE_RATE', '0.1'))
+        configure_logging(
+            use_queue=self.log_async,
+            queue_size=self.log_queue_size,
+            request_sample_rate=self.log_request_sample_rate,
+            secrets=(os.getenv('SMOBIL_PAY_API_KEY'), os.getenv('SMOBIL_PAY_API_SECRET'))
+        )
+
         # Setting up configurations from environment variables
         self.live_mode = os.getenv('SMOBIL_PAY_LIVE_MODE', 'True').lower() == 'true'
         self.base_url = os.getenv('SMOBIL_PAY_API_URL_STAGING') if not self.live_mode else os.getenv('SMOBIL_PAY_API_URL')
         self.api_version = os.getenv('SMOBIL_PAY_API_VERSION', '3.0.5')
 
+        # Shared HTTP transport settings (connection pool size and timeouts in seconds)
+        self.http_pool_connections = int(os.getenv('SMOBIL_PAY_HTTP_POOL_CONNECTIONS', '10'))
+        self.http_pool_maxsize = int(os.getenv('SMOBIL_PAY_HTTP_POOL_MAXSIZE', '20'))
+        self.http_connect_timeout = float(os.getenv('SMOBIL_PAY_HTTP_CONNECT_TIMEOUT', '5'))
+        self.http_read_timeout = float(os.getenv('SMOBIL_PAY_HTTP_READ_TIMEOUT', '30'))
+        self.async_connection_limit = int(os.getenv('SMOBIL_PAY_ASYNC_CONNECTION_LIMIT', '100'))
+
+        # Upstream resilience: per-endpoint timeouts as "endpoint=connect:read,...", retries of idempotent GETs
+        # and per-endpoint circuit breakers (delays in seconds)
+        self.http_endpoint_timeouts = _parse_endpoint_timeouts(os.getenv(
+            'SMOBIL_PAY_HTTP_ENDPOINT_TIMEOUTS', 'ping=3:5,verifytx=3:10,account=3:10,collectstd=5:60,historystd=5:120'))
+        self.http_retry_endpoints = tuple(
+            name.strip() for name in os.getenv('SMOBIL_PAY_HTTP_RETRY_ENDPOINTS', 'verifytx,bill,service,account').split(',')
+            if name.strip()
+        )
+        self.http_max_retries = int(os.getenv('SMOBIL_PAY_HTTP_MAX_RETRIES', '2'))
+        self.http_retry_base_delay = float(os.getenv('SMOBIL_PAY_HTTP_RETRY_BASE_DELAY', '0.2'))
+        self.http_retry_max_delay = float(os.getenv('SMOBIL_PAY_HTTP_RETRY_MAX_DELAY', '2'))
+        self.circuit_failure_threshold = int(os.getenv('SMOBIL_PAY_CIRCUIT_FAILURE_THRESHOLD', '5'))
+        self.circuit_recovery_timeout = float(os.getenv('SMOBIL_PAY_CIRCUIT_RECOVERY_TIMEOUT', '30'))
+
+        # Batch transaction verification limits
+        self.verifytx_batch_concurrency = int(os.getenv('SMOBIL_PAY_VERIFYTX_BATCH_CONCURRENCY', '10'))
+        self.verifytx_batch_max_items = int(os.getenv('SMOBIL_PAY_VERIFYTX_BATCH_MAX_ITEMS', '1000'))
+
+        # verifytx result cache: terminal statuses are kept long, others only briefly (seconds)
+        self.verifytx_cache_max_entries = int(os.getenv('SMOBIL_PAY_VERIFYTX_CACHE_MAX_ENTRIES', '10000'))
+        self.verifytx_cache_terminal_ttl = float(os.getenv('SMOBIL_PAY_VERIFYTX_CACHE_TERMINAL_TTL', '86400'))
+        self.verifytx_cache_pending_ttl = float(os.getenv('SMOBIL_PAY_VERIFYTX_CACHE_PENDING_TTL', '2'))
+
+        # Master data cache (seconds)
+        self.masterdata_cache_ttl = float(os.getenv('SMOBIL_PAY_MASTERDATA_CACHE_TTL', '3600'))
+        self.masterdata_cache_stale_ttl = float(os.getenv('SMOBIL_PAY_MASTERDATA_CACHE_STALE_TTL', '600'))
+        self.masterdata_cache_negative_ttl = float(os.getenv('SMOBIL_PAY_MASTERDATA_CACHE_NEGATIVE_TTL', '300'))
+
+        # Cashin time budget: overall deadline of quote + collect, and the least time left for collect to be sent (seconds)
+        self.cashin_deadline = float(os.getenv('SMOBIL_PAY_CASHIN_DEADLINE', '60'))
+        self.cashin_collect_min_time = float(os.getenv('SMOBIL_PAY_CASHIN_COLLECT_MIN_TIME', '5'))
+
+        # Asynchronous cashin jobs
+        self.cashin_workers = int(os.getenv('SMOBIL_PAY_CASHIN_WORKERS', '4'))
+        self.cashin_max_pending_jobs = int(os.getenv('SMOBIL_PAY_CASHIN_MAX_PENDING_JOBS', '100'))
+        self.cashin_job_ttl = float(os.getenv('SMOBIL_PAY_CASHIN_JOB_TTL', '3600'))
+        self.cashin_max_stored_jobs = int(os.getenv('SMOBIL_PAY_CASHIN_MAX_STORED_JOBS', '10000'))
+
+        # Cashin idempotency by trid
+        self.cashin_idempotency = os.getenv('SMOBIL_PAY_CASHIN_IDEMPOTENCY', 'True').lower() == 'true'
+        self.cashin_idempotency_ttl = float(os.getenv('SMOBIL_PAY_CASHIN_IDEMPOTENCY_TTL', '86400'))
+        self.cashin_idempotency_max_entries = int(os.getenv('SMOBIL_PAY_CASHIN_IDEMPOTENCY_MAX_ENTRIES', '100000'))
+        self.cashin_idempotency_path = os.getenv('SMOBIL_PAY_CASHIN_IDEMPOTENCY_PATH', '')
+        self.cashin_idempotency_max_stored = int(os.getenv('SMOBIL_PAY_CASHIN_IDEMPOTENCY_MAX_STORED', '1000000'))
+
+        # Bulk cashin batches
+        self.cashin_batch_dir = os.getenv('SMOBIL_PAY_CASHIN_BATCH_DIR', 'cashin_batches')
+        self.cashin_batch_concurrency = int(os.getenv('SMOBIL_PAY_CASHIN_BATCH_CONCURRENCY', '4'))
+        self.cashin_batch_max_rows = int(os.getenv('SMOBIL_PAY_CASHIN_BATCH_MAX_ROWS', '1000'))
+
+        # Windowed payment history retrieval
+        self.history_window_hours = float(os.getenv('SMOBIL_PAY_HISTORY_WINDOW_HOURS', '24'))
+        self.history_concurrency = int(os.getenv('SMOBIL_PAY_HISTORY_CONCURRENCY', '4'))
+
+        # Local payment history store and its incremental sync
+        self.history_store_path = os.getenv('SMOBIL_PAY_HISTORY_STORE_PATH', 'payment_history.db')
+        self.history_sync_lookback_days = float(os.getenv('SMOBIL_PAY_HISTORY_SYNC_LOOKBACK_DAYS', '30'))
+        self.history_sync_overlap = float(os.getenv('SMOBIL_PAY_HISTORY_SYNC_OVERLAP', '3600'))
+
+        # Bulk reconciliation
+        self.reconciliation_amount_tolerance = float(os.getenv('SMOBIL_PAY_RECONCILIATION_AMOUNT_TOLERANCE', '0.01'))
+        self.reconciliation_max_in_memory = int(os.getenv('SMOBIL_PAY_RECONCILIATION_MAX_IN_MEMORY', '500000'))
+        self.reconciliation_partitions = int(os.getenv('SMOBIL_PAY_RECONCILIATION_PARTITIONS', '64'))
+
+        # ASGI server (asgi_server.py); Cloud Run provides PORT
+        self.server_host = os.getenv('SMOBIL_PAY_SERVER_HOST', '0.0.0.0')
+        self.server_port = int(os.getenv('PORT', '5001'))
+        self.server_workers = int(os.getenv('SMOBIL_PAY_SERVER_WORKERS', '1'))
+        self.server_graceful_timeout = float(os.getenv('SMOBIL_PAY_SERVER_GRACEFUL_TIMEOUT', '8'))
+        self.server_forwarded_allow_ips = os.getenv('SMOBIL_PAY_SERVER_FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+        # Background transaction status tracking (seconds)
+        self.tracker_initial_delay = float(os.getenv('SMOBIL_PAY_TRACKER_INITIAL_DELAY', '5'))
+        self.tracker_max_delay = float(os.getenv('SMOBIL_PAY_TRACKER_MAX_DELAY', '300'))
+        self.tracker_max_age = float(os.getenv('SMOBIL_PAY_TRACKER_MAX_AGE', '86400'))
+        self.tracker_batch_size = int(os.getenv('SMOBIL_PAY_TRACKER_BATCH_SIZE', '50'))
+        self.tracker_max_tracked = int(os.getenv('SMOBIL_PAY_TRACKER_MAX_TRACKED', '10000'))
+
         # Log the mode of operation and debug status
         logging.info(f"Configuration initialized in {'live' if self.live_mode else 'staging'} mode.")
         logging.debug(f"Debug mode is {'enabled' if self.debug_mode else 'disabled'}.")
 
         # Ensure required environment variables are set
         self._validate_environment()
+        self._api_key = os.getenv('SMOBIL_PAY_API_KEY')
+        self._api_secret = os.getenv('SMOBIL_PAY_API_SECRET')
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError(f"Configuration is immutable; cannot set '{name}'")
+        super().__setattr__(name, value)
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Configuration is immutable; cannot delete '{name}'")
 
     def get_api_key(self):
-        key = os.getenv('SMOBIL_PAY_API_KEY')
-        logging.debug(f"API Key retrieved: {key}")
-        return key
+        return self._api_key
 
     def get_api_secret(self):
-        secret = os.getenv('SMOBIL_PAY_API_SECRET')
-        logging.debug(f"API Secret retrieved: {secret}")
-        return secret
+        return self._api_secret
 
     def get_api_url(self):
-        logging.debug(f"API URL retrieved: {self.base_url}")
         return self.base_url
 
     def _validate_environment(self):
@@ -48,3 +160,36 @@ class Configuration:
             error_message = f"Missing required environment variables: {', '.join(missing_vars)}"
             logging.error(error_message)
             raise EnvironmentError(error_message)
+
+
+def _parse_endpoint_timeouts(value):
+    """
+    Parse "verifytx=3:10,collectstd=5:60" into {'verifytx': (3.0, 10.0), 'collectstd': (5.0, 60.0)}.
+    """
+    timeouts = {}
+    for entry in value.split(','):
+        if not entry.strip():
+            continue
+        try:
+            endpoint, timeout = entry.split('=', 1)
+            connect, read = timeout.split(':', 1)
+            timeouts[endpoint.strip()] = (float(connect), float(read))
+        except ValueError:
+            raise EnvironmentError(f"Invalid endpoint timeout '{entry.strip()}', expected endpoint=connect:read")
+    return timeouts
+
+
+_configuration = None
+_configuration_lock = threading.Lock()
+
+
+def get_configuration():
+    """
+    Return the process-wide Configuration, loading the environment on first use.
+    """
+    global _configuration
+    if _configuration is None:
+        with _configuration_lock:
+            if _configuration is None:
+                _configuration = Configuration()
+    return _configuration
@@ -0,0 +1,149 @@
+import logging
+import sys
+import threading
+import typing
+from dataclasses import fields
+from datetime import datetime, timezone
+
+# datetime.fromisoformat understands "Z" and every ISO 8601 variant from Python 3.11 on
+_FROMISOFORMAT_IS_FULL = sys.version_info >= (3, 11)
+
+DEFAULT_FORMATS = (
+    'iso',
+    '%Y-%m-%dT%H:%M:%S.%f%z',
+    '%Y-%m-%dT%H:%M:%S%z',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d',
+)
+
+
+if _FROMISOFORMAT_IS_FULL:
+    _parse_iso = datetime.fromisoformat
+else:
+    def _parse_iso(value):
+        if value.endswith('Z'):
+            return datetime.fromisoformat(value[:-1]).replace(tzinfo=timezone.utc)
+        return datetime.fromisoformat(value)
+
+
+class DatetimeDecoder:
+    """
+    Turns the date strings of S3P responses into datetime objects.
+
+    Formats are tried in order, but the decoder remembers which one matched for
+    each field and tries that one first next time, so a response where every
+    row uses the same layout costs a single parse per value. "Z" and numeric
+    UTC offsets produce timezone-aware datetimes.
+    """
+
+    def __init__(self, formats=DEFAULT_FORMATS):
+        """
+        Args:
+            formats (tuple): strptime formats to try, where 'iso' stands for datetime.fromisoformat
+        """
+        self.formats = tuple(formats)
+        self._parsers = tuple(
+            _parse_iso if fmt == 'iso' else (lambda value, fmt=fmt: datetime.strptime(value, fmt))
+            for fmt in self.formats
+        )
+        self._first_parser = self._parsers[0]
+        self._preferred = {}
+        self._fields_by_model = {}
+        self._lock = threading.Lock()
+
+    def decode(self, value, field=None):
+        """
+        Parse one date value.
+
+        Args:
+            value: The raw value; datetime objects are returned unchanged
+            field (str): Name of the field, used to remember the matching format
+
+        Returns:
+            datetime or None if the value is empty or matches no format
+        """
+        if value.__class__ is str and value:
+            try:
+                return self._preferred.get(field, self._first_parser)(value)
+            except ValueError:
+                return self._search(value, field)
+        if isinstance(value, datetime):
+            return value
+        return None
+
+    def decode_record(self, record, model_class):
+        """
+        Parse, in place, every date field of model_class found in a decoded JSON record.
+
+        Empty strings, and values that match no format, become None; the latter are logged.
+
+        Args:
+            record (dict): One item of an API response
+            model_class: Dataclass whose datetime-annotated fields should be parsed
+
+        Returns:
+            dict: The same record, for use as Model(**decoder.decode_record(item, Model))
+        """
+        preferred = self._preferred
+        for name, field in self._record_fields(model_class):
+            value = record.get(name)
+            if value.__class__ is not str:
+                continue
+            if not value:
+                record[name] = None
+                continue
+            try:
+                record[name] = preferred.get(field, self._first_parser)(value)
+            except ValueError:
+                parsed = self._search(value, field)
+                if parsed is None:
+                    logging.warning("Unparseable date in %s: %r, decoded as None", field, value)
+                record[name] = parsed
+        return record
+
+    def _search(self, value, field):
+        current = self._preferred.get(field, self._first_parser)
+        for parser in self._parsers:
+            if parser is current:
+                continue
+            try:
+                parsed = parser(value)
+            except ValueError:
+                continue
+            self._preferred[field] = parser
+            return parsed
+        return None
+
+    def datetime_fields(self, model_class):
+        """
+        Return the names of the fields of model_class annotated as datetime (or Optional[datetime]).
+        """
+        return tuple(name for name, _ in self._record_fields(model_class))
+
+    def preferred_formats(self):
+        """
+        Return the format currently tried first for each field that has been decoded.
+        """
+        return {field: self.formats[self._parsers.index(parser)] for field, parser in list(self._preferred.items())}
+
+    def _record_fields(self, model_class):
+        # (field name, key under which its format is remembered) for each date field
+        entries = self._fields_by_model.get(model_class)
+        if entries is None:
+            with self._lock:
+                entries = self._fields_by_model[model_class] = tuple(
+                    (field.name, f"{model_class.__name__}.{field.name}") for field in fields(model_class)
+                    if field.type is datetime or datetime in typing.get_args(field.type)
+                )
+        return entries
+
+
+_shared_decoder = DatetimeDecoder()
+
+
+def get_datetime_decoder():
+    """
+    Return the process-wide decoder shared by every service.
+    """
+    return _shared_decoder
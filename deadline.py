@@ -0,0 +1,41 @@
+import time
+
+
+class Deadline:
+    """
+    A point in time by which a multi-step operation must be finished.
+
+    Created from a time budget in seconds and passed down through each step,
+    which uses remaining() or timeout() to bound its own upstream calls.
+    """
+
+    def __init__(self, seconds, clock=time.monotonic):
+        """
+        Args:
+            seconds (float): Time budget, starting now
+            clock (callable): Monotonic clock in seconds
+        """
+        self._clock = clock
+        self.expires_at = clock() + seconds
+
+    def remaining(self):
+        """
+        Return the seconds left before the deadline, never negative.
+        """
+        return max(0.0, self.expires_at - self._clock())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, timeout):
+        """
+        Clamp a requests-style timeout, a number or a (connect, read) tuple, to the remaining budget.
+        """
+        # HTTP clients reject a zero timeout; an expired deadline still fails the call almost at once
+        remaining = max(self.remaining(), 0.001)
+        if isinstance(timeout, tuple):
+            return tuple(min(value, remaining) for value in timeout)
+        return min(timeout, remaining)
+
+    def __repr__(self):
+        return f"Deadline(remaining={self.remaining():.3f}s)"
@@ -0,0 +1,259 @@
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from circuit_breaker import CircuitOpenError, circuit_breaker_stats, get_circuit_breaker
+from configuration import get_configuration
+
+# Responses that mean the upstream is unavailable rather than that the request was refused
+RETRYABLE_STATUS_CODES = frozenset({502, 503, 504})
+
+# Endpoints that move money; a timeout there may hide a payment that went through
+NEVER_RETRIED_ENDPOINTS = frozenset({'collectstd', 'quotestd'})
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    """
+    Return the sleep before retry number attempt (0-based): a random delay
+    between 0 and base_delay * 2**attempt, capped at max_delay ("full jitter").
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def endpoint_name(path):
+    """
+    Return the S3P endpoint of a path relative to the API URL, e.g. "service" for "service/123".
+    """
+    return path.strip('/').split('/', 1)[0]
+
+
+class HttpTransport:
+    """
+    Keep-alive HTTP transport shared by every service.
+
+    Wraps a single requests.Session whose adapter keeps a pool of persistent
+    connections per host, so consecutive calls to the S3P API reuse an open
+    TCP/TLS connection instead of paying for a new handshake on every call.
+
+    Each S3P endpoint gets its own timeouts and circuit breaker. GETs to the
+    endpoints listed in retry_endpoints are retried with jittered exponential
+    backoff on network errors and 502/503/504 responses; POSTs never are.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=20, connect_timeout=5.0, read_timeout=30.0, pool_block=False,
+                 base_url=None, endpoint_timeouts=None, retry_endpoints=(), max_retries=0,
+                 retry_base_delay=0.2, retry_max_delay=2.0, config=None):
+        """
+        Args:
+            pool_connections (int): Number of per-host pools to keep
+            pool_maxsize (int): Maximum number of kept-alive connections per host
+            connect_timeout (float): Default connect timeout in seconds
+            read_timeout (float): Default read timeout in seconds
+            pool_block (bool): Block when a host pool is exhausted instead of opening extra connections
+            base_url (str): API URL that endpoint names are taken relative to
+            endpoint_timeouts (dict): (connect, read) timeouts by endpoint name, overriding the defaults
+            retry_endpoints (iterable): Endpoints whose GET requests are idempotent and may be retried
+            max_retries (int): Number of retries after the first attempt
+            retry_base_delay (float): Backoff before the first retry, doubled for each further one (seconds)
+            retry_max_delay (float): Upper bound of a single backoff (seconds)
+            config (Configuration): Source of the circuit breaker settings; circuit breaking is off when omitted
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeout = (connect_timeout, read_timeout)
+        self.base_path = urlsplit(base_url).path.rstrip('/') if base_url else ''
+        self.endpoint_timeouts = dict(endpoint_timeouts or {})
+        self.retry_endpoints = frozenset(retry_endpoints) - NEVER_RETRIED_ENDPOINTS
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.config = config
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self._lock = threading.Lock()
+        self._request_count = 0
+        self._error_count = 0
+        self._retry_count = 0
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            pool_connections=config.http_pool_connections,
+            pool_maxsize=config.http_pool_maxsize,
+            connect_timeout=config.http_connect_timeout,
+            read_timeout=config.http_read_timeout,
+            base_url=config.base_url,
+            endpoint_timeouts=config.http_endpoint_timeouts,
+            retry_endpoints=config.http_retry_endpoints,
+            max_retries=config.http_max_retries,
+            retry_base_delay=config.http_retry_base_delay,
+            retry_max_delay=config.http_retry_max_delay,
+            config=config
+        )
+
+    def endpoint_for(self, url):
+        """
+        Return the S3P endpoint a URL points to, e.g. "verifytx" for <API URL>/verifytx.
+        """
+        path = urlsplit(url).path
+        if self.base_path and path.startswith(self.base_path):
+            path = path[len(self.base_path):]
+        return endpoint_name(path)
+
+    def timeout_for(self, url):
+        """
+        Return the (connect, read) timeout that applies to a URL when no timeout is passed.
+        """
+        return self.endpoint_timeouts.get(self.endpoint_for(url), self.timeout)
+
+    def request(self, method, url, sign=None, **kwargs):
+        """
+        Send a request through the pooled session.
+
+        Accepts the same keyword arguments as requests.request. The endpoint's
+        (connect, read) timeout, or else the transport's default, applies unless
+        a timeout is passed. Raises CircuitOpenError, a requests.RequestException,
+        without calling the upstream while the endpoint's circuit is open.
+
+        sign is a callable returning a fresh Authorization header. S3P rejects a
+        replayed nonce, so a request is only retried when sign is given, and every
+        retry is signed again.
+        """
+        endpoint = self.endpoint_for(url)
+        kwargs.setdefault('timeout', self.endpoint_timeouts.get(endpoint, self.timeout))
+        breaker = get_circuit_breaker(endpoint, self.config) if self.config is not None else None
+        retryable = sign is not None and method.upper() == 'GET' and endpoint in self.retry_endpoints
+        retries = self.max_retries if retryable else 0
+
+        attempt = 0
+        while True:
+            try:
+                response = self._send(breaker, endpoint, method, url, kwargs)
+            except CircuitOpenError:
+                raise
+            except requests.RequestException as e:
+                if attempt >= retries:
+                    raise
+                logging.warning("GET %s failed (%s), retrying", endpoint, e)
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= retries:
+                    return response
+                logging.warning("GET %s returned %s, retrying", endpoint, response.status_code)
+                response.close()
+            time.sleep(backoff_delay(attempt, self.retry_base_delay, self.retry_max_delay))
+            attempt += 1
+            kwargs['headers'] = dict(kwargs.get('headers') or {}, Authorization=sign())
+            with self._lock:
+                self._retry_count += 1
+
+    def _send(self, breaker, endpoint, method, url, kwargs):
+        method = method.upper()
+        if breaker is not None and not breaker.allow_request():
+            with self._lock:
+                self._error_count += 1
+            metrics.UPSTREAM_RESPONSES.labels(endpoint, method, 'circuit_open').inc()
+            raise CircuitOpenError(f"Circuit breaker open for endpoint '{endpoint}'")
+        in_flight = metrics.UPSTREAM_IN_FLIGHT.labels(endpoint)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self._error_count += 1
+            if breaker is not None:
+                breaker.record_failure()
+            metrics.UPSTREAM_RESPONSES.labels(endpoint, method, 'error').inc()
+            raise
+        except BaseException:
+            if breaker is not None:
+                breaker.release_probe()
+            raise
+        finally:
+            in_flight.dec()
+            metrics.UPSTREAM_LATENCY.labels(endpoint, method).observe(time.perf_counter() - start)
+            with self._lock:
+                self._request_count += 1
+        metrics.UPSTREAM_RESPONSES.labels(endpoint, method, str(response.status_code)).inc()
+        if breaker is not None:
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def pool_stats(self):
+        """
+        Return a snapshot of the connection pools.
+
+        Returns:
+            dict: Transport-wide counters, per host the number of connections
+            opened, requests sent and connections currently idle in the pool,
+            and the state of each endpoint's circuit breaker
+        """
+        pools = self.adapter.poolmanager.pools
+        hosts = {}
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            idle = sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool is not None else 0
+            hosts[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                'connections_opened': pool.num_connections,
+                'requests': pool.num_requests,
+                'idle_connections': idle,
+                'maxsize': self.pool_maxsize
+            }
+        with self._lock:
+            return {
+                'requests': self._request_count,
+                'errors': self._error_count,
+                'retries': self._retry_count,
+                'pool_connections': self.pool_connections,
+                'pool_maxsize': self.pool_maxsize,
+                'connect_timeout': self.timeout[0],
+                'read_timeout': self.timeout[1],
+                'hosts': hosts,
+                'circuits': circuit_breaker_stats()
+            }
+
+    def close(self):
+        self.session.close()
+
+
+_shared_transport = None
+_shared_transport_lock = threading.Lock()
+
+
+def get_transport(config=None):
+    """
+    Return the process-wide transport, creating it on first use.
+
+    Args:
+        config (Configuration): Configuration used to size the pool when the
+            transport does not exist yet. Loaded from the environment if omitted.
+
+    Returns:
+        HttpTransport: The shared transport instance
+    """
+    global _shared_transport
+    if _shared_transport is None:
+        with _shared_transport_lock:
+            if _shared_transport is None:
+                _shared_transport = HttpTransport.from_config(config or get_configuration())
+                logging.debug("Shared HTTP transport created with pool size %s", _shared_transport.pool_maxsize)
+    return _shared_transport
@@ -0,0 +1,290 @@
+"""
+Idempotency keys for operations that must not run twice, such as cashins by trid.
+
+An operation claims its key before it starts. A second request with the same
+key then either waits for the first one to finish and gets its result, gets
+the stored result of a finished one, or is refused while the outcome is
+unknown. Results are kept in memory for ttl seconds (at most max_entries of
+them, least recently used first out) and, when a path is given, in a SQLite
+file so they survive restarts and are shared by the worker processes of one
+host.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from ttl_cache import TTLCache
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_updated_at ON idempotency_keys (updated_at);
+"""
+
+
+def fingerprint(values):
+    """
+    Return a stable digest of the request values that must match for a repeat of the same request.
+    """
+    return hashlib.sha1(json.dumps(values, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class IdempotencyStoreError(Exception):
+    """Raised when a claim cannot be recorded durably, so the operation must not go ahead."""
+
+
+@dataclass
+class IdempotencyClaim:
+    state: str
+    future: Optional[Future] = None  # IN_FLIGHT: resolves to the result, or None if the owner gave up
+    result: Any = None  # DONE: the stored result
+
+
+class IdempotencyStore:
+    """
+    Tracks keyed operations from claim() to complete() or release().
+
+    States returned by claim():
+        OWNER: the caller runs the operation, then calls complete() or release()
+        IN_FLIGHT: another caller in this process is running it; wait on claim.future
+        DONE: it already finished; claim.result holds its result
+        CONFLICT: the key was used for a request with different values
+        IN_PROGRESS: another process is running it, or it was interrupted at a point
+            where its outcome is unknown (see mark())
+    """
+
+    OWNER = "OWNER"
+    IN_FLIGHT = "IN_FLIGHT"
+    DONE = "DONE"
+    CONFLICT = "CONFLICT"
+    IN_PROGRESS = "IN_PROGRESS"
+
+    # Durable row statuses
+    _PENDING = "PENDING"
+    _COMMITTED = "COMMITTED"
+    _FINISHED = "FINISHED"
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, ttl=86400, max_entries=100000, path=None, max_stored=1000000, claim_timeout=120,
+                 clock=time.time):
+        """
+        Args:
+            ttl (float): Seconds a finished operation's result is kept
+            max_entries (int): Results kept in memory
+            path (str): Optional SQLite file keeping claims and results across restarts
+            max_stored (int): Results kept in the SQLite file
+            claim_timeout (float): Seconds after which a claim of a dead process, made before
+                mark() was called, may be taken over
+            clock (callable): Wall clock in seconds; durable entries outlive the process
+        """
+        self.ttl = ttl
+        self.max_stored = max_stored
+        self.claim_timeout = claim_timeout
+        self.clock = clock
+        self._results = TTLCache(maxsize=max_entries, clock=clock)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._connection = None
+        if path:
+            self._connection = sqlite3.connect(path, check_same_thread=False, timeout=5)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            # Commits survive a crash of the process, which is what a repeated request follows
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(_SCHEMA)
+            self._connection.commit()
+
+    def claim(self, key, request_fingerprint):
+        """
+        Start an operation for key, or find out how an earlier one with the same key went.
+        """
+        with self._lock:
+            in_flight = self._in_flight.get(key)
+            if in_flight is not None:
+                if in_flight[0] != request_fingerprint:
+                    return IdempotencyClaim(self.CONFLICT)
+                return IdempotencyClaim(self.IN_FLIGHT, future=in_flight[1])
+            stored = self._results.get(key)
+            if stored is not None:
+                return self._stored_claim(stored, request_fingerprint)
+            # The claim time identifies our durable row, in case another process took the key over
+            claimed_at = self.clock()
+            if self._connection is not None:
+                claim = self._claim_durable(key, request_fingerprint, claimed_at)
+                if claim is not None:
+                    return claim
+            self._in_flight[key] = (request_fingerprint, Future(), claimed_at)
+            return IdempotencyClaim(self.OWNER)
+
+    def mark(self, key):
+        """
+        Record that the operation has reached a side effect, such as sending collectstd.
+
+        If the process dies after this, a repeated request is refused with
+        IN_PROGRESS until the key expires instead of running the operation again.
+        Raises IdempotencyStoreError if that cannot be recorded, or if the claim
+        was taken over meanwhile; the side effect must then not happen.
+        """
+        if self._connection is None:
+            return
+        try:
+            with self._lock:
+                with self._connection:
+                    request_fingerprint, future, claimed_at = self._in_flight.get(key, (None, None, None))
+                    marked_at = self.clock()
+                    updated = self._connection.execute(
+                        "UPDATE idempotency_keys SET status = ?, updated_at = ? "
+                        "WHERE key = ? AND status = ? AND updated_at = ?",
+                        (self._COMMITTED, marked_at, key, self._PENDING, claimed_at)).rowcount
+                    if updated:
+                        # complete() matches the row by its latest write
+                        self._in_flight[key] = (request_fingerprint, future, marked_at)
+        except sqlite3.Error as e:
+            raise IdempotencyStoreError(f"Could not record the claim on {key}: {str(e)}") from e
+        if not updated:
+            raise IdempotencyStoreError(f"The claim on {key} was lost")
+
+    def complete(self, key, result):
+        """
+        Store the result of the operation and hand it to the requests waiting for it.
+        """
+        with self._lock:
+            request_fingerprint, future, claimed_at = self._in_flight.pop(key, (None, None, None))
+            if request_fingerprint is not None:
+                self._results.set(key, (request_fingerprint, result), self.ttl)
+        if future is not None and not future.done():
+            future.set_result(result)
+        if self._connection is not None and request_fingerprint is not None:
+            # Only our own claim is finished, as in release(); a row taken over by another process is left alone
+            updated = self._execute(
+                "UPDATE idempotency_keys SET status = ?, result = ?, updated_at = ? "
+                "WHERE key = ? AND status IN (?, ?) AND updated_at = ?",
+                (self._FINISHED, json.dumps(result, default=str), self.clock(), key, self._PENDING, self._COMMITTED,
+                 claimed_at))
+            if updated == 0:
+                logging.warning("The claim on %s was taken over; its result is not stored durably", key)
+            self._purge()
+
+    def release(self, key):
+        """
+        Forget an operation that had no effect, so a repeated request runs it again.
+        """
+        with self._lock:
+            _, future, claimed_at = self._in_flight.pop(key, (None, None, None))
+        if self._connection is not None and claimed_at is not None:
+            self._execute("DELETE FROM idempotency_keys WHERE key = ? AND status = ? AND updated_at = ?",
+                          (key, self._PENDING, claimed_at))
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    @property
+    def durable(self):
+        """
+        True when claims are kept in a SQLite file, i.e. the store's methods may block on disk and file locks.
+        """
+        return self._connection is not None
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._in_flight)
+        return {'in_flight': in_flight, 'results': self._results.stats(), 'durable': self.durable}
+
+    def _stored_claim(self, stored, request_fingerprint):
+        stored_fingerprint, result = stored
+        if stored_fingerprint != request_fingerprint:
+            return IdempotencyClaim(self.CONFLICT)
+        return IdempotencyClaim(self.DONE, result=result)
+
+    def _claim_durable(self, key, request_fingerprint, now):
+        """
+        Claim key in the SQLite file; return the claim when it is not ours to run, else None.
+        """
+        try:
+            with self._connection:
+                row = self._connection.execute(
+                    "SELECT fingerprint, status, result, updated_at FROM idempotency_keys WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    stored_fingerprint, status, result, updated_at = row
+                    if status == self._FINISHED and updated_at + self.ttl > now:
+                        stored = (stored_fingerprint, json.loads(result) if result else None)
+                        self._results.set(key, stored, updated_at + self.ttl - now)
+                        return self._stored_claim(stored, request_fingerprint)
+                    if stored_fingerprint != request_fingerprint and updated_at + self.ttl > now:
+                        return IdempotencyClaim(self.CONFLICT)
+                    if status == self._COMMITTED and updated_at + self.ttl > now:
+                        return IdempotencyClaim(self.IN_PROGRESS)
+                    if status == self._PENDING and updated_at + self.claim_timeout > now:
+                        return IdempotencyClaim(self.IN_PROGRESS)
+                    # Expired, or claimed by a process that died before any side effect: take it over
+                    self._connection.execute("DELETE FROM idempotency_keys WHERE key = ?", (key,))
+                self._connection.execute(
+                    "INSERT INTO idempotency_keys (key, fingerprint, status, updated_at) VALUES (?, ?, ?, ?)",
+                    (key, request_fingerprint, self._PENDING, now))
+        except sqlite3.IntegrityError:
+            # Another process claimed it between our read and our insert
+            return IdempotencyClaim(self.IN_PROGRESS)
+        return None
+
+    def _execute(self, statement, parameters):
+        """
+        Run a write and return the number of rows it changed, or None if it failed.
+        """
+        try:
+            with self._lock:
+                with self._connection:
+                    return self._connection.execute(statement, parameters).rowcount
+        except sqlite3.Error as e:
+            logging.error("Idempotency store write failed: %s", str(e))
+            return None
+
+    def _purge(self):
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY:
+            return
+        now = self.clock()
+        try:
+            with self._lock:
+                with self._connection:
+                    self._connection.execute("DELETE FROM idempotency_keys WHERE status = ? AND updated_at < ?",
+                                             (self._FINISHED, now - self.ttl))
+                    self._connection.execute(
+                        "DELETE FROM idempotency_keys WHERE status = ? AND key NOT IN "
+                        "(SELECT key FROM idempotency_keys WHERE status = ? ORDER BY updated_at DESC LIMIT ?)",
+                        (self._FINISHED, self._FINISHED, self.max_stored))
+        except sqlite3.Error as e:
+            # Retried at the next purge
+            logging.error("Idempotency store purge failed: %s", str(e))
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_idempotency_store(config):
+    """
+    Return the process-wide store for cashin trids, built from the configuration on first use.
+    """
+    with _stores_lock:
+        store = _stores.get('cashin')
+        if store is None:
+            store = _stores['cashin'] = IdempotencyStore(
+                ttl=config.cashin_idempotency_ttl,
+                max_entries=config.cashin_idempotency_max_entries,
+                path=config.cashin_idempotency_path or None,
+                max_stored=config.cashin_idempotency_max_stored,
+                claim_timeout=config.cashin_deadline * 2
+            )
+        return store
@@ -0,0 +1,116 @@
+import json
+import threading
+import typing
+from dataclasses import fields, is_dataclass
+from datetime import date, datetime
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the standard library encoder is used instead
+    orjson = None
+
+_encoders = {}
+_encoders_lock = threading.Lock()
+
+
+def _is_datetime_field(field_type):
+    if field_type in (datetime, date):
+        return True
+    return any(argument in (datetime, date) for argument in typing.get_args(field_type))
+
+
+def _format_datetime(value):
+    """Same rule the routes always applied: ISO 8601 for dates, str() for other truthy values, else None."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value) if value else None
+
+
+def _compile_encoder(model_class, keep_datetimes):
+    """
+    Generate a function that turns one model_class instance into a dict.
+
+    The function reads every field directly, with no per-row reflection, and
+    formats the date fields of the model with _format_datetime. With
+    keep_datetimes, datetime values are left as they are for orjson, which
+    writes the same ISO 8601 text natively and much faster.
+    """
+    items = []
+    for field in fields(model_class):
+        if not field.name.isidentifier():
+            raise TypeError(f"Cannot compile an encoder for field {field.name!r} of {model_class.__name__}")
+        value = f"obj.{field.name}"
+        if _is_datetime_field(field.type):
+            if keep_datetimes:
+                value = f"(value if (value := {value}).__class__ is _datetime else _format_datetime(value))"
+            else:
+                value = f"_format_datetime({value})"
+        items.append(f"        {field.name!r}: {value},")
+    source = "def encode(obj):\n    return {\n" + "\n".join(items) + "\n    }\n"
+    namespace = {'_format_datetime': _format_datetime, '_datetime': datetime}
+    exec(compile(source, f"<encoder {model_class.__name__}>", "exec"), namespace)
+    encoder = namespace['encode']
+    encoder.__qualname__ = f"encode_{model_class.__name__}"
+    return encoder
+
+
+def _get_encoder(model_class, keep_datetimes):
+    key = (model_class, keep_datetimes)
+    encoder = _encoders.get(key)
+    if encoder is None:
+        with _encoders_lock:
+            encoder = _encoders.get(key)
+            if encoder is None:
+                encoder = _encoders[key] = _compile_encoder(model_class, keep_datetimes)
+    return encoder
+
+
+def get_encoder(model_class):
+    """
+    Return the compiled encoder of a dataclass for use with dumps().
+
+    The dicts it returns are meant for dumps() only: with orjson they may still
+    hold datetime objects. Use model_to_dict() for a dict that any JSON encoder accepts.
+
+    Args:
+        model_class: A dataclass such as PaymentStatusModel
+
+    Returns:
+        callable: encoder(instance) -> dict
+    """
+    return _get_encoder(model_class, orjson is not None)
+
+
+def model_to_dict(model):
+    """
+    Convert a dataclass model into a JSON-serializable dict.
+    """
+    return _get_encoder(type(model), False)(model)
+
+
+def _default(value):
+    if is_dataclass(value) and not isinstance(value, type):
+        return get_encoder(type(value))(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+    def dumps(value):
+        """
+        Serialize value to JSON bytes. Dataclass models anywhere in value are
+        encoded with their compiled encoder.
+        """
+        return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+else:
+    _json_encoder = json.JSONEncoder(default=_default, separators=(',', ':'))
+
+    def dumps(value):
+        """
+        Serialize value to JSON bytes. Dataclass models anywhere in value are
+        encoded with their compiled encoder.
+        """
+        return _json_encoder.encode(value).encode('utf-8')
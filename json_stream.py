@@ -0,0 +1,75 @@
+import json
+
+_WHITESPACE = ' \t\n\r'
+
+
+def iter_json_array(chunks, decoder=None):
+    """
+    Yield the elements of a top-level JSON array while it is still being received.
+
+    Only the element currently being decoded is held in memory, so arbitrarily
+    large arrays can be processed with a flat memory footprint.
+
+    Args:
+        chunks: Iterable of str chunks, e.g. response.iter_content(decode_unicode=True)
+        decoder (json.JSONDecoder): Decoder to use for each element
+
+    Raises:
+        ValueError: If the document is not a well-formed JSON array
+    """
+    decoder = decoder or json.JSONDecoder()
+    chunks = iter(chunks)
+    buffer = ''
+    position = 0
+    exhausted = False
+
+    def fill():
+        nonlocal buffer, position, exhausted
+        for chunk in chunks:
+            if chunk:
+                buffer = buffer[position:] + chunk
+                position = 0
+                return True
+        exhausted = True
+        return False
+
+    def next_significant():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not fill():
+                return None
+
+    if next_significant() != '[':
+        raise ValueError("Expected a JSON array")
+    position += 1
+    if next_significant() == ']':
+        return
+
+    while True:
+        if next_significant() is None:
+            raise ValueError("Unexpected end of JSON array")
+        while True:
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The element may be cut across chunks; read more and retry
+                if exhausted or not fill():
+                    raise ValueError("Malformed JSON array element")
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(buffer) and not exhausted and fill():
+                continue
+            break
+        position = end
+        yield element
+        separator = next_significant()
+        if separator == ',':
+            position += 1
+        elif separator == ']':
+            return
+        else:
+            raise ValueError("Expected ',' or ']' in JSON array")
@@ -0,0 +1,29 @@
+import threading
+
+
+class LazyService:
+    """
+    Proxy that builds a service on first use.
+
+    Attribute access is forwarded to the wrapped instance, which the factory
+    creates the first time it is needed. Construction is thread-safe and
+    happens at most once.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def get_instance(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+
+    def is_initialized(self):
+        return self._instance is not None
+
+    def __getattr__(self, name):
+        return getattr(self.get_instance(), name)
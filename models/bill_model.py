@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from datetime import datetime
 
+from models.slotted import slotted_variant
+
 @dataclass
 class BillModel:
     billType: str
@@ -22,3 +24,10 @@ class BillModel:
     billDueDate: datetime
     optStrg: str
     optNmb: int
+
+
+@slotted_variant(BillModel)
+class SlottedBillModel:
+    """
+    Memory-compact BillModel without a per-instance __dict__, for large result sets.
+    """
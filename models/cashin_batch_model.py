@@ -0,0 +1,20 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass
+class CashinBatchRowModel:
+    row: int
+    trid: Optional[str]
+    status: str  # SUCCEEDED, FAILED, UNCERTAIN or INVALID
+    result: Optional[dict] = field(default=None)
+    resumed: bool = False  # Outcome recorded by an earlier run; no request was sent for it now
+
+    def to_dict(self):
+        return {
+            "row": self.row,
+            "trid": self.trid,
+            "status": self.status,
+            "result": self.result,
+            "resumed": self.resumed
+        }
@@ -0,0 +1,23 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+
+@dataclass
+class CashinJobModel:
+    job_id: str
+    trid: str
+    status: str  # PENDING, RUNNING, SUCCEEDED or FAILED
+    created_at: datetime
+    updated_at: datetime
+    result: Optional[dict] = field(default=None)
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "trid": self.trid,
+            "status": self.status,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+            "result": self.result
+        }
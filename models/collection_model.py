@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from datetime import datetime
 
+from models.slotted import slotted_variant
+
 @dataclass
 class CollectionModel:
     ptn: str
@@ -18,3 +20,10 @@ class CollectionModel:
     payItemId: str
     payItemDescr: str
     tag: str
+
+
+@slotted_variant(CollectionModel)
+class SlottedCollectionModel:
+    """
+    Memory-compact CollectionModel without a per-instance __dict__, for large result sets.
+    """
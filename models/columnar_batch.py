@@ -0,0 +1,292 @@
+import typing
+from array import array
+from dataclasses import fields
+from datetime import datetime, timedelta, timezone
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional; columns are then exposed as array.array
+    numpy = None
+
+# Low-cardinality string fields stored as integer codes into a table of distinct values
+CATEGORICAL_FIELDS = frozenset({
+    'serviceid', 'merchant', 'localCur', 'systemCur', 'status', 'payItemId', 'payItemDescr', 'billType',
+    'amountType', 'billMonth', 'billYear', 'tag'
+})
+
+_NULL = -2 ** 63  # Marks a missing value in integer and timestamp columns
+_MAX_EXACT_INT = 2 ** 53  # Larger ints do not survive a round trip through float64
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = _EPOCH.replace(tzinfo=timezone.utc)
+
+
+def _field_kind(field_type):
+    if field_type in (int, float, datetime):
+        return field_type
+    arguments = [argument for argument in typing.get_args(field_type) if argument is not type(None)]
+    if len(arguments) == 1 and arguments[0] in (int, float, datetime):
+        return arguments[0]
+    return str
+
+
+class _ObjectColumn:
+    def __init__(self, values=()):
+        self.values = list(values)
+
+    def append(self, value):
+        self.values.append(value)
+
+    def get(self, index):
+        return self.values[index]
+
+    def data(self):
+        return self.values
+
+    def __len__(self):
+        return len(self.values)
+
+
+class _CategoryColumn:
+    def __init__(self):
+        self.codes = array('i')
+        self.categories = []
+        self._index = {}
+
+    def append(self, value):
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.categories)
+            self.categories.append(value)
+        self.codes.append(code)
+
+    def get(self, index):
+        return self.categories[self.codes[index]]
+
+    def data(self):
+        return [self.categories[code] for code in self.codes]
+
+    def __len__(self):
+        return len(self.codes)
+
+
+class _FloatColumn:
+    """
+    Floats as float64. JSON often has whole amounts as ints, so a one-byte flag
+    per row remembers an int value and converts it back to int.
+    """
+
+    def __init__(self):
+        self.values = array('d')
+        self.is_int = array('b')
+
+    def append(self, value):
+        if value is None:
+            self.values.append(float('nan'))
+            self.is_int.append(0)
+        elif type(value) is float:
+            self.values.append(value)
+            self.is_int.append(0)
+        elif type(value) is int and -_MAX_EXACT_INT <= value <= _MAX_EXACT_INT:
+            self.values.append(float(value))
+            self.is_int.append(1)
+        else:
+            raise TypeError(f"{value!r} is not a float")
+
+    def get(self, index):
+        value = self.values[index]
+        if value != value:
+            return None
+        return int(value) if self.is_int[index] else value
+
+    def data(self):
+        return numpy.array(self.values, dtype=numpy.float64) if numpy is not None else self.values
+
+    def __len__(self):
+        return len(self.values)
+
+
+class _IntColumn:
+    def __init__(self):
+        self.values = array('q')
+
+    def append(self, value):
+        if value is None:
+            self.values.append(_NULL)
+        elif isinstance(value, int) and not isinstance(value, bool):
+            self.values.append(value)
+        else:
+            raise TypeError(f"{value!r} is not an int")
+
+    def get(self, index):
+        value = self.values[index]
+        return None if value == _NULL else value
+
+    def data(self):
+        return numpy.array(self.values, dtype=numpy.int64) if numpy is not None else self.values
+
+    def __len__(self):
+        return len(self.values)
+
+
+class _DatetimeColumn:
+    """
+    Timestamps as integer microseconds since the Unix epoch (UTC).
+
+    A one-byte flag per row remembers whether the value was timezone-aware so
+    it converts back to the same kind of datetime. ISO 8601 strings are parsed
+    on the way in.
+    """
+
+    def __init__(self):
+        self.values = array('q')
+        self.aware = array('b')
+
+    def append(self, value):
+        if value is None or value == '':
+            self.values.append(_NULL)
+            self.aware.append(0)
+            return
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        elif not isinstance(value, datetime):
+            raise TypeError(f"{value!r} is not a datetime")
+        if value.tzinfo is not None:
+            delta = value - _EPOCH_UTC
+            self.aware.append(1)
+        else:
+            delta = value - _EPOCH
+            self.aware.append(0)
+        self.values.append((delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds)
+
+    def get(self, index):
+        value = self.values[index]
+        if value == _NULL:
+            return None
+        return (_EPOCH_UTC if self.aware[index] else _EPOCH) + timedelta(microseconds=value)
+
+    def data(self):
+        return numpy.array(self.values, dtype=numpy.int64) if numpy is not None else self.values
+
+    def __len__(self):
+        return len(self.values)
+
+
+class ColumnarBatch:
+    """
+    Column-oriented container for a large set of model rows.
+
+    Each field is kept in one typed column instead of one object per row:
+    floats as float64 arrays, ints and timestamps as int64 arrays (timestamps
+    as epoch microseconds), low-cardinality strings as integer codes, and other
+    strings as plain lists. Rows are only turned back into dataclass instances
+    when they are accessed.
+
+    Numeric columns are returned as NumPy arrays when NumPy is installed, and
+    as array.array otherwise. A column whose values do not fit its declared
+    type, e.g. a string in an int or float field, falls back to a plain list,
+    so every row reads back with the values and types it was stored with.
+
+    Usage:
+        batch = ColumnarBatch.from_records(PaymentHistoryModel, response.json())
+        batch.column('priceLocalCur').sum()
+        first = batch[0]  # PaymentHistoryModel
+    """
+
+    def __init__(self, model_class, row_class=None):
+        """
+        Args:
+            model_class: Dataclass describing the rows, e.g. PaymentHistoryModel
+            row_class: Class used when rows are read back, defaults to model_class
+                (e.g. SlottedPaymentHistoryModel)
+        """
+        self.model_class = model_class
+        self.row_class = row_class or model_class
+        self.field_names = [field.name for field in fields(model_class)]
+        self._columns = {}
+        for field in fields(model_class):
+            kind = _field_kind(field.type)
+            if kind is float:
+                self._columns[field.name] = _FloatColumn()
+            elif kind is int:
+                self._columns[field.name] = _IntColumn()
+            elif kind is datetime:
+                self._columns[field.name] = _DatetimeColumn()
+            elif field.name in CATEGORICAL_FIELDS:
+                self._columns[field.name] = _CategoryColumn()
+            else:
+                self._columns[field.name] = _ObjectColumn()
+        self._column_list = [self._columns[name] for name in self.field_names]
+        self._length = 0
+
+    @classmethod
+    def from_models(cls, model_class, models, row_class=None):
+        batch = cls(model_class, row_class)
+        batch.extend(models)
+        return batch
+
+    @classmethod
+    def from_records(cls, model_class, records, row_class=None):
+        """
+        Build a batch straight from decoded JSON dicts, without creating a model per row.
+        """
+        batch = cls(model_class, row_class)
+        for record in records:
+            batch.append_record(record)
+        return batch
+
+    def append(self, model):
+        self._append_values([getattr(model, name) for name in self.field_names])
+
+    def append_record(self, record):
+        self._append_values([record.get(name) for name in self.field_names])
+
+    def extend(self, models):
+        for model in models:
+            self.append(model)
+
+    def column(self, name):
+        """
+        Return the values of one field: a NumPy array (or array.array) for
+        numeric and timestamp fields, a list for the others.
+        """
+        return self._columns[name].data()
+
+    def row(self, index):
+        """
+        Return the row at index as a row_class instance.
+        """
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("ColumnarBatch index out of range")
+        return self.row_class(*[column.get(index) for column in self._column_list])
+
+    def to_models(self):
+        return list(self)
+
+    def __getitem__(self, index):
+        return self.row(index)
+
+    def __iter__(self):
+        getters = [column.get for column in self._column_list]
+        row_class = self.row_class
+        for index in range(self._length):
+            yield row_class(*[get(index) for get in getters])
+
+    def __len__(self):
+        return self._length
+
+    def _append_values(self, values):
+        for name, column, value in zip(self.field_names, self._column_list, values):
+            try:
+                column.append(value)
+            except (TypeError, ValueError, OverflowError):
+                self._demote(name).append(value)
+        self._length += 1
+
+    def _demote(self, name):
+        column = self._columns[name]
+        demoted = _ObjectColumn(column.get(index) for index in range(len(column)))
+        self._columns[name] = demoted
+        self._column_list = [self._columns[field_name] for field_name in self.field_names]
+        return demoted
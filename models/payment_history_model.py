@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from datetime import datetime
 
+from models.slotted import slotted_variant
+
 @dataclass
 class PaymentHistoryModel:
     ptn: str
@@ -21,3 +23,10 @@ class PaymentHistoryModel:
     payItemDescr: str
     errorCode: int
     tag: str
+
+
+@slotted_variant(PaymentHistoryModel)
+class SlottedPaymentHistoryModel:
+    """
+    Memory-compact PaymentHistoryModel without a per-instance __dict__, for large result sets.
+    """
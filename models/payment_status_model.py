@@ -2,6 +2,11 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 
+from models.slotted import slotted_variant
+
+# Statuses after which a payment collection can no longer change
+TERMINAL_STATUSES = frozenset({'SUCCESS', 'ERRORED'})
+
 @dataclass
 class PaymentStatusModel:
     ptn: str
@@ -22,3 +27,16 @@ class PaymentStatusModel:
     payItemDescr: str
     errorCode: int
     tag: str
+
+    def is_terminal(self):
+        return self.status in TERMINAL_STATUSES
+
+
+@slotted_variant(PaymentStatusModel)
+class SlottedPaymentStatusModel:
+    """
+    Memory-compact PaymentStatusModel without a per-instance __dict__, for large result sets.
+    """
+
+    def is_terminal(self):
+        return self.status in TERMINAL_STATUSES
@@ -0,0 +1,20 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+@dataclass
+class ReconciliationResult:
+    outcome: str  # matched, mismatched, missing_upstream or missing_local
+    key: str
+    local: Optional[dict] = field(default=None)
+    upstream: Optional[dict] = field(default=None)
+    differences: List[str] = field(default_factory=list)
+
+    def to_dict(self):
+        return {
+            "outcome": self.outcome,
+            "key": self.key,
+            "local": self.local,
+            "upstream": self.upstream,
+            "differences": self.differences
+        }
@@ -0,0 +1,38 @@
+from dataclasses import MISSING, dataclass, field, fields
+
+
+def slotted_variant(model_class):
+    """
+    Class decorator that turns the decorated class into a __slots__ dataclass
+    with the fields of model_class, in the same order.
+
+    The fields are taken from model_class when the module is imported, so the
+    two classes cannot drift apart. Methods defined on the decorated class are
+    kept, and from_model()/to_model() convert between the two. This stands in
+    for @dataclass(slots=True), which needs Python 3.10.
+    """
+    def decorate(cls):
+        model_fields = fields(model_class)
+        names = tuple(model_field.name for model_field in model_fields)
+        namespace = {key: value for key, value in cls.__dict__.items() if key not in ('__dict__', '__weakref__')}
+        namespace['__annotations__'] = {model_field.name: model_field.type for model_field in model_fields}
+        for model_field in model_fields:
+            if model_field.default is not MISSING:
+                namespace[model_field.name] = field(default=model_field.default)
+            elif model_field.default_factory is not MISSING:
+                namespace[model_field.name] = field(default_factory=model_field.default_factory)
+        namespace.setdefault('from_model', classmethod(lambda row_class, model: row_class(
+            *(getattr(model, name) for name in names))))
+        namespace.setdefault('to_model', lambda self: model_class(*(getattr(self, name) for name in names)))
+        draft = dataclass(type(cls.__name__, cls.__bases__, namespace))
+
+        # As dataclass(slots=True) does: rebuild the class with __slots__ and without the field defaults,
+        # which __init__ keeps on its own
+        slotted_namespace = dict(draft.__dict__)
+        slotted_namespace['__slots__'] = names
+        for name in names:
+            slotted_namespace.pop(name, None)
+        slotted_namespace.pop('__dict__', None)
+        slotted_namespace.pop('__weakref__', None)
+        return type(draft)(draft.__name__, draft.__bases__, slotted_namespace)
+    return decorate
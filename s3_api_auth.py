@@ -1,13 +1,30 @@
-import os
+import logging
+import re
 import hmac
 import hashlib
 import base64
 from urllib import parse
 import secrets
 import time
+import itertools
+import threading
 import requests
 import uuid
 
+import metrics
+from http_transport import get_transport
+from sdk_logging import request_logger
+
+_signing_latency = metrics.SIGNING_LATENCY.labels()
+
+# Characters parse.quote never encodes; values made only of these are used as-is.
+_is_unreserved = re.compile(r'[A-Za-z0-9_.~-]*').fullmatch
+
+
+def _quote(value):
+    return value if _is_unreserved(value) else parse.quote(value, safe='-')
+
+
 class HMACSignature:
     def __init__(self, method, url, params):
         self.method = method
@@ -28,50 +45,129 @@ class HMACSignature:
         return f"{self.method.upper()}{glue}{parse.quote(self.url, safe='-')}{glue}{parse.quote(parameter_string, safe='-')}"
 
 
+class S3RequestSigner:
+    """
+    Precomputed HMAC-SHA1 signer for one public token / secret key pair.
+
+    Produces the same signatures as HMACSignature, but keys the HMAC once,
+    caches the quoted "METHOD&url&" prefix per URL and keeps the constant
+    s3pAuth_* fields pre-sorted, so each call only sorts and quotes the
+    dynamic parameters. Instances are safe to share between threads.
+    """
+
+    MAX_CACHED_PREFIXES = 1024
+
+    def __init__(self, public_token, secret_key):
+        self.public_token = public_token
+        self._hmac = hmac.new(secret_key.encode(), digestmod=hashlib.sha1)
+        self._constant_params = tuple(
+            (key, f"{_quote(key)}%3D{_quote(value)}")
+            for key, value in (('s3pAuth_signature_method', 'HMAC-SHA1'), ('s3pAuth_token', str(public_token)))
+        )
+        self._prefixes = {}
+        # Starting at a random offset keeps nonces distinct across processes
+        # that share a key and hit the same nanosecond.
+        self._nonce_counter = itertools.count(secrets.randbelow(1000))
+
+    def nonce(self):
+        """
+        Return a numeric nonce that is unique even at very high request rates.
+
+        Combines the nanosecond clock with a per-signer counter; next() on
+        itertools.count is atomic, so concurrent threads never get the same value.
+        """
+        return f"{time.time_ns()}{next(self._nonce_counter) % 1000:03d}"
+
+    def _prefix(self, method, url):
+        key = (method, url)
+        prefix = self._prefixes.get(key)
+        if prefix is None:
+            prefix = f"{method.upper()}&{parse.quote(url, safe='-')}&"
+            if len(self._prefixes) < self.MAX_CACHED_PREFIXES:
+                self._prefixes[key] = prefix
+        return prefix
+
+    def sign(self, method, url, nonce, timestamp, additional_params=None):
+        """
+        Sign a request.
+
+        Args:
+            method (str): HTTP method
+            url (str): Endpoint URL without query string
+            nonce (str): Value of s3pAuth_nonce
+            timestamp (str): Value of s3pAuth_timestamp
+            additional_params (dict): Query or body parameters covered by the signature
+
+        Returns:
+            str: Base64 encoded HMAC-SHA1 signature
+        """
+        start = time.perf_counter()
+        # Quoting is character-wise, so quoting each "key=value" pair and joining
+        # with an encoded "&" equals quoting the joined parameter string.
+        params = [
+            ('s3pAuth_nonce', f"s3pAuth_nonce%3D{_quote(nonce)}"),
+            ('s3pAuth_timestamp', f"s3pAuth_timestamp%3D{_quote(timestamp)}")
+        ]
+        constant_params = self._constant_params
+        if additional_params:
+            params.extend(
+                (key, f"{_quote(key)}%3D{_quote(str(value))}") for key, value in additional_params.items()
+            )
+            if 's3pAuth_signature_method' in additional_params or 's3pAuth_token' in additional_params:
+                constant_params = [item for item in constant_params if item[0] not in additional_params]
+        params.extend(constant_params)
+        params.sort()
+        base_string = self._prefix(method, url) + "%26".join(pair for _, pair in params)
+        signature = self._hmac.copy()
+        signature.update(base_string.encode())
+        encoded = base64.b64encode(signature.digest()).decode()
+        _signing_latency.observe(time.perf_counter() - start)
+        return encoded
+
+
+_signers = {}
+_signers_lock = threading.Lock()
+
+
+def get_signer(public_token, secret_key):
+    """Return the shared S3RequestSigner for a token / secret pair."""
+    key = (public_token, secret_key)
+    signer = _signers.get(key)
+    if signer is None:
+        with _signers_lock:
+            signer = _signers.get(key)
+            if signer is None:
+                signer = S3RequestSigner(public_token, secret_key)
+                _signers[key] = signer
+    return signer
+
+
 class S3ApiAuth:
     def __init__(self, api_url, public_token, secret_key):
         self.api_url = api_url
         self.public_token = public_token
         self.secret_key = secret_key
-        # Read the DEBUG flag from environment variables
-        self.debug = os.getenv('SMOBIL_PAY_API_DEBUG', 'False') == 'True'
-
-        if self.debug:
-            print(f"Initialized API URL: {self.api_url}")
-            print(f"Using public token: {self.public_token}")
+        self.signer = get_signer(public_token, secret_key)
+        logging.debug("Initialized API URL: %s", api_url)
 
     def timestamp(self):
-        timestamp = str(int(time.time()))
-        if self.debug:
-            print(f"Generated Timestamp: {timestamp}")
-        return timestamp
+        return str(int(time.time()))
 
     def create_authorization_header(self, method, additional_params=None):
-        nonce = self.timestamp()
+        nonce = self.signer.nonce()
         timestamp = self.timestamp()
-        parameters = {
-            's3pAuth_nonce': nonce,
-            's3pAuth_signature_method': "HMAC-SHA1",
-            's3pAuth_timestamp': timestamp,
-            's3pAuth_token': self.public_token,
-            **(additional_params if additional_params else {})
-        }
-        signature_helper = HMACSignature(method, self.api_url, parameters)
-        signature = signature_helper.generate(self.secret_key)
+        signature = self.signer.sign(method, self.api_url, nonce, timestamp, additional_params)
         auth_header = (
             f's3pAuth, s3pAuth_nonce="{nonce}", s3pAuth_signature="{signature}", '
             f's3pAuth_signature_method="HMAC-SHA1", s3pAuth_timestamp="{timestamp}", '
             f's3pAuth_token="{self.public_token}"'
         )
-        if self.debug:
-            print(f"Authorization Header: {auth_header}")
+        # Redacted by the logging setup; the nonce and timestamp stay visible
+        request_logger.debug("Authorization header for %s %s: %s", method, self.api_url, auth_header)
         return auth_header
 
     def make_request(self, method, additional_params=None, version="3.0.0"):
-        full_url = f"{self.api_url}"
-        if self.debug:
-            print(f"Full API URL: {full_url}")
-
+        request_logger.debug("Full API URL: %s", self.api_url)
         headers = {
             'Authorization': self.create_authorization_header(method, additional_params),
             'x-api-version': version,
@@ -79,14 +175,12 @@ class S3ApiAuth:
         }
 
         try:
-            response = requests.request(method, self.api_url, headers=headers)
+            response = get_transport().request(method, self.api_url, headers=headers)
             response.raise_for_status()  # Raises an HTTPError for bad responses
             return response
         except requests.HTTPError as http_err:
-            if self.debug:
-                print(f"HTTP error occurred: {http_err}")
+            logging.debug("HTTP error occurred: %s", http_err)
             return {'error': str(http_err), 'status_code': response.status_code}
         except Exception as err:
-            if self.debug:
-                print(f"An error occurred: {err}")
+            logging.debug("An error occurred: %s", err)
             return {'error': str(err)}
@@ -0,0 +1,172 @@
+"""
+Logging setup that keeps the request path fast and free of secrets.
+
+configure_logging() moves the root logger's handlers behind a queue: the
+calling thread only enqueues the record and a background listener thread
+writes it. Records of the "smobilpay.request" logger, used for high-volume
+per-request details, are sampled first. The records that are kept are then
+redacted at the queue handler, so signatures, tokens and the configured API
+credentials never reach the output, whichever handlers the listener writes to.
+"""
+import atexit
+import logging
+import queue
+import random
+import re
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+REQUEST_LOGGER_NAME = 'smobilpay.request'
+
+# Per-request details (payloads, response bodies, lookups); sampled by configure_logging
+request_logger = logging.getLogger(REQUEST_LOGGER_NAME)
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_REDACTIONS = (
+    # s3pAuth_signature="..." and s3pAuth_token="..." inside Authorization headers
+    (re.compile(r'(s3pAuth_(?:signature|token)=")[^"]*'), r'\1***'),
+    # 'Authorization': '...' in logged header dicts
+    (re.compile(r'''(['"]?Authorization['"]?\s*[:=]\s*)(?:'[^']*'|"[^"]*")''', re.IGNORECASE), r"\1'***'"),
+    (re.compile(r'(Bearer\s+)[A-Za-z0-9._~+/=-]+'), r'\1***'),
+)
+
+
+def redact(text, secrets=()):
+    """
+    Return text with signatures, tokens, Authorization headers and the given secret values masked.
+    """
+    for pattern, replacement in _REDACTIONS:
+        text = pattern.sub(replacement, text)
+    for secret in secrets:
+        if secret and secret in text:
+            text = text.replace(secret, '***')
+    return text
+
+
+class RedactingFilter(logging.Filter):
+    """
+    Handler filter that formats a record's message and replaces it with its redacted form.
+    """
+
+    def __init__(self, secrets=()):
+        super().__init__()
+        self.secrets = tuple(secret for secret in secrets if secret)
+
+    def filter(self, record):
+        message = redact(record.getMessage(), self.secrets)
+        record.msg = message
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        if record.exc_text:
+            record.exc_text = redact(record.exc_text, self.secrets)
+        return True
+
+
+class RequestSamplingFilter(logging.Filter):
+    """
+    Keeps a fraction of the records below WARNING logged to the per-request logger.
+
+    Records of other loggers, and warnings and errors, always pass.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self._prefix = REQUEST_LOGGER_NAME + '.'
+
+    def filter(self, record):
+        if self.rate >= 1 or record.levelno >= logging.WARNING:
+            return True
+        if record.name != REQUEST_LOGGER_NAME and not record.name.startswith(self._prefix):
+            return True
+        return random.random() < self.rate
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler also formats the record with the handler's formatter
+    before enqueuing; this one enqueues it as its filters left it, so the
+    output formatting (timestamps, exception text) happens in the listener.
+    When the queue is full the record is dropped and counted instead of
+    blocking the caller.
+    """
+
+    def __init__(self, log_queue, maxsize=10000):
+        super().__init__(log_queue)
+        self.maxsize = maxsize
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        # SimpleQueue is unbounded but much cheaper than queue.Queue; the size check bounds it
+        if self.queue.qsize() >= self.maxsize:
+            self.dropped += 1
+            return
+        self.queue.put_nowait(record)
+
+
+_listener = None
+_configure_lock = threading.Lock()
+
+
+def configure_logging(use_queue=True, queue_size=10000, request_sample_rate=1.0, secrets=()):
+    """
+    Install redaction, sampling and (optionally) the background queue on the root logger.
+
+    The root logger's current handlers, or a stream handler if it has none, keep
+    writing the output. Calling it again has no effect.
+
+    Args:
+        use_queue (bool): Write records from a background thread instead of the logging thread
+        queue_size (int): Records waiting to be written before new ones are dropped
+        request_sample_rate (float): Fraction of per-request INFO/DEBUG records kept, between 0 and 1
+        secrets (iterable): Values, such as the API key and secret, to mask wherever they appear
+    """
+    global _listener
+    root = logging.getLogger()
+    with _configure_lock:
+        if getattr(root, '_smobilpay_logging_configured', False):
+            return
+        handlers = list(root.handlers)
+        if not handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter(LOG_FORMAT))
+            handlers = [handler]
+        redacting_filter = RedactingFilter(secrets)
+        sampling_filter = RequestSamplingFilter(request_sample_rate)
+
+        if use_queue:
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            queue_handler = DeferredQueueHandler(queue.SimpleQueue(), queue_size)
+            # Sampled out records are dropped before paying for redaction; every record that
+            # is kept is redacted here, before any handler of the listener can see it
+            queue_handler.addFilter(sampling_filter)
+            queue_handler.addFilter(redacting_filter)
+            root.addHandler(queue_handler)
+            _listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+            _listener.start()
+            atexit.register(stop_logging)
+        else:
+            for handler in handlers:
+                handler.addFilter(sampling_filter)
+                handler.addFilter(redacting_filter)
+                if handler not in root.handlers:
+                    root.addHandler(handler)
+        root._smobilpay_logging_configured = True
+
+
+def stop_logging():
+    """
+    Write the records still queued and stop the background listener.
+    """
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
@@ -0,0 +1,434 @@
+import asyncio
+import logging
+import time
+
+import aiohttp
+
+from models.account_model import AccountModel
+from models.bill_model import BillModel
+from models.cashin_model import CashinModel
+from models.cashout_model import CashoutModel
+from models.collection_model import CollectionModel
+from models.merchant_model import MerchantModel
+from models.payment_history_model import PaymentHistoryModel
+from models.payment_status_model import PaymentStatusModel
+from models.ping_model import PingModel
+from models.product_model import ProductModel
+from models.quote_model import QuoteModel
+from models.service_model import ServiceModel
+from models.subscription_model import SubscriptionModel
+from models.topup_model import TopupModel
+from models.verification_result import VerificationResult
+from models.voucher_model import VoucherModel
+from services.cashin_service import (CASHIN_CLAIM_ATTEMPTS, CashinService, CollectListeners, cashin_fingerprint,
+                                     duplicate_cashin_response)
+from s3_api_auth import S3ApiAuth
+import metrics
+from circuit_breaker import CircuitOpenError, get_circuit_breaker
+from idempotency_store import IdempotencyStore, IdempotencyStoreError, get_idempotency_store
+from configuration import get_configuration
+from http_transport import NEVER_RETRIED_ENDPOINTS, RETRYABLE_STATUS_CODES, backoff_delay, endpoint_name
+from datetime_decoder import get_datetime_decoder
+
+
+class AsyncSmobilpayClient:
+    """
+    asyncio client for the S3P API.
+
+    Exposes the same operations as the synchronous services and returns the
+    same models (or the same error strings), but never blocks the event loop,
+    so a single loop can keep thousands of calls in flight. Requests share one
+    aiohttp session whose connector caps the number of open connections.
+    Per-endpoint timeouts, retries and circuit breakers behave as in HttpTransport,
+    and the breakers are shared with it.
+
+    Usage:
+        async with AsyncSmobilpayClient() as client:
+            statuses = await asyncio.gather(*(client.fetch_payment_status(ptn=p) for p in ptns))
+    """
+
+    def __init__(self, public_token=None, secret_key=None, config=None, connection_limit=None):
+        self.config = config or get_configuration()
+        self.public_token = public_token if public_token else self.config.get_api_key()
+        self.secret_key = secret_key if secret_key else self.config.get_api_secret()
+        self.api_version = self.config.api_version
+        self.api_url = self.config.get_api_url()
+        self.connection_limit = connection_limit or self.config.async_connection_limit
+        self.timeout = aiohttp.ClientTimeout(
+            sock_connect=self.config.http_connect_timeout,
+            sock_read=self.config.http_read_timeout
+        )
+        self.endpoint_timeouts = {
+            endpoint: aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+            for endpoint, (connect, read) in self.config.http_endpoint_timeouts.items()
+        }
+        self.retry_endpoints = frozenset(self.config.http_retry_endpoints) - NEVER_RETRIED_ENDPOINTS
+        self.datetime_decoder = get_datetime_decoder()
+        # Shared with CashinService, so a trid is claimed once whichever path serves the cashin
+        self.idempotency = get_idempotency_store(self.config) if self.config.cashin_idempotency else None
+        self.collect_listeners = CollectListeners()
+        self._session = None
+        self._auth_by_url = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def add_collect_listener(self, listener):
+        """
+        Register a callable that receives the collectstd response of every successful cashin.
+        """
+        self.collect_listeners.add(listener)
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit, limit_per_host=self.connection_limit)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    def _get_auth(self, url):
+        api_auth = self._auth_by_url.get(url)
+        if api_auth is None:
+            api_auth = S3ApiAuth(url, self.public_token, self.secret_key)
+            self._auth_by_url[url] = api_auth
+        return api_auth
+
+    async def _request(self, method, path, params=None, json_body=None, form_body=None, deadline=None):
+        """
+        Sign and send a request, returning (status_code, body).
+
+        The body is the decoded JSON document for successful responses and the
+        raw text otherwise. Network failures propagate as aiohttp.ClientError
+        or asyncio.TimeoutError, and CircuitOpenError is raised without calling
+        the upstream while the endpoint's circuit is open. With a deadline, the
+        whole request must complete within the time left.
+        """
+        endpoint = endpoint_name(path)
+        breaker = get_circuit_breaker(endpoint, self.config)
+        retries = self.config.http_max_retries if method == 'GET' and endpoint in self.retry_endpoints else 0
+        attempt = 0
+        while True:
+            if not breaker.allow_request():
+                metrics.UPSTREAM_RESPONSES.labels(endpoint, method, 'circuit_open').inc()
+                raise CircuitOpenError(f"Circuit breaker open for endpoint '{endpoint}'")
+            in_flight = metrics.UPSTREAM_IN_FLIGHT.labels(endpoint)
+            in_flight.inc()
+            start = time.perf_counter()
+            try:
+                try:
+                    status_code, body = await self._send(method, path, endpoint, params, json_body, form_body, deadline)
+                finally:
+                    in_flight.dec()
+                    metrics.UPSTREAM_LATENCY.labels(endpoint, method).observe(time.perf_counter() - start)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                breaker.record_failure()
+                metrics.UPSTREAM_RESPONSES.labels(endpoint, method, 'error').inc()
+                if attempt >= retries:
+                    raise
+                logging.warning("GET %s failed (%s), retrying", endpoint, e)
+            except BaseException:
+                # Cancelled, or a body that failed to decode: no verdict on the upstream
+                breaker.release_probe()
+                raise
+            else:
+                metrics.UPSTREAM_RESPONSES.labels(endpoint, method, str(status_code)).inc()
+                if status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                if status_code not in RETRYABLE_STATUS_CODES or attempt >= retries:
+                    return status_code, body
+                logging.warning("GET %s returned %s, retrying", endpoint, status_code)
+            await asyncio.sleep(backoff_delay(attempt, self.config.http_retry_base_delay, self.config.http_retry_max_delay))
+            attempt += 1
+
+    async def _send(self, method, path, endpoint, params, json_body, form_body, deadline):
+        url = f"{self.api_url}/{path}"
+        params = {key: value for key, value in (params or {}).items() if value is not None}
+        signed_params = json_body if json_body is not None else form_body if form_body is not None else params
+        headers = {
+            'Authorization': self._get_auth(url).create_authorization_header(method, signed_params),
+            'x-api-version': self.api_version
+        }
+        if json_body is not None:
+            headers['Content-Type'] = 'application/json'
+        elif form_body is not None:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        timeout = self.endpoint_timeouts.get(endpoint, self.timeout)
+        if deadline is not None:
+            total = deadline.timeout(float('inf'))
+            timeout = aiohttp.ClientTimeout(
+                total=total,
+                sock_connect=min(timeout.sock_connect, total),
+                sock_read=min(timeout.sock_read, total)
+            )
+        async with self._get_session().request(
+            method,
+            url,
+            params=params or None,
+            json=json_body,
+            data=form_body,
+            headers=headers,
+            timeout=timeout
+        ) as response:
+            if response.status in (200, 201):
+                return response.status, await response.json(content_type=None)
+            return response.status, await response.text()
+
+    def _model_parser(self, model_class):
+        decode_record = self.datetime_decoder.decode_record
+        return lambda data: model_class(**decode_record(data, model_class))
+
+    def _list_parser(self, model_class):
+        decode_record = self.datetime_decoder.decode_record
+        return lambda data: [model_class(**decode_record(item, model_class)) for item in data]
+
+    async def _call(self, method, path, parse, params=None, json_body=None, form_body=None,
+                    error_message="An error occurred.", status_messages=None):
+        try:
+            status_code, body = await self._request(method, path, params, json_body, form_body)
+        except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError) as e:
+            logging.error("Network error occurred: %s", str(e))
+            return f"Network error occurred: {str(e)}"
+        if status_code == 200:
+            with metrics.DECODE_LATENCY.labels(endpoint_name(path)).time():
+                return parse(body)
+        if status_code == 401:
+            logging.error("Request could not be authenticated: %s", body)
+            return "Request could not be authenticated."
+        if status_messages and status_code in status_messages:
+            logging.error("Request to %s failed with status code %s: %s", path, status_code, body)
+            return status_messages[status_code]
+        logging.error("An error occurred with status code: %s and payload %s", status_code, body)
+        return error_message
+
+    async def ping(self):
+        try:
+            status_code, body = await self._request('GET', 'ping')
+        except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError) as e:
+            logging.error("Network error occurred: %s", str(e))
+            return PingModel(error=f"Network error occurred: {str(e)}")
+        if status_code == 200:
+            return PingModel(**body)
+        elif status_code == 401:
+            logging.error("Authentication failed: %s", body)
+            return PingModel(error="Request could not be authenticated.")
+        logging.error("Failed to ping: %s", body)
+        return PingModel(error="An error occurred.")
+
+    async def fetch_account_info(self):
+        return await self._call('GET', 'account', lambda data: AccountModel(**data),
+                                error_message="An unexpected error occurred.")
+
+    async def request_quote(self, payment_item_id, amount):
+        payload = {
+            'amount': amount,
+            'payItemId': payment_item_id
+        }
+        return await self._call('POST', 'quotestd', self._model_parser(QuoteModel), json_body=payload,
+                                error_message="An unexpected error occurred.")
+
+    async def execute_collection(self, data: dict):
+        return await self._call('POST', 'collectstd', self._model_parser(CollectionModel), json_body=data,
+                                error_message="An unexpected error occurred.",
+                                status_messages={498: "Quote has expired."})
+
+    async def fetch_payment_status(self, ptn=None, trid=None):
+        if not ptn and not trid:
+            logging.error("PTN or TRID must be provided.")
+            return "PTN or TRID must be provided."
+        params = {'ptn': ptn, 'trid': trid}
+
+        try:
+            return await self._call('GET', 'verifytx', self._list_parser(PaymentStatusModel), params=params)
+        except (TypeError, ValueError) as e:
+            logging.error("Error creating PaymentStatusModel: %s", str(e))
+            return f"Data parsing error for transaction: {str(e)}"
+
+    async def fetch_payment_history(self, timestamp_from=None, timestamp_to=None):
+        params = {'timestamp_from': timestamp_from, 'timestamp_to': timestamp_to}
+        return await self._call('GET', 'historystd', self._list_parser(PaymentHistoryModel),
+                                params=params, error_message="An unexpected error occurred.")
+
+    async def fetch_bills(self, merchant, service_id: int, service_number):
+        params = {'merchant': merchant, 'serviceid': service_id, 'serviceNumber': service_number}
+        return await self._call('GET', 'bill', self._list_parser(BillModel), params=params)
+
+    async def fetch_subscriptions(self, merchant: str, service_id: int, service_number=None, customer_number=None):
+        params = {
+            'merchant': merchant,
+            'serviceid': service_id,
+            'customerNumber': customer_number or None,
+            'serviceNumber': service_number or None
+        }
+        return await self._call('GET', 'subscription', self._list_parser(SubscriptionModel),
+                                params=params)
+
+    async def fetch_services(self):
+        return await self._call('GET', 'service', lambda data: [ServiceModel(**service) for service in data],
+                                status_messages={404: "Service does not exist."})
+
+    async def fetch_service_by_id(self, service_id: int):
+        return await self._call('GET', f'service/{service_id}', lambda data: ServiceModel(**data),
+                                status_messages={404: "Service does not exist."})
+
+    async def fetch_merchants(self):
+        return await self._call('GET', 'merchant', lambda data: [MerchantModel(**merchant) for merchant in data])
+
+    async def fetch_products(self, service_id: int = None):
+        return await self._call('GET', 'product', lambda data: [ProductModel(**product) for product in data],
+                                params={'serviceid': service_id})
+
+    async def fetch_cashins(self, service_id: int = None):
+        return await self._call('GET', 'cashin', lambda data: [CashinModel(**cashin) for cashin in data],
+                                params={'serviceid': service_id})
+
+    async def fetch_cashouts(self, service_id: int = None):
+        return await self._call('GET', 'cashout', lambda data: [CashoutModel(**cashout) for cashout in data],
+                                params={'serviceid': service_id})
+
+    async def fetch_topups(self, service_id: int = None):
+        return await self._call('GET', 'topup', lambda data: [TopupModel(**topup) for topup in data],
+                                params={'serviceid': service_id})
+
+    async def fetch_vouchers(self, service_id: int = None):
+        return await self._call('GET', 'voucher', lambda data: [VoucherModel(**voucher) for voucher in data],
+                                params={'serviceid': service_id})
+
+    async def verify_service_number(self, merchant, service_id: int, service_number):
+        params = {'merchant': merchant, 'serviceid': service_id, 'serviceNumber': service_number}
+        return await self._call('GET', 'verify', lambda data: VerificationResult(is_valid=data.get('is_valid')),
+                                params=params)
+
+    async def _send_form(self, path, payload, deadline=None):
+        try:
+            status_code, body = await self._request('POST', path, form_body=payload, deadline=deadline)
+        except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError) as e:
+            logging.error("Network error occurred during POST: %s", str(e))
+            return {"success": False, "error": f"Network error occurred: {str(e)}"}
+        if status_code in (200, 201):
+            return {"success": True, "data": body}
+        return {"success": False, "error": body, "status_code": status_code}
+
+    async def process_cashin(self, cashin_data: dict, deadline=None, on_collect=None) -> dict:
+        """
+        Process a cashin request using SmobilPay's two-step process.
+
+        Mirrors CashinService.process_cashin: request a quote, then confirm it
+        with a collect call. Repeated trids are answered from the same
+        idempotency store.
+        Args:
+            cashin_data (dict): The cashin data from the request
+            deadline (Deadline): Time budget shared by the quote and collect calls
+            on_collect (callable): Called with the quote ID right before collectstd is sent
+        Returns:
+            dict: Response containing the cashin status and details
+        """
+        error = CashinService.validate_cashin(cashin_data)
+        if error:
+            return error
+        payItemId = CashinService.CHANNEL_PAYITEMID_MAP.get(cashin_data['channel'])
+        if self.idempotency is None:
+            async def before_collect(quote_id):
+                if on_collect is not None:
+                    on_collect(quote_id)
+            return await self._process_cashin(cashin_data, payItemId, deadline, before_collect)
+
+        trid = str(cashin_data['trid'])
+        request_fingerprint = cashin_fingerprint(cashin_data)
+        for _ in range(CASHIN_CLAIM_ATTEMPTS):
+            claim = await self._idempotency_call(self.idempotency.claim, trid, request_fingerprint)
+            if claim.state == IdempotencyStore.OWNER:
+                return await self._process_claimed_cashin(cashin_data, payItemId, deadline, on_collect)
+            if claim.state != IdempotencyStore.IN_FLIGHT:
+                return duplicate_cashin_response(claim, trid)
+            try:
+                # Shielded: a waiter that times out must not cancel the future the first request resolves
+                result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(claim.future)),
+                                                timeout=deadline.remaining() if deadline is not None else None)
+            except asyncio.TimeoutError:
+                break
+            if result is not None:
+                return dict(result, duplicate=True)
+        return duplicate_cashin_response(claim, trid)
+
+    async def _process_claimed_cashin(self, cashin_data, payItemId, deadline, on_collect):
+        trid = str(cashin_data['trid'])
+        collect_sent = False
+
+        async def before_collect(quote_id):
+            nonlocal collect_sent
+            if on_collect is not None:
+                on_collect(quote_id)
+            await self._idempotency_call(self.idempotency.mark, trid)
+            collect_sent = True
+
+        try:
+            result = await self._process_cashin(cashin_data, payItemId, deadline, before_collect)
+        except IdempotencyStoreError as e:
+            # Raised by mark(), before collect was sent
+            logging.error("Error processing cashin: %s", str(e))
+            result = {"status": "error", "message": f"Failed to process cashin: {str(e)}"}
+        except BaseException:
+            # Includes cancellation when the client disconnects mid-cashin; an executor call
+            # still finishes if this task is cancelled again while waiting for it
+            if collect_sent:
+                await self._idempotency_call(self.idempotency.complete, trid,
+                                             {"status": "error", "message": "Cashin interrupted after collect was sent"})
+            else:
+                await self._idempotency_call(self.idempotency.release, trid)
+            raise
+        if result.get('status') == 'success' or collect_sent:
+            await self._idempotency_call(self.idempotency.complete, trid, result)
+        else:
+            await self._idempotency_call(self.idempotency.release, trid)
+        return result
+
+    async def _idempotency_call(self, method, *args):
+        """
+        Call an idempotency store method, off the event loop when it may block on its SQLite file.
+        """
+        if not self.idempotency.durable:
+            return method(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+
+    async def _process_cashin(self, cashin_data, payItemId, deadline, before_collect):
+        if deadline is not None and deadline.expired():
+            return {"status": "error", "message": "Deadline exceeded before the cashin was started"}
+
+        quote_result = await self._send_form('quotestd', {'payItemId': payItemId, 'amount': cashin_data['amount']},
+                                             deadline=deadline)
+        if not quote_result["success"]:
+            return {"status": "error", "message": "Quote request failed", "details": quote_result.get("error")}
+        quote_id = quote_result["data"].get('quoteId')
+        if not quote_id:
+            return {"status": "error", "message": "No quoteId returned from quote step", "details": quote_result["data"]}
+
+        if deadline is not None and deadline.remaining() < self.config.cashin_collect_min_time:
+            logging.error("Not enough time left to collect quote %s: %.2fs", quote_id, deadline.remaining())
+            return {"status": "error", "message": "Deadline exceeded before the collect step, no payment was requested"}
+
+        collect_payload = {
+            'quoteId': quote_id,
+            'serviceNumber': cashin_data['serviceNumber'],
+            'customerPhonenumber': cashin_data['customerPhonenumber'],
+            'customerEmailaddress': cashin_data['customerEmailaddress'],
+            'trid': cashin_data['trid']
+        }
+        await before_collect(quote_id)
+        collect_result = await self._send_form('collectstd', collect_payload, deadline=deadline)
+        if not collect_result["success"]:
+            return {"status": "error", "message": "Collect request failed", "details": collect_result.get("error")}
+        self.collect_listeners.notify(collect_result["data"])
+        return {
+            "status": "success",
+            "message": "Cashin processed successfully",
+            "result": collect_result["data"]
+        }
@@ -1,18 +1,19 @@
 import requests
 from models.bill_model import BillModel
 from s3_api_auth import S3ApiAuth
-from configuration import Configuration  # Import the configuration class
+from http_transport import get_transport
+from configuration import get_configuration
+from datetime_decoder import get_datetime_decoder
 import logging
 
-# Setup basic configuration for logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
 class BillService:
     def __init__(self, public_token=None, secret_key=None):
-        self.config = Configuration()  # Create a configuration instance
+        self.config = get_configuration()  # Shared, loaded once per process
         self.public_token = public_token if public_token else self.config.get_api_key()
         self.secret_key = secret_key if secret_key else self.config.get_api_secret()
         self.api_version = self.config.api_version
+        self.http = get_transport(self.config)
+        self.datetime_decoder = get_datetime_decoder()
         self.base_url = f"{self.config.get_api_url()}/bill"
         self.api_auth = S3ApiAuth(self.base_url, self.public_token, self.secret_key)
 
@@ -30,10 +31,11 @@ class BillService:
 
     def _make_request(self, params, headers):
         try:
-            response = requests.get(self.base_url, headers=headers, params=params)
+            response = self.http.get(self.base_url, headers=headers, params=params,
+                                     sign=lambda: self.api_auth.create_authorization_header('GET', params))
             if response.status_code == 200:
                 bills_data = response.json()
-                return [BillModel(**bill) for bill in bills_data]
+                return [BillModel(**self.datetime_decoder.decode_record(bill, BillModel)) for bill in bills_data]
             elif response.status_code == 401:
                 logging.error("Request could not be authenticated: %s", response.text)
                 return "Request could not be authenticated."
@@ -0,0 +1,392 @@
+import csv
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; runs are then only guarded within the process
+    fcntl = None
+
+from configuration import get_configuration
+from models.cashin_batch_model import CashinBatchRowModel
+from services.cashin_service import CashinService
+from services.payment_status_service import PaymentStatusService
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cashin_batch_rows (
+    trid TEXT PRIMARY KEY,
+    row INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    collect_sent INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_cashin_batch_rows_status ON cashin_batch_rows (status);
+"""
+
+_active_paths = set()
+_active_lock = threading.Lock()
+
+
+class CashinBatchError(Exception):
+    """Raised when a batch cannot be run, e.g. because another run of it is in progress."""
+
+
+def read_cashin_rows(source, file_format=None):
+    """
+    Yield the cashins of a CSV or NDJSON document as dicts.
+
+    Args:
+        source: A file path, or an iterable of text lines such as an open file
+        file_format (str): "csv" or "ndjson"; guessed from the file extension or the first line when omitted
+
+    Raises:
+        ValueError: If a NDJSON line is not a JSON object
+    """
+    if isinstance(source, str):
+        if file_format is None:
+            file_format = 'ndjson' if source.lower().endswith(('.ndjson', '.jsonl', '.json')) else 'csv'
+        with open(source, newline='') as f:
+            yield from read_cashin_rows(f, file_format)
+        return
+
+    lines = iter(source)
+    if file_format is None:
+        first = next((line for line in lines if line.strip()), None)
+        if first is None:
+            return
+        file_format = 'ndjson' if first.lstrip().startswith('{') else 'csv'
+        lines = _prepend(first, lines)
+
+    if file_format == 'ndjson':
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError(f"Line {number} is not a JSON object")
+            yield row
+    elif file_format == 'csv':
+        for row in csv.DictReader(lines):
+            # Empty cells are missing values, so validation reports them
+            yield {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+    else:
+        raise ValueError(f"Unsupported batch format: {file_format}")
+
+
+def _prepend(first, lines):
+    yield first
+    yield from lines
+
+
+class CashinBatchService:
+    """
+    Pays a batch of cashins with bounded parallelism and resumable, durable progress.
+
+    Each row is identified by its trid and its state is committed to a SQLite
+    file before and after every step: QUOTING before quotestd, COLLECTING right
+    before collectstd, then SUCCEEDED, FAILED (no payment was requested) or
+    UNCERTAIN (collectstd was sent but its outcome is unknown). Running the same
+    batch again skips the finished rows; rows left QUOTING by a crash are sent
+    again, and rows left COLLECTING or UNCERTAIN are looked up by trid with
+    verifytx first and only sent again if S3P has no transaction for them; a
+    transaction that is not terminal yet keeps the row UNCERTAIN. A row is
+    therefore never paid twice, even if the process dies mid-payment.
+    """
+
+    PENDING = "PENDING"
+    QUOTING = "QUOTING"
+    COLLECTING = "COLLECTING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+    UNCERTAIN = "UNCERTAIN"
+    INVALID = "INVALID"
+
+    REGISTER_CHUNK = 500
+
+    def __init__(self, path, cashin_service=None, payment_status_service=None, config=None, max_workers=None):
+        """
+        Args:
+            path (str): SQLite file holding the batch's progress; reuse it to resume the batch
+            cashin_service (CashinService): Runs the quotestd -> collectstd flow of each row
+            payment_status_service (PaymentStatusService): Looks up in-doubt rows by trid
+            config (Configuration): Defaults to the shared configuration
+            max_workers (int): Rows paid at the same time, defaults to the configured value
+        """
+        self.config = config or get_configuration()
+        self.path = path
+        self.cashin_service = cashin_service or CashinService()
+        self._payment_status_service = payment_status_service
+        self.max_workers = max_workers or self.config.cashin_batch_concurrency
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        # Every state change must survive a crash before the next step is taken
+        self._connection.execute("PRAGMA synchronous=FULL")
+        self._connection.executescript(_SCHEMA)
+        self._connection.commit()
+
+    @property
+    def payment_status_service(self):
+        if self._payment_status_service is None:
+            self._payment_status_service = PaymentStatusService()
+        return self._payment_status_service
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def progress(self):
+        """
+        Return the number of rows recorded in each state.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT status, COUNT(*) FROM cashin_batch_rows GROUP BY status").fetchall()
+        return dict(rows)
+
+    def run(self, rows, retry_failed=False):
+        """
+        Pay the given cashins, skipping those a previous run of this batch already settled.
+
+        Rows are registered in the progress file before any payment starts. Results
+        of rows that need no request (invalid, duplicated or already finished) come
+        first, then in-doubt rows from an earlier run are resolved, then the rest
+        are paid with at most max_workers in flight. Closing the generator early
+        lets the rows in flight finish and record their outcome.
+
+        Args:
+            rows (iterable): Cashin dicts, e.g. from read_cashin_rows()
+            retry_failed (bool): Send again the rows that failed before collectstd was sent
+
+        Yields:
+            CashinBatchRowModel: One per input row, in completion order. stats holds
+            the run's counts, duration and throughput once the generator is exhausted.
+
+        Raises:
+            CashinBatchError: If this batch is already being run
+        """
+        self._acquire_run()
+        started = time.perf_counter()
+        self.stats = {'rows': 0, 'sent': 0, 'resumed': 0, self.SUCCEEDED: 0, self.FAILED: 0, self.UNCERTAIN: 0,
+                      self.INVALID: 0}
+        try:
+            to_send = []
+            for item in self._register(rows, retry_failed):
+                if isinstance(item, CashinBatchRowModel):
+                    yield self._count(item)
+                else:
+                    to_send.append(item)
+            in_doubt = [item for item in to_send if item[3] in (self.COLLECTING, self.UNCERTAIN)]
+            to_send = [item for item in to_send if item[3] not in (self.COLLECTING, self.UNCERTAIN)]
+            for outcome in self._map(self._resolve_row, in_doubt):
+                if isinstance(outcome, CashinBatchRowModel):
+                    yield self._count(outcome)
+                else:
+                    to_send.append(outcome)
+            to_send.sort()
+            for outcome in self._map(self._send_row, to_send):
+                self.stats['sent'] += 1
+                yield self._count(outcome)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stats['elapsed_s'] = round(elapsed, 3)
+            self.stats['rows_per_second'] = round(self.stats['sent'] / elapsed, 2) if elapsed else 0.0
+            self._release_run()
+            logging.info("Cashin batch %s: %s", self.path, self.stats)
+
+    def _count(self, outcome):
+        self.stats['rows'] += 1
+        self.stats[outcome.status] += 1
+        if outcome.resumed:
+            self.stats['resumed'] += 1
+        return outcome
+
+    def _register(self, rows, retry_failed):
+        """
+        Record the batch's rows; yield a result for each row needing no request,
+        and (row, trid, payload, status) for the others.
+        """
+        seen = set()
+        chunk = []
+        for number, cashin_data in enumerate(rows, 1):
+            trid = cashin_data.get('trid') if isinstance(cashin_data, dict) else None
+            error = self.cashin_service.validate_cashin(cashin_data) if isinstance(cashin_data, dict) \
+                else {"status": "error", "message": "Row is not an object"}
+            if error:
+                yield CashinBatchRowModel(number, trid, self.INVALID, error)
+                continue
+            if trid in seen:
+                yield CashinBatchRowModel(number, trid, self.INVALID,
+                                          {"status": "error", "message": f"Duplicate trid in batch: {trid}"})
+                continue
+            seen.add(trid)
+            chunk.append((number, trid, json.dumps(cashin_data, sort_keys=True, default=str)))
+            if len(chunk) >= self.REGISTER_CHUNK:
+                yield from self._register_chunk(chunk, retry_failed)
+                chunk = []
+        if chunk:
+            yield from self._register_chunk(chunk, retry_failed)
+
+    def _register_chunk(self, chunk, retry_failed):
+        now = datetime.now(timezone.utc).isoformat()
+        results = []
+        with self._lock:
+            with self._connection:
+                for number, trid, payload in chunk:
+                    stored = self._connection.execute(
+                        "SELECT payload, status, collect_sent, result FROM cashin_batch_rows WHERE trid = ?", (trid,)
+                    ).fetchone()
+                    if stored is None:
+                        self._connection.execute(
+                            "INSERT INTO cashin_batch_rows (trid, row, payload, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+                            (trid, number, payload, self.PENDING, now))
+                        results.append((number, trid, payload, self.PENDING))
+                        continue
+                    stored_payload, status, collect_sent, result = stored
+                    if stored_payload != payload:
+                        results.append(CashinBatchRowModel(number, trid, self.INVALID, {
+                            "status": "error",
+                            "message": f"trid {trid} was already recorded in this batch with different data"
+                        }))
+                    elif status == self.SUCCEEDED or (status == self.FAILED and (collect_sent or not retry_failed)):
+                        results.append(CashinBatchRowModel(number, trid, status, json.loads(result) if result else None,
+                                                           resumed=True))
+                    else:
+                        if status == self.FAILED:
+                            self._connection.execute(
+                                "UPDATE cashin_batch_rows SET status = ?, updated_at = ? WHERE trid = ?",
+                                (self.PENDING, now, trid))
+                            status = self.PENDING
+                        results.append((number, trid, payload, status))
+        return results
+
+    def _map(self, func, items):
+        """
+        Yield func(*item) for each item in completion order, with at most max_workers running.
+        """
+        if not items:
+            return
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(items)), thread_name_prefix='cashin-batch')
+        pending = set()
+        items = iter(items)
+        try:
+            while True:
+                for item in items:
+                    pending.add(executor.submit(func, *item))
+                    if len(pending) >= self.max_workers:
+                        break
+                if not pending:
+                    return
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            # Rows already started are paying; let them record their outcome
+            executor.shutdown(wait=True)
+
+    def _resolve_row(self, number, trid, payload, status):
+        """
+        Settle a row whose collectstd may have been sent, using verifytx.
+
+        Returns the row's result, or the row itself when S3P has no transaction for it and it can be sent again.
+        """
+        result = self.payment_status_service.fetch_payment_status(trid=trid)
+        if isinstance(result, list) and not result:
+            logging.warning("Cashin batch row %s (trid %s) was %s but S3P has no transaction; sending it again",
+                            number, trid, status)
+            self._update(trid, self.PENDING, collect_sent=0)
+            return number, trid, payload, self.PENDING
+        if not isinstance(result, list):
+            logging.error("Could not verify cashin batch row %s (trid %s): %s", number, trid, result)
+            return CashinBatchRowModel(number, trid, self.UNCERTAIN, {
+                "status": "error", "message": f"Collect outcome unknown and verification failed: {result}"
+            }, resumed=True)
+        transaction = result[0]
+        recovered = {"ptn": transaction.ptn, "trid": transaction.trid, "status": transaction.status}
+        if not transaction.is_terminal():
+            # Still in progress at S3P; the next run looks it up again
+            logging.warning("Cashin batch row %s (trid %s) is still %s at S3P", number, trid, transaction.status)
+            outcome = {"status": "error", "message": f"Collect still in progress: {transaction.status}",
+                       "result": recovered}
+            self._update(trid, self.UNCERTAIN, result=outcome)
+            return CashinBatchRowModel(number, trid, self.UNCERTAIN, outcome, resumed=True)
+        succeeded = transaction.status == 'SUCCESS'
+        outcome = {"status": "success" if succeeded else "error",
+                   "message": f"Recovered with verifytx: {transaction.status}",
+                   "result": recovered}
+        status = self.SUCCEEDED if succeeded else self.FAILED
+        self._update(trid, status, result=outcome)
+        return CashinBatchRowModel(number, trid, status, outcome, resumed=True)
+
+    def _send_row(self, number, trid, payload, status):
+        collect_sent = False
+
+        def on_collect(quote_id):
+            nonlocal collect_sent
+            self._update(trid, self.COLLECTING, collect_sent=1)
+            collect_sent = True
+
+        self._update(trid, self.QUOTING, attempt=True)
+        try:
+            result = self.cashin_service.process_cashin(json.loads(payload), on_collect=on_collect)
+        except Exception as e:
+            logging.error("Cashin batch row %s (trid %s) failed: %s", number, trid, str(e))
+            result = {"status": "error", "message": f"Failed to process cashin: {str(e)}"}
+        if result.get('status') == 'success':
+            status = self.SUCCEEDED
+        else:
+            status = self.UNCERTAIN if collect_sent else self.FAILED
+        self._update(trid, status, result=result)
+        return CashinBatchRowModel(number, trid, status, result)
+
+    def _update(self, trid, status, result=None, collect_sent=None, attempt=False):
+        assignments = ["status = ?", "updated_at = ?"]
+        values = [status, datetime.now(timezone.utc).isoformat()]
+        if result is not None:
+            assignments.append("result = ?")
+            values.append(json.dumps(result, default=str))
+        if collect_sent is not None:
+            assignments.append("collect_sent = ?")
+            values.append(collect_sent)
+        if attempt:
+            assignments.append("attempts = attempts + 1")
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    f"UPDATE cashin_batch_rows SET {', '.join(assignments)} WHERE trid = ?", (*values, trid))
+
+    def _acquire_run(self):
+        key = os.path.abspath(self.path)
+        with _active_lock:
+            if key in _active_paths:
+                raise CashinBatchError(f"Cashin batch {self.path} is already running")
+            _active_paths.add(key)
+        self._lock_file = None
+        if fcntl is not None and self.path != ':memory:':
+            lock_file = open(self.path + '.lock', 'w')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                with _active_lock:
+                    _active_paths.discard(key)
+                raise CashinBatchError(f"Cashin batch {self.path} is already running in another process")
+            self._lock_file = lock_file
+
+    def _release_run(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        with _active_lock:
+            _active_paths.discard(os.path.abspath(self.path))
@@ -0,0 +1,97 @@
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from configuration import get_configuration
+from models.cashin_job_model import CashinJobModel
+from services.cashin_service import CashinService
+from ttl_cache import TTLCache
+
+
+class CashinJobService:
+    """
+    Runs cashins in the background and tracks their outcome by job ID.
+
+    submit() validates the request and returns immediately; a bounded worker
+    pool then runs the quotestd -> collectstd flow of CashinService.process_cashin.
+    When max_pending jobs are already queued or running, new submissions are
+    rejected instead of queueing without limit. Finished jobs are kept for
+    job_ttl seconds (and at most max_stored jobs) so clients can poll them.
+    """
+
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+
+    def __init__(self, cashin_service=None, config=None, max_workers=None, max_pending=None, job_ttl=None,
+                 max_stored=None):
+        self.config = config or get_configuration()
+        self.cashin_service = cashin_service or CashinService()
+        self.max_workers = max_workers or self.config.cashin_workers
+        self.max_pending = max_pending or self.config.cashin_max_pending_jobs
+        self.job_ttl = job_ttl or self.config.cashin_job_ttl
+        self._jobs = TTLCache(maxsize=max_stored or self.config.cashin_max_stored_jobs)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='cashin-job')
+
+    def submit(self, cashin_data: dict) -> dict:
+        """
+        Validate a cashin and queue it for background processing.
+        Args:
+            cashin_data (dict): The cashin data from the request
+        Returns:
+            dict: {"status": "accepted", "job": CashinJobModel} when queued,
+            {"status": "busy", ...} when the queue is full, or the validation error
+        """
+        error = self.cashin_service.validate_cashin(cashin_data)
+        if error:
+            return error
+        if not self._slots.acquire(blocking=False):
+            logging.warning("Cashin job queue is full (%s pending jobs)", self.max_pending)
+            return {"status": "busy", "message": "Too many cashins in progress, retry later"}
+
+        now = datetime.now(timezone.utc)
+        job = CashinJobModel(job_id=uuid.uuid4().hex, trid=cashin_data['trid'], status=self.PENDING,
+                             created_at=now, updated_at=now)
+        self._store(job)
+        try:
+            self._executor.submit(self._run, job, dict(cashin_data))
+        except RuntimeError:
+            self._slots.release()
+            self._jobs.pop(job.job_id)
+            return {"status": "busy", "message": "Cashin processing is shutting down"}
+        logging.info("Accepted cashin job %s for trid %s", job.job_id, job.trid)
+        return {"status": "accepted", "job": job}
+
+    def get_job(self, job_id):
+        """
+        Return the CashinJobModel for job_id, or None if it is unknown or expired.
+        """
+        return self._jobs.get(job_id)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job, cashin_data):
+        try:
+            self._update(job, self.RUNNING)
+            result = self.cashin_service.process_cashin(cashin_data)
+            self._update(job, self.SUCCEEDED if result.get('status') == 'success' else self.FAILED, result)
+        except Exception as e:
+            logging.error("Cashin job %s failed: %s", job.job_id, str(e))
+            self._update(job, self.FAILED, {"status": "error", "message": f"Failed to process cashin: {str(e)}"})
+        finally:
+            self._slots.release()
+
+    def _update(self, job, status, result=None):
+        job.status = status
+        job.result = result
+        job.updated_at = datetime.now(timezone.utc)
+        self._store(job)
+        logging.info("Cashin job %s is %s", job.job_id, status)
+
+    def _store(self, job):
+        self._jobs.set(job.job_id, job, self.job_ttl)
@@ -1,13 +1,68 @@
 import requests
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from typing import List
 from models.cashin_model import CashinModel
+from idempotency_store import IdempotencyStore, fingerprint, get_idempotency_store
 from s3_api_auth import S3ApiAuth
-from configuration import Configuration  # Import the configuration class
+from http_transport import get_transport
+from configuration import get_configuration
+from sdk_logging import request_logger
 import logging
 import os
 
-# Setup basic configuration for logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Attempts to claim a trid whose earlier request ended without effect before giving up
+CASHIN_CLAIM_ATTEMPTS = 3
+
+
+def cashin_fingerprint(cashin_data: dict) -> str:
+    """
+    Digest of the payment details that a repeated request with the same trid must match.
+    """
+    amount = cashin_data.get('amount')
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        pass
+    return fingerprint({
+        'channel': cashin_data.get('channel'), 'amount': amount, 'serviceNumber': cashin_data.get('serviceNumber'),
+        'customerPhonenumber': cashin_data.get('customerPhonenumber'),
+        'customerEmailaddress': cashin_data.get('customerEmailaddress')
+    })
+
+
+class CollectListeners:
+    """
+    Callables that receive the collectstd response of every successful cashin,
+    shared by CashinService and the async client so both notify the same way.
+    """
+
+    def __init__(self):
+        self._listeners = []
+
+    def add(self, listener):
+        self._listeners.append(listener)
+
+    def notify(self, collect_data):
+        for listener in self._listeners:
+            try:
+                listener(collect_data)
+            except Exception as e:
+                logging.error(f"Collect listener failed: {str(e)}")
+
+
+def duplicate_cashin_response(claim, trid) -> dict:
+    """
+    Response to a cashin whose trid was already claimed, for any claim state other than OWNER and IN_FLIGHT.
+    """
+    if claim.state == IdempotencyStore.DONE:
+        return dict(claim.result, duplicate=True)
+    if claim.state == IdempotencyStore.CONFLICT:
+        return {"status": "error", "message": f"trid {trid} was already used for a cashin with different details"}
+    return {
+        "status": "error",
+        "message": f"A cashin with trid {trid} is in progress or its outcome is unknown; check its status with verifytx"
+    }
+
 
 class CashinService:
     CHANNEL_PAYITEMID_MAP = {
@@ -16,12 +71,23 @@ class CashinService:
     }
 
     def __init__(self, public_token=None, secret_key=None):
-        self.config = Configuration()  # Create a configuration instance
+        self.config = get_configuration()  # Shared, loaded once per process
         self.public_token = public_token if public_token else self.config.get_api_key()
         self.secret_key = secret_key if secret_key else self.config.get_api_secret()
         self.api_version = self.config.api_version
+        self.http = get_transport(self.config)
         self.base_url = f"{self.config.get_api_url()}/cashin"
         self.api_auth = S3ApiAuth(self.base_url, self.public_token, self.secret_key)
+        # One signer per endpoint URL: the service is shared between threads, so api_auth is never re-pointed
+        self._auth_by_url = {self.base_url: self.api_auth}
+        self.collect_listeners = CollectListeners()
+        self.idempotency = get_idempotency_store(self.config) if self.config.cashin_idempotency else None
+
+    def add_collect_listener(self, listener):
+        """
+        Register a callable that receives the collectstd response of every successful cashin.
+        """
+        self.collect_listeners.add(listener)
 
     def fetch_cashins(self, service_id: int = None):
         params = {'serviceid': service_id} if service_id is not None else {}
@@ -29,28 +95,35 @@ class CashinService:
             'Authorization': self.api_auth.create_authorization_header('GET', params),
             'x-api-version': self.api_version
         }
-        logging.info(f"Payload to sign: {params}")
-        logging.info(f"Generated signature: {headers['Authorization']}")
-        logging.info(f"Headers: {headers}")
+        request_logger.debug("Payload to sign: %s", params)
         return self._make_request(params, headers)
 
-    def _send_request(self, url, payload, method='POST'):
-        # Set the api_url on the auth object to the correct endpoint
-        self.api_auth.api_url = url
+    def _get_auth(self, url):
+        api_auth = self._auth_by_url.get(url)
+        if api_auth is None:
+            api_auth = S3ApiAuth(url, self.public_token, self.secret_key)
+            self._auth_by_url[url] = api_auth
+        return api_auth
+
+    def _send_request(self, url, payload, method='POST', deadline=None):
         headers = {
-            'Authorization': self.api_auth.create_authorization_header(method, payload),
+            'Authorization': self._get_auth(url).create_authorization_header(method, payload),
             'x-api-version': self.api_version,
             'Content-Type': 'application/x-www-form-urlencoded'
         }
-        logging.info(f"Payload to sign: {payload}")
-        logging.info(f"Generated signature: {headers['Authorization']}")
-        logging.info(f"Headers: {headers}")
+        request_logger.debug("%s %s payload: %s", method, url, payload)
+        # A deadline bounds the endpoint's connect and read timeouts by the time left
+        timeout = self.http.timeout_for(url)
+        if deadline is not None:
+            timeout = deadline.timeout(timeout)
         try:
             if method == 'POST':
-                response = requests.post(url, data=payload, headers=headers)
+                response = self.http.post(url, data=payload, headers=headers, timeout=timeout)
             else:
-                response = requests.get(url, headers=headers, params=payload)
-            logging.info(f"{method} response: status={response.status_code}, body={response.text}")
+                response = self.http.get(url, headers=headers, params=payload, timeout=timeout)
+            request_logger.info("%s %s response: status=%s", method, url, response.status_code)
+            if request_logger.isEnabledFor(logging.DEBUG):
+                request_logger.debug("%s %s response body: %s", method, url, response.text)
             if response.status_code in (200, 201):
                 return {"success": True, "data": response.json()}
             else:
@@ -59,13 +132,14 @@ class CashinService:
             logging.error(f"Network error occurred during {method}: {str(e)}")
             return {"success": False, "error": f"Network error occurred: {str(e)}"}
 
-    def process_cashin(self, cashin_data: dict) -> dict:
+    @classmethod
+    def validate_cashin(cls, cashin_data: dict):
         """
-        Process a cashin request using SmobilPay's two-step process.
+        Check that a cashin request can be processed. The async client uses it too.
         Args:
             cashin_data (dict): The cashin data from the request
         Returns:
-            dict: Response containing the cashin status and details
+            dict: Error response if the request is invalid, None otherwise
         """
         required_fields = [
             'channel', 'amount', 'serviceNumber', 'customerPhonenumber', 'customerEmailaddress', 'trid'
@@ -74,9 +148,79 @@ class CashinService:
         if missing:
             return {"status": "error", "message": f"Missing required fields: {', '.join(missing)}"}
         channel = cashin_data['channel']
-        payItemId = self.CHANNEL_PAYITEMID_MAP.get(channel)
-        if not payItemId:
+        if not cls.CHANNEL_PAYITEMID_MAP.get(channel):
             return {"status": "error", "message": f"Invalid or unsupported channel: {channel}"}
+        return None
+
+    def process_cashin(self, cashin_data: dict, deadline=None, on_collect=None) -> dict:
+        """
+        Process a cashin request using SmobilPay's two-step process.
+        Args:
+            cashin_data (dict): The cashin data from the request
+            deadline (Deadline): Time budget shared by the quote and collect calls. Each call's
+                timeout is capped by the time left, and collect is not sent when less than
+                the configured collect minimum time remains.
+            on_collect (callable): Called with the quote ID right before collectstd is sent, i.e.
+                from the point where the payment may happen even if this call then fails
+        Returns:
+            dict: Response containing the cashin status and details. A cashin whose trid is
+            being processed, or was processed within the idempotency TTL, is not sent again:
+            the first request's result is returned with "duplicate": True.
+        """
+        error = self.validate_cashin(cashin_data)
+        if error:
+            return error
+        if self.idempotency is None:
+            return self._process_cashin(cashin_data, deadline, on_collect)
+
+        trid = str(cashin_data['trid'])
+        request_fingerprint = cashin_fingerprint(cashin_data)
+        for _ in range(CASHIN_CLAIM_ATTEMPTS):
+            claim = self.idempotency.claim(trid, request_fingerprint)
+            if claim.state == IdempotencyStore.OWNER:
+                return self._process_claimed_cashin(cashin_data, deadline, on_collect)
+            if claim.state != IdempotencyStore.IN_FLIGHT:
+                return duplicate_cashin_response(claim, trid)
+            request_logger.info("Waiting for the cashin already in flight for trid %s", trid)
+            try:
+                result = claim.future.result(timeout=deadline.remaining() if deadline is not None else None)
+            except FutureTimeoutError:
+                break
+            if result is not None:
+                return dict(result, duplicate=True)
+            # The request in flight ended without requesting a payment; claim the trid again
+        return duplicate_cashin_response(claim, trid)
+
+    def _process_claimed_cashin(self, cashin_data, deadline, on_collect):
+        trid = str(cashin_data['trid'])
+        collect_sent = False
+
+        def before_collect(quote_id):
+            nonlocal collect_sent
+            if on_collect is not None:
+                on_collect(quote_id)
+            self.idempotency.mark(trid)
+            collect_sent = True
+
+        try:
+            result = self._process_cashin(cashin_data, deadline, before_collect)
+        except BaseException:
+            if collect_sent:
+                self.idempotency.complete(trid, {"status": "error", "message": "Cashin interrupted after collect was sent"})
+            else:
+                self.idempotency.release(trid)
+            raise
+        # Once collect was sent the outcome is kept even if it failed: sending it again could pay twice
+        if result.get('status') == 'success' or collect_sent:
+            self.idempotency.complete(trid, result)
+        else:
+            self.idempotency.release(trid)
+        return result
+
+    def _process_cashin(self, cashin_data, deadline, on_collect):
+        if deadline is not None and deadline.expired():
+            return {"status": "error", "message": "Deadline exceeded before the cashin was started"}
+        payItemId = self.CHANNEL_PAYITEMID_MAP.get(cashin_data['channel'])
         try:
             # Step 1: Request a quote (POST, x-www-form-urlencoded)
             quote_payload = {
@@ -84,7 +228,7 @@ class CashinService:
                 'amount': cashin_data['amount']
             }
             quote_url = f"{self.config.get_api_url()}/quotestd"
-            quote_result = self._send_request(quote_url, quote_payload, method='POST')
+            quote_result = self._send_request(quote_url, quote_payload, method='POST', deadline=deadline)
             if not quote_result["success"]:
                 return {"status": "error", "message": "Quote request failed", "details": quote_result.get("error")}
             quote_json = quote_result["data"]
@@ -92,7 +236,10 @@ class CashinService:
             if not quote_id:
                 return {"status": "error", "message": "No quoteId returned from quote step", "details": quote_json}
 
-            # Step 2: Confirm the order (POST, x-www-form-urlencoded)
+            # Step 2: Confirm the order (POST, x-www-form-urlencoded), unless it could not finish in time
+            if deadline is not None and deadline.remaining() < self.config.cashin_collect_min_time:
+                logging.error(f"Not enough time left to collect quote {quote_id}: {deadline.remaining():.2f}s")
+                return {"status": "error", "message": "Deadline exceeded before the collect step, no payment was requested"}
             collect_payload = {
                 'quoteId': quote_id,
                 'serviceNumber': cashin_data['serviceNumber'],
@@ -101,9 +248,12 @@ class CashinService:
                 'trid': cashin_data['trid']
             }
             collect_url = f"{self.config.get_api_url()}/collectstd"
-            collect_result = self._send_request(collect_url, collect_payload, method='POST')
+            if on_collect is not None:
+                on_collect(quote_id)
+            collect_result = self._send_request(collect_url, collect_payload, method='POST', deadline=deadline)
             if not collect_result["success"]:
                 return {"status": "error", "message": "Collect request failed", "details": collect_result.get("error")}
+            self.collect_listeners.notify(collect_result["data"])
             return {
                 "status": "success",
                 "message": "Cashin processed successfully",
@@ -115,7 +265,8 @@ class CashinService:
 
     def _make_request(self, params, headers):
         try:
-            response = requests.get(self.base_url, headers=headers, params=params)
+            response = self.http.get(self.base_url, headers=headers, params=params,
+                                     sign=lambda: self.api_auth.create_authorization_header('GET', params))
             if response.status_code == 200:
                 cashins_data = response.json()
                 return [CashinModel(**cashin) for cashin in cashins_data]
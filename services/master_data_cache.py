@@ -0,0 +1,198 @@
+import logging
+import threading
+import time
+
+from configuration import get_configuration
+from services.cashin_service import CashinService
+from services.cashout_service import CashoutService
+from services.merchant_service import MerchantService
+from services.product_service import ProductService
+from services.service_api import ServiceApi
+from services.topup_service import TopupService
+from services.voucher_service import VoucherService
+from ttl_cache import TTLCache
+
+
+class MasterDataCache:
+    """
+    Read-through cache for S3P master data.
+
+    Wraps the service, merchant, product and cashin/cashout/topup/voucher
+    services. Successful responses are kept for a per-endpoint TTL, a missing
+    service (404) is cached for a shorter negative TTL, and an expired entry is
+    still served during its stale window while a background thread refreshes it.
+    Other errors are never cached. Lookup indexes by serviceid, merchant and
+    payItemId are rebuilt every time a list is loaded.
+    """
+
+    ENDPOINTS = ('service', 'merchant', 'product', 'cashin', 'cashout', 'topup', 'voucher')
+    PAY_ITEM_CATALOGS = ('product', 'cashin', 'cashout', 'topup', 'voucher')
+
+    def __init__(self, service_api=None, merchant_service=None, product_service=None, cashin_service=None,
+                 cashout_service=None, topup_service=None, voucher_service=None, config=None, ttls=None,
+                 clock=time.monotonic):
+        """
+        Args:
+            ttls (dict): Optional TTL in seconds per endpoint name (see ENDPOINTS);
+                endpoints not listed use the configured default
+            clock (callable): Monotonic clock in seconds that TTLs are measured with
+        """
+        self.config = config or get_configuration()
+        self.service_api = service_api or ServiceApi()
+        self.merchant_service = merchant_service or MerchantService()
+        self.product_service = product_service or ProductService()
+        self.cashin_service = cashin_service or CashinService()
+        self.cashout_service = cashout_service or CashoutService()
+        self.topup_service = topup_service or TopupService()
+        self.voucher_service = voucher_service or VoucherService()
+        self.ttls = {endpoint: self.config.masterdata_cache_ttl for endpoint in self.ENDPOINTS}
+        self.ttls.update(ttls or {})
+        self.stale_ttl = self.config.masterdata_cache_stale_ttl
+        self.negative_ttl = self.config.masterdata_cache_negative_ttl
+
+        self._cache = TTLCache(clock=clock)
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._services_by_id = {}
+        self._merchants_by_code = {}
+        self._pay_items = {catalog: {} for catalog in self.PAY_ITEM_CATALOGS}
+
+    # Read-through endpoints
+
+    def fetch_services(self):
+        return self._read_through('service', None, self.service_api.fetch_services)
+
+    def fetch_service_by_id(self, service_id: int):
+        return self._read_through('service', service_id, lambda: self.service_api.fetch_service_by_id(service_id))
+
+    def fetch_merchants(self):
+        return self._read_through('merchant', None, self.merchant_service.fetch_merchants)
+
+    def fetch_products(self, service_id: int = None):
+        return self._read_through('product', service_id, lambda: self.product_service.fetch_products(service_id))
+
+    def fetch_cashins(self, service_id: int = None):
+        return self._read_through('cashin', service_id, lambda: self.cashin_service.fetch_cashins(service_id))
+
+    def fetch_cashouts(self, service_id: int = None):
+        return self._read_through('cashout', service_id, lambda: self.cashout_service.fetch_cashouts(service_id))
+
+    def fetch_topups(self, service_id: int = None):
+        return self._read_through('topup', service_id, lambda: self.topup_service.fetch_topups(service_id))
+
+    def fetch_vouchers(self, service_id: int = None):
+        return self._read_through('voucher', service_id, lambda: self.voucher_service.fetch_vouchers(service_id))
+
+    # Indexed lookups
+
+    def get_service(self, service_id):
+        """
+        Return the ServiceModel for a serviceid, or None if it does not exist.
+        """
+        self.fetch_services()
+        service = self._services_by_id.get(str(service_id))
+        if service is not None:
+            return service
+        result = self.fetch_service_by_id(service_id)
+        return None if isinstance(result, str) else result
+
+    def get_merchant(self, merchant):
+        """
+        Return the MerchantModel for a merchant code, or None if it is unknown.
+        """
+        self.fetch_merchants()
+        return self._merchants_by_code.get(merchant)
+
+    def get_pay_item(self, pay_item_id):
+        """
+        Return the product, cashin, cashout, topup or voucher package with this payItemId, or None.
+        """
+        loaders = {
+            'product': self.fetch_products,
+            'cashin': self.fetch_cashins,
+            'cashout': self.fetch_cashouts,
+            'topup': self.fetch_topups,
+            'voucher': self.fetch_vouchers
+        }
+        for catalog in self.PAY_ITEM_CATALOGS:
+            loaders[catalog]()
+            item = self._pay_items[catalog].get(pay_item_id)
+            if item is not None:
+                return item
+        return None
+
+    def invalidate(self, endpoint=None):
+        """
+        Drop cached data for one endpoint, or everything when endpoint is None.
+        """
+        with self._lock:
+            if endpoint is None:
+                self._cache.clear()
+                self._services_by_id = {}
+                self._merchants_by_code = {}
+                self._pay_items = {catalog: {} for catalog in self.PAY_ITEM_CATALOGS}
+                return
+            for key in self._cache.keys():
+                if key[0] == endpoint:
+                    self._cache.pop(key)
+            if endpoint == 'service':
+                self._services_by_id = {}
+            elif endpoint == 'merchant':
+                self._merchants_by_code = {}
+            elif endpoint in self._pay_items:
+                self._pay_items[endpoint] = {}
+
+    def stats(self):
+        return self._cache.stats()
+
+    # Internals
+
+    def _read_through(self, endpoint, key, loader):
+        cache_key = (endpoint, key)
+        entry = self._cache.get_entry(cache_key)
+        if entry is not None:
+            if not entry.is_fresh(self._cache.clock()):
+                self._refresh_in_background(endpoint, key, loader)
+            return entry.value
+        return self._load(endpoint, key, loader)
+
+    def _load(self, endpoint, key, loader):
+        result = loader()
+        if isinstance(result, str):
+            if endpoint == 'service' and result == ServiceApi.SERVICE_NOT_FOUND:
+                self._cache.set((endpoint, key), result, self.negative_ttl)
+            return result
+        self._cache.set((endpoint, key), result, self.ttls[endpoint], self.stale_ttl)
+        self._index(endpoint, result)
+        return result
+
+    def _refresh_in_background(self, endpoint, key, loader):
+        cache_key = (endpoint, key)
+        with self._lock:
+            if cache_key in self._refreshing:
+                return
+            self._refreshing.add(cache_key)
+
+        def refresh():
+            try:
+                self._load(endpoint, key, loader)
+            except Exception as e:
+                logging.error("Background refresh of %s %s failed: %s", endpoint, key, str(e))
+            finally:
+                with self._lock:
+                    self._refreshing.discard(cache_key)
+
+        threading.Thread(target=refresh, name=f"masterdata-refresh-{endpoint}", daemon=True).start()
+
+    def _index(self, endpoint, result):
+        items = result if isinstance(result, list) else [result]
+        if endpoint == 'service':
+            services_by_id = dict(self._services_by_id)
+            services_by_id.update((str(service.serviceid), service) for service in items)
+            self._services_by_id = services_by_id
+        elif endpoint == 'merchant':
+            self._merchants_by_code = {merchant.merchant: merchant for merchant in items}
+        elif endpoint in self._pay_items:
+            pay_items = dict(self._pay_items[endpoint])
+            pay_items.update((item.payItemId, item) for item in items)
+            self._pay_items[endpoint] = pay_items
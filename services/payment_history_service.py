@@ -1,18 +1,32 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
 import requests
+from json_stream import iter_json_array
 from models.payment_history_model import PaymentHistoryModel
 from s3_api_auth import S3ApiAuth
-from configuration import Configuration  # Import the configuration class
+from http_transport import get_transport
+from configuration import get_configuration
+from datetime_decoder import get_datetime_decoder
+import metrics
 import logging
 
-# Setup basic configuration for logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+class PaymentHistoryError(Exception):
+    """Raised while streaming payment history when a window cannot be retrieved."""
+
 
 class PaymentHistoryService:
+    _END_OF_WINDOW = object()
+
     def __init__(self, public_token=None, secret_key=None):
-        self.config = Configuration()  # Create a configuration instance
+        self.config = get_configuration()  # Shared, loaded once per process
         self.public_token = public_token if public_token else self.config.get_api_key()
         self.secret_key = secret_key if secret_key else self.config.get_api_secret()
         self.api_version = self.config.api_version
+        self.http = get_transport(self.config)
+        self.datetime_decoder = get_datetime_decoder()
         self.base_url = f"{self.config.get_api_url()}/historystd"
         self.api_auth = S3ApiAuth(self.base_url, self.public_token, self.secret_key)
 
@@ -39,10 +53,13 @@ class PaymentHistoryService:
 
     def _make_request(self, params, headers):
         try:
-            response = requests.get(self.base_url, headers=headers, params=params)
+            response = self.http.get(self.base_url, headers=headers, params=params,
+                                     sign=lambda: self.api_auth.create_authorization_header('GET', params))
             if response.status_code == 200:
-                history_data = response.json()
-                return [PaymentHistoryModel(**item) for item in history_data]
+                with metrics.DECODE_LATENCY.labels('historystd').time():
+                    history_data = response.json()
+                    return [PaymentHistoryModel(**self.datetime_decoder.decode_record(item, PaymentHistoryModel))
+                            for item in history_data]
             elif response.status_code == 401:
                 logging.error("Request could not be authenticated: %s", response.text)
                 return "Request could not be authenticated."
@@ -53,3 +70,111 @@ class PaymentHistoryService:
         except requests.RequestException as e:
             logging.error("Network error occurred: %s", str(e))
             return f"Network error occurred: {str(e)}"
+
+    def stream_payment_history(self, timestamp_from, timestamp_to, window=None, max_workers=None, buffer_size=1000):
+        """
+        Yield the payment history of a long time range without loading it into memory.
+
+        The range is split into consecutive sub-windows that are fetched
+        concurrently. Each response is parsed incrementally and the models are
+        yielded in chronological window order, so memory use depends on the
+        window size and buffer_size, not on the length of the range.
+
+        Consecutive windows share their boundary instant; records returned by
+        both windows are yielded once.
+
+        Args:
+            timestamp_from (datetime or str): Start of the range (ISO 8601 if str)
+            timestamp_to (datetime or str): End of the range (ISO 8601 if str)
+            window (timedelta): Sub-window length, defaults to the configured value
+            max_workers (int): Windows fetched at the same time, defaults to the configured value
+            buffer_size (int): Parsed models buffered per in-flight window
+
+        Yields:
+            PaymentHistoryModel: One model per history record
+
+        Raises:
+            PaymentHistoryError: If a window cannot be retrieved or parsed
+        """
+        start = self._to_datetime(timestamp_from)
+        end = self._to_datetime(timestamp_to)
+        window = window or timedelta(hours=self.config.history_window_hours)
+        if end <= start or window <= timedelta(0):
+            raise ValueError("timestamp_to must be after timestamp_from and window must be positive")
+
+        windows = []
+        window_start = start
+        while window_start < end:
+            window_end = min(window_start + window, end)
+            windows.append((window_start, window_end))
+            window_start = window_end
+
+        stop = threading.Event()
+        queues = [queue.Queue(maxsize=buffer_size) for _ in windows]
+        executor = ThreadPoolExecutor(max_workers=max_workers or self.config.history_concurrency,
+                                      thread_name_prefix='history-window')
+        for (window_start, window_end), window_queue in zip(windows, queues):
+            executor.submit(self._fetch_window, window_start, window_end, window_queue, stop)
+        try:
+            previous_ptns = set()
+            for window_queue in queues:
+                current_ptns = set()
+                while True:
+                    item = window_queue.get()
+                    if item is self._END_OF_WINDOW:
+                        break
+                    if isinstance(item, PaymentHistoryError):
+                        raise item
+                    current_ptns.add(item.ptn)
+                    if item.ptn in previous_ptns:
+                        continue
+                    yield item
+                previous_ptns = current_ptns
+        finally:
+            stop.set()
+            executor.shutdown(wait=False)
+
+    def _fetch_window(self, window_start, window_end, window_queue, stop):
+        def put(item):
+            while not stop.is_set():
+                try:
+                    window_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        if stop.is_set():
+            return
+        params = {'timestamp_from': window_start, 'timestamp_to': window_end}
+        headers = {
+            'Authorization': self.api_auth.create_authorization_header('GET', params),
+            'x-api-version': self.api_version
+        }
+        try:
+            with self.http.get(self.base_url, headers=headers, params=params, stream=True,
+                               sign=lambda: self.api_auth.create_authorization_header('GET', params)) as response:
+                if response.status_code != 200:
+                    logging.error("History window %s - %s failed with status code %s", window_start, window_end,
+                                  response.status_code)
+                    put(PaymentHistoryError(
+                        f"History window {window_start} - {window_end} failed with status code {response.status_code}"
+                    ))
+                    return
+                if response.encoding is None:
+                    response.encoding = 'utf-8'
+                for item in iter_json_array(response.iter_content(chunk_size=65536, decode_unicode=True)):
+                    if not put(PaymentHistoryModel(**self.datetime_decoder.decode_record(item, PaymentHistoryModel))):
+                        return
+        except Exception as e:
+            # Always hand the failure to the consumer, which would otherwise wait forever
+            logging.error("History window %s - %s failed: %s", window_start, window_end, str(e))
+            put(PaymentHistoryError(f"History window {window_start} - {window_end} failed: {str(e)}"))
+            return
+        put(self._END_OF_WINDOW)
+
+    @staticmethod
+    def _to_datetime(value):
+        if isinstance(value, datetime):
+            return value
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
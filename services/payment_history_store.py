@@ -0,0 +1,238 @@
+import calendar
+import logging
+import sqlite3
+import threading
+from dataclasses import fields
+from datetime import datetime, timedelta, timezone
+
+from configuration import get_configuration
+from datetime_decoder import get_datetime_decoder
+from models.payment_history_model import PaymentHistoryModel
+from services.payment_history_service import PaymentHistoryService
+
+_COLUMNS = [field.name for field in fields(PaymentHistoryModel)]
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS payment_history (
+    ptn TEXT PRIMARY KEY,
+    {', '.join(column for column in _COLUMNS if column != 'ptn')},
+    timestamp_epoch REAL
+);
+CREATE INDEX IF NOT EXISTS idx_payment_history_trid ON payment_history (trid);
+CREATE INDEX IF NOT EXISTS idx_payment_history_timestamp ON payment_history (timestamp_epoch);
+CREATE INDEX IF NOT EXISTS idx_payment_history_serviceid ON payment_history (serviceid);
+CREATE INDEX IF NOT EXISTS idx_payment_history_status ON payment_history (status);
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_UPSERT = (
+    f"INSERT INTO payment_history ({', '.join(_COLUMNS)}, timestamp_epoch) "
+    f"VALUES ({', '.join('?' for _ in _COLUMNS)}, ?) "
+    f"ON CONFLICT(ptn) DO UPDATE SET "
+    f"{', '.join(f'{column} = excluded.{column}' for column in _COLUMNS if column != 'ptn')}, "
+    f"timestamp_epoch = excluded.timestamp_epoch"
+)
+
+_SELECT = f"SELECT {', '.join(_COLUMNS)} FROM payment_history"
+
+
+def _to_utc(value):
+    """Return value as a naive UTC datetime. Naive input is taken to be UTC already."""
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _to_epoch(value):
+    if value is None or value == '':
+        return None
+    try:
+        value = _to_utc(value)
+    except ValueError:
+        return None
+    return calendar.timegm(value.timetuple()) + value.microsecond / 1_000_000
+
+
+class PaymentHistoryStore:
+    """
+    Local SQLite copy of the payment history, indexed for repeated queries.
+
+    sync() fetches only what happened since the persisted high-water mark
+    (minus a small overlap, so late or updated records are picked up) and
+    upserts it by PTN. Lookups by PTN/TRID and time-range queries are then
+    answered from the local database without calling historystd.
+    """
+
+    BATCH_SIZE = 1000
+
+    def __init__(self, path=None, history_service=None, config=None):
+        """
+        Args:
+            path (str): SQLite database file, defaults to the configured path (":memory:" is allowed)
+            history_service (PaymentHistoryService): Service used to fetch history during sync
+            config (Configuration): Defaults to the shared configuration
+        """
+        self.config = config or get_configuration()
+        self.path = path or self.config.history_store_path
+        self._history_service = history_service
+        self.datetime_decoder = get_datetime_decoder()
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        if self.path != ':memory:':
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        self._connection.commit()
+
+    @property
+    def history_service(self):
+        if self._history_service is None:
+            self._history_service = PaymentHistoryService()
+        return self._history_service
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def high_water_mark(self):
+        """
+        Return the end of the last successful sync as a naive UTC datetime, or None before the first sync.
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM sync_state WHERE name = 'high_water_mark'").fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def sync(self, until=None, since=None):
+        """
+        Fetch new history from historystd and store it locally.
+
+        The range starts at the high-water mark minus the configured overlap, or
+        at `since` (defaulting to the configured look-back) on the first sync.
+        The high-water mark only moves once the whole range has been stored, so
+        an interrupted sync is simply repeated next time.
+
+        Args:
+            until (datetime): End of the range, defaults to now (UTC)
+            since (datetime): Start of the range, overriding the high-water mark
+
+        Returns:
+            dict: Range synced, number of records stored and the new high-water mark
+
+        Raises:
+            PaymentHistoryError: If the history could not be retrieved
+        """
+        with self._sync_lock:
+            until = _to_utc(until) if until else datetime.now(timezone.utc).replace(tzinfo=None)
+            if since:
+                start = _to_utc(since)
+            else:
+                high_water_mark = self.high_water_mark()
+                if high_water_mark:
+                    start = high_water_mark - timedelta(seconds=self.config.history_sync_overlap)
+                else:
+                    start = until - timedelta(days=self.config.history_sync_lookback_days)
+            if start >= until:
+                return {"from": start, "to": until, "stored": 0, "high_water_mark": self.high_water_mark()}
+
+            stored = 0
+            batch = []
+            for record in self.history_service.stream_payment_history(start, until):
+                batch.append(self._to_row(record))
+                if len(batch) >= self.BATCH_SIZE:
+                    self._write(batch)
+                    stored += len(batch)
+                    batch = []
+            self._write(batch, high_water_mark=until)
+            stored += len(batch)
+            logging.info("Synced %s payment history records from %s to %s", stored, start, until)
+            return {"from": start, "to": until, "stored": stored, "high_water_mark": until}
+
+    def get_by_ptn(self, ptn):
+        """
+        Return the PaymentHistoryModel for ptn, or None if it is not stored.
+        """
+        with self._lock:
+            row = self._connection.execute(f"{_SELECT} WHERE ptn = ?", (ptn,)).fetchone()
+        return self._to_model(row) if row else None
+
+    def get_by_trid(self, trid):
+        """
+        Return the list of PaymentHistoryModel stored for trid.
+        """
+        with self._lock:
+            rows = self._connection.execute(f"{_SELECT} WHERE trid = ? ORDER BY timestamp_epoch", (trid,)).fetchall()
+        return [self._to_model(row) for row in rows]
+
+    def query(self, timestamp_from=None, timestamp_to=None, serviceid=None, status=None, limit=None):
+        """
+        Return stored records matching every given filter, oldest first.
+
+        Args:
+            timestamp_from (datetime or str): Inclusive lower bound
+            timestamp_to (datetime or str): Inclusive upper bound
+            serviceid (str): Service ID to match
+            status (str): Status to match, e.g. "SUCCESS"
+            limit (int): Maximum number of records
+
+        Returns:
+            list: PaymentHistoryModel objects
+        """
+        conditions = []
+        params = []
+        if timestamp_from is not None:
+            conditions.append("timestamp_epoch >= ?")
+            params.append(_to_epoch(timestamp_from))
+        if timestamp_to is not None:
+            conditions.append("timestamp_epoch <= ?")
+            params.append(_to_epoch(timestamp_to))
+        if serviceid is not None:
+            conditions.append("serviceid = ?")
+            params.append(str(serviceid))
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        sql = _SELECT
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY timestamp_epoch"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            rows = self._connection.execute(sql, params).fetchall()
+        return [self._to_model(row) for row in rows]
+
+    def count(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM payment_history").fetchone()[0]
+
+    def _write(self, rows, high_water_mark=None):
+        with self._lock, self._connection:
+            if rows:
+                self._connection.executemany(_UPSERT, rows)
+            if high_water_mark is not None:
+                self._connection.execute(
+                    "INSERT INTO sync_state (name, value) VALUES ('high_water_mark', ?) "
+                    "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+                    (high_water_mark.isoformat(),)
+                )
+
+    def _to_model(self, row):
+        return PaymentHistoryModel(**self.datetime_decoder.decode_record(dict(zip(_COLUMNS, row)), PaymentHistoryModel))
+
+    @staticmethod
+    def _to_row(record):
+        values = []
+        for column in _COLUMNS:
+            value = getattr(record, column)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            values.append(value)
+        values.append(_to_epoch(record.timestamp))
+        return values
@@ -1,27 +1,72 @@
 import requests
 from models.payment_status_model import PaymentStatusModel
 from s3_api_auth import S3ApiAuth
-from configuration import Configuration  # Import the configuration class
+from single_flight import SingleFlight
+from ttl_cache import TTLCache
+from http_transport import get_transport
+from configuration import get_configuration
+from datetime_decoder import get_datetime_decoder
+import metrics
 import logging
-from datetime import datetime
-
-# Setup basic configuration for logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 class PaymentStatusService:
     def __init__(self, public_token=None, secret_key=None):
-        self.config = Configuration()  # Create a configuration instance
+        self.config = get_configuration()  # Shared, loaded once per process
         self.public_token = public_token if public_token else self.config.get_api_key()
         self.secret_key = secret_key if secret_key else self.config.get_api_secret()
         self.api_version = self.config.api_version
+        self.http = get_transport(self.config)
+        self.datetime_decoder = get_datetime_decoder()
+        self._status_cache = TTLCache(maxsize=self.config.verifytx_cache_max_entries)
+        self._single_flight = SingleFlight()
         self.base_url = f"{self.config.get_api_url()}/verifytx"
         self.api_auth = S3ApiAuth(self.base_url, self.public_token, self.secret_key)
 
     def fetch_payment_status(self, ptn=None, trid=None):
+        """
+        Retrieve the status of a transaction by PTN and/or TRID.
+
+        Concurrent lookups for the same PTN/TRID share one upstream request.
+        Results whose statuses are all terminal are cached for the terminal TTL;
+        other results are cached only for the short pending TTL.
+        """
         if not ptn and not trid:
             logging.error("PTN or TRID must be provided.")
             return "PTN or TRID must be provided."
-        
+
+        key = self.status_key(ptn, trid)
+        cached = self.cached_status(key)
+        if cached is not None:
+            return cached
+        result = self._single_flight.do(key, lambda: self._fetch_and_cache(key, ptn, trid))
+        return list(result) if isinstance(result, list) else result
+
+    @staticmethod
+    def status_key(ptn=None, trid=None):
+        return (ptn or None, trid or None)
+
+    def cached_status(self, key):
+        """
+        Return a copy of the cached statuses for a lookup key, or None.
+        """
+        cached = self._status_cache.get(key)
+        return list(cached) if cached is not None else None
+
+    def cache_status(self, key, result):
+        """
+        Cache a verifytx result: for the terminal TTL when every status is
+        terminal, for the pending TTL otherwise. Errors are not cached.
+
+        The ASGI app's async lookups go through this too, so both share one cache.
+        """
+        if isinstance(result, list) and result:
+            terminal = all(status.is_terminal() for status in result)
+            ttl = self.config.verifytx_cache_terminal_ttl if terminal else self.config.verifytx_cache_pending_ttl
+            if ttl > 0:
+                self._status_cache.set(key, result, ttl)
+
+    def _fetch_and_cache(self, key, ptn, trid):
         params = {}
         if ptn:
             params['ptn'] = ptn
@@ -33,68 +78,78 @@ class PaymentStatusService:
             'x-api-version': self.api_version
         }
 
-        return self._make_request(params, headers)
+        result = self._make_request(params, headers)
+        self.cache_status(key, result)
+        return result
 
-    def _parse_datetime(self, date_string):
+    def fetch_payment_statuses(self, ptns=None, trids=None, max_workers=None):
         """
-        Parse datetime string to datetime object.
-        
+        Look up the status of many transactions concurrently.
+
+        Each PTN and TRID becomes its own verifytx call. At most max_workers calls
+        run at the same time, and a failed lookup does not affect the others.
+
         Args:
-            date_string: String representation of datetime
-            
-        Returns:
-            datetime object or None if parsing fails
+            ptns (list): Payment Transaction Numbers to look up
+            trids (list): Transaction Reference IDs to look up
+            max_workers (int): Concurrency limit, defaults to the configured value
+
+        Yields:
+            tuple: (lookup, result) in completion order, where lookup is {'ptn': ...}
+            or {'trid': ...} and result is what fetch_payment_status returns for it
         """
-        if not date_string:
-            return None
-            
+        lookups = [{'ptn': ptn} for ptn in (ptns or [])] + [{'trid': trid} for trid in (trids or [])]
+        if not lookups:
+            return
+        max_workers = max(1, min(max_workers or self.config.verifytx_batch_concurrency, len(lookups)))
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='verifytx-batch')
+        futures = {executor.submit(self._fetch_lookup, lookup): lookup for lookup in lookups}
         try:
-            # Try parsing ISO format first
-            return datetime.fromisoformat(date_string.replace('Z', '+00:00'))
-        except ValueError:
-            try:
-                # Try parsing common datetime formats
-                for fmt in ['%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d']:
-                    try:
-                        return datetime.strptime(date_string, fmt)
-                    except ValueError:
-                        continue
-                return None
-            except Exception:
-                return None
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            # Stop pending lookups if the consumer goes away before the batch is done
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _fetch_lookup(self, lookup):
+        try:
+            return self.fetch_payment_status(**lookup)
+        except Exception as e:
+            logging.error(f"Unexpected error verifying {lookup}: {str(e)}")
+            return f"Unexpected error: {str(e)}"
 
     def _make_request(self, params, headers):
         try:
-            response = requests.get(self.base_url, headers=headers, params=params)
+            response = self.http.get(self.base_url, headers=headers, params=params,
+                                     sign=lambda: self.api_auth.create_authorization_header('GET', params))
             if response.status_code == 200:
-                try:
-                    payment_status_data = response.json()
-                    payment_status_models = []
+                with metrics.DECODE_LATENCY.labels('verifytx').time():
+                    try:
+                        payment_status_data = response.json()
+                        payment_status_models = []
                     
-                    for status in payment_status_data:
-                        try:
-                            # Parse datetime fields
-                            if 'timestamp' in status and status['timestamp']:
-                                status['timestamp'] = self._parse_datetime(status['timestamp'])
-                            
-                            if 'clearingDate' in status and status['clearingDate']:
-                                status['clearingDate'] = self._parse_datetime(status['clearingDate'])
-                            
-                            # Create the model
-                            payment_status_model = PaymentStatusModel(**status)
-                            payment_status_models.append(payment_status_model)
+                        for status in payment_status_data:
+                            try:
+                                # Parse datetime fields
+                                self.datetime_decoder.decode_record(status, PaymentStatusModel)
+
+                                # Create the model
+                                payment_status_model = PaymentStatusModel(**status)
+                                payment_status_models.append(payment_status_model)
                             
-                        except Exception as e:
-                            logging.error(f"Error creating PaymentStatusModel: {str(e)}")
-                            logging.error(f"Status data: {status}")
-                            # Return the raw data if model creation fails
-                            return f"Data parsing error for transaction: {str(e)}"
+                            except Exception as e:
+                                logging.error(f"Error creating PaymentStatusModel: {str(e)}")
+                                logging.error(f"Status data: {status}")
+                                # Return the raw data if model creation fails
+                                return f"Data parsing error for transaction: {str(e)}"
                     
-                    return payment_status_models
+                        return payment_status_models
                     
-                except Exception as e:
-                    logging.error(f"Error parsing response JSON: {str(e)}")
-                    return f"Data parsing error: {str(e)}"
+                    except Exception as e:
+                        logging.error(f"Error parsing response JSON: {str(e)}")
+                        return f"Data parsing error: {str(e)}"
             elif response.status_code == 401:
                 logging.error(f"Authentication failed: {response.text}")
                 return "Request could not be authenticated."
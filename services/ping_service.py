@@ -1,15 +1,13 @@
 import requests
 from models.ping_model import PingModel
 from s3_api_auth import S3ApiAuth
-from configuration import Configuration  # Import the configuration class
+from http_transport import get_transport
+from configuration import get_configuration
 import logging
 
-# Setup basic configuration for logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
 class PingService:
     def __init__(self, public_token=None, secret_key=None):
-        config = Configuration()  # Create a configuration instance
+        config = get_configuration()  # Shared, loaded once per process
         public_token = public_token if public_token else config.get_api_key()
         secret_key = secret_key if secret_key else config.get_api_secret()
 
@@ -17,6 +15,7 @@ class PingService:
         self.full_url = f"{config.get_api_url()}/ping"
         self.api_auth = S3ApiAuth(self.full_url, public_token, secret_key)
         self.api_version = config.api_version
+        self.http = get_transport(config)
 
     def ping(self):
         headers = {
@@ -24,7 +23,8 @@ class PingService:
             'x-api-version': self.api_version
         }
         try:
-            response = requests.get(self.full_url, headers=headers)
+            response = self.http.get(self.full_url, headers=headers,
+                                     sign=lambda: self.api_auth.create_authorization_header('GET'))
             if response.status_code == 200:
                 return PingModel(**response.json())
             elif response.status_code == 401:
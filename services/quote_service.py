@@ -1,15 +1,21 @@
 import requests
 from models.quote_model import QuoteModel
 from s3_api_auth import S3ApiAuth
-from configuration import Configuration  # Import the configuration class
+from http_transport import get_transport
+from configuration import get_configuration
+from datetime_decoder import get_datetime_decoder
+import metrics
+from sdk_logging import request_logger
 import logging
 
 class QuoteService:
     def __init__(self, public_token=None, secret_key=None):
-        self.config = Configuration()  # Create a configuration instance
+        self.config = get_configuration()  # Shared, loaded once per process
         self.public_token = public_token if public_token else self.config.get_api_key()
         self.secret_key = secret_key if secret_key else self.config.get_api_secret()
         self.api_version = self.config.api_version
+        self.http = get_transport(self.config)
+        self.datetime_decoder = get_datetime_decoder()
         self.base_url = f"{self.config.get_api_url()}/quotestd"
         self.api_auth = S3ApiAuth(self.base_url, self.public_token, self.secret_key)
 
@@ -25,16 +31,17 @@ class QuoteService:
             'x-api-version': self.api_version,
             'Content-Type': 'application/json'
         })
-        logging.debug(f"Requesting quote with payload: {payload}")
+        request_logger.debug("Requesting quote with payload: %s", payload)
         return self._make_request(payload, headers)
 
     def _make_request(self, payload, headers):
         try:
-            response = requests.post(self.base_url, headers=headers, json=payload)
+            response = self.http.post(self.base_url, headers=headers, json=payload)
             logging.debug(f"Received response status: {response.status_code}")
             if response.status_code == 200:
-                quote_data = response.json()
-                return QuoteModel(**quote_data)
+                with metrics.DECODE_LATENCY.labels('quotestd').time():
+                    quote_data = response.json()
+                    return QuoteModel(**self.datetime_decoder.decode_record(quote_data, QuoteModel))
             elif response.status_code == 401:
                 logging.error("Request could not be authenticated: %s", response.text)
                 return "Request could not be authenticated."
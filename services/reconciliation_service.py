@@ -0,0 +1,348 @@
+import itertools
+import json
+import logging
+import os
+import pickle
+import tempfile
+from collections import Counter
+
+from configuration import get_configuration
+from models.reconciliation_result import ReconciliationResult
+from services.payment_history_service import PaymentHistoryService
+
+# Position of each field in the compact row tuples used while joining
+_TRID, _PTN, _AMOUNT, _CURRENCY, _STATUS = range(5)
+_ROW_FIELDS = ('trid', 'ptn', 'amount', 'currency', 'status')
+
+DEFAULT_FIELD_MAP = {'trid': 'trid', 'ptn': 'ptn', 'amount': 'amount', 'currency': 'currency', 'status': 'status'}
+
+
+def _value(record, name):
+    if isinstance(record, dict):
+        return record.get(name)
+    return getattr(record, name, None)
+
+
+def _amount(value):
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _row_key(row):
+    return row[_TRID] or row[_PTN]
+
+
+class _PartitionWriter:
+    """
+    Pickles records into one of several files by the hash of a key.
+    """
+
+    def __init__(self, directory, name, partitions):
+        self.paths = [os.path.join(directory, f"{name}-{index}") for index in range(partitions)]
+        self._files = [open(path, 'wb') for path in self.paths]
+
+    def write(self, key, record):
+        pickle.dump(record, self._files[hash(key) % len(self._files)], pickle.HIGHEST_PROTOCOL)
+
+    def close(self):
+        for file in self._files:
+            file.close()
+
+
+class ReconciliationService:
+    """
+    Reconciles our own cashin records against S3P payment records.
+
+    Local records (keyed by trid) are hash-joined with upstream records
+    (PaymentHistoryModel, PaymentStatusModel or their JSON dicts) and each pair
+    is compared on amount (priceLocalCur), currency (localCur) and status. The
+    report is streamed as ReconciliationResult objects, one per local record
+    plus one per upstream record no local record refers to.
+
+    Only the upstream side is held in memory, as compact tuples. When it grows
+    past max_in_memory records both sides are spilled to hash partitions on
+    disk and joined one partition at a time (grace hash join), so memory stays
+    bounded regardless of the number of rows.
+    """
+
+    MATCHED = "matched"
+    MISMATCHED = "mismatched"
+    MISSING_UPSTREAM = "missing_upstream"
+    MISSING_LOCAL = "missing_local"
+
+    def __init__(self, history_service=None, config=None, amount_tolerance=None, max_in_memory=None,
+                 partitions=None, field_map=None, status_map=None):
+        """
+        Args:
+            history_service (PaymentHistoryService): Used by reconcile_history
+            config (Configuration): Defaults to the shared configuration
+            amount_tolerance (float): Largest amount difference still considered equal
+            max_in_memory (int): Upstream records joined in memory before spilling to disk
+            partitions (int): Number of on-disk partitions used after spilling
+            field_map (dict): Attribute or key names of the local records for
+                trid, ptn, amount, currency and status
+            status_map (dict): Translates local statuses to S3P statuses, e.g. {"PAID": "SUCCESS"}
+        """
+        self.config = config or get_configuration()
+        self._history_service = history_service
+        self.amount_tolerance = amount_tolerance if amount_tolerance is not None \
+            else self.config.reconciliation_amount_tolerance
+        self.max_in_memory = max_in_memory or self.config.reconciliation_max_in_memory
+        self.partitions = partitions or self.config.reconciliation_partitions
+        self.field_map = dict(DEFAULT_FIELD_MAP, **(field_map or {}))
+        self.status_map = {str(key).upper(): str(value).upper() for key, value in (status_map or {}).items()}
+
+    @property
+    def history_service(self):
+        if self._history_service is None:
+            self._history_service = PaymentHistoryService()
+        return self._history_service
+
+    def reconcile(self, local_records, upstream_records):
+        """
+        Join local records with upstream records and yield the comparison.
+
+        Records are joined on trid. A local record whose trid matches no
+        upstream record, or that has no trid, is joined on ptn instead. When
+        several upstream records share a trid, the one with the local record's
+        ptn (or else its status, or else the SUCCESS one) is compared, and none
+        of them is reported as missing locally.
+
+        Args:
+            local_records (iterable): Our records, as dicts or objects (see field_map)
+            upstream_records (iterable): PaymentHistoryModel / PaymentStatusModel objects or dicts
+
+        Yields:
+            ReconciliationResult: One per local record, then one per unreferenced upstream record
+        """
+        upstream_rows = (self._upstream_row(record) for record in upstream_records)
+        local_rows = (self._local_row(record) for record in local_records)
+
+        rows = []
+        for row in upstream_rows:
+            rows.append(row)
+            if len(rows) > self.max_in_memory:
+                logging.info("Reconciliation exceeded %s upstream records, spilling to %s partitions",
+                             self.max_in_memory, self.partitions)
+                yield from self._reconcile_partitioned(rows, upstream_rows, local_rows)
+                return
+        yield from self._join(rows, local_rows)
+
+    def reconcile_history(self, local_records, timestamp_from, timestamp_to):
+        """
+        Reconcile local records against the historystd records of a time range.
+
+        The history is streamed window by window, see PaymentHistoryService.stream_payment_history.
+        """
+        upstream = self.history_service.stream_payment_history(timestamp_from, timestamp_to)
+        return self.reconcile(local_records, upstream)
+
+    def write_report(self, results, output):
+        """
+        Write results to a text stream as NDJSON, one result per line.
+
+        Args:
+            results (iterable): ReconciliationResult objects, e.g. from reconcile()
+            output: Writable text stream
+
+        Returns:
+            dict: Number of results per outcome
+        """
+        counts = Counter()
+        for result in results:
+            output.write(json.dumps(result.to_dict()) + "\n")
+            counts[result.outcome] += 1
+        return {outcome: counts[outcome] for outcome in
+                (self.MATCHED, self.MISMATCHED, self.MISSING_UPSTREAM, self.MISSING_LOCAL)}
+
+    def _reconcile_partitioned(self, rows, upstream_rows, local_rows):
+        """
+        Join in two partitioned passes: on trid, then on ptn for the local records left over.
+
+        Upstream records reach the second pass with a flag telling whether a
+        local record already referenced their trid, so both passes together
+        give the same results as _join.
+        """
+        with tempfile.TemporaryDirectory(prefix='reconciliation-') as directory:
+            upstream_by_ptn = _PartitionWriter(directory, 'upstream-ptn', self.partitions)
+            local_by_ptn = _PartitionWriter(directory, 'local-ptn', self.partitions)
+
+            upstream_by_trid = _PartitionWriter(directory, 'upstream-trid', self.partitions)
+            for row in itertools.chain(rows, upstream_rows):
+                if row[_TRID]:
+                    upstream_by_trid.write(row[_TRID], row)
+                elif row[_PTN]:
+                    upstream_by_ptn.write(row[_PTN], (row, False))
+                else:
+                    yield self._missing_local(row)
+            rows.clear()
+            upstream_by_trid.close()
+            local_by_trid = _PartitionWriter(directory, 'local-trid', self.partitions)
+            for local in local_rows:
+                if local[_TRID]:
+                    local_by_trid.write(local[_TRID], local)
+                elif local[_PTN]:
+                    local_by_ptn.write(local[_PTN], local)
+                else:
+                    yield self._missing_upstream(local)
+            local_by_trid.close()
+
+            # Pass 1: trid
+            for upstream_path, local_path in zip(upstream_by_trid.paths, local_by_trid.paths):
+                by_trid = {}
+                for row in self._read_partition(upstream_path):
+                    by_trid.setdefault(row[_TRID], []).append(row)
+                os.remove(upstream_path)
+                referenced_trids = set()
+                for local in self._read_partition(local_path):
+                    candidates = by_trid.get(local[_TRID])
+                    if candidates:
+                        referenced_trids.add(local[_TRID])
+                        yield self._compared(local, self._choose(candidates, local))
+                    elif local[_PTN]:
+                        local_by_ptn.write(local[_PTN], local)
+                    else:
+                        yield self._missing_upstream(local)
+                os.remove(local_path)
+                for trid, candidates in by_trid.items():
+                    referenced = trid in referenced_trids
+                    for row in candidates:
+                        if row[_PTN]:
+                            upstream_by_ptn.write(row[_PTN], (row, referenced))
+                        elif not referenced:
+                            yield self._missing_local(row)
+            upstream_by_ptn.close()
+            local_by_ptn.close()
+
+            # Pass 2: ptn
+            for upstream_path, local_path in zip(upstream_by_ptn.paths, local_by_ptn.paths):
+                by_ptn = {}
+                referenced_rows = set()
+                for row, referenced in self._read_partition(upstream_path):
+                    by_ptn.setdefault(row[_PTN], []).append(row)
+                    if referenced:
+                        referenced_rows.add(row)
+                os.remove(upstream_path)
+                for local in self._read_partition(local_path):
+                    candidates = by_ptn.get(local[_PTN])
+                    if not candidates:
+                        yield self._missing_upstream(local)
+                        continue
+                    upstream = self._choose(candidates, local)
+                    referenced_rows.add(upstream)
+                    yield self._compared(local, upstream)
+                os.remove(local_path)
+                for candidates in by_ptn.values():
+                    for row in candidates:
+                        if row not in referenced_rows:
+                            yield self._missing_local(row)
+
+    @staticmethod
+    def _read_partition(path):
+        with open(path, 'rb') as file:
+            while True:
+                try:
+                    yield pickle.load(file)
+                except EOFError:
+                    return
+
+    def _join(self, rows, local_rows):
+        by_trid = {}
+        by_ptn = {}
+        for row in rows:
+            if row[_TRID]:
+                by_trid.setdefault(row[_TRID], []).append(row)
+            if row[_PTN]:
+                by_ptn.setdefault(row[_PTN], []).append(row)
+        referenced_trids = set()
+        referenced_rows = set()
+        for local in local_rows:
+            candidates = by_trid.get(local[_TRID]) if local[_TRID] else None
+            if candidates:
+                referenced_trids.add(local[_TRID])
+                yield self._compared(local, self._choose(candidates, local))
+                continue
+            candidates = by_ptn.get(local[_PTN]) if local[_PTN] else None
+            if not candidates:
+                yield self._missing_upstream(local)
+                continue
+            upstream = self._choose(candidates, local)
+            referenced_rows.add(upstream)
+            yield self._compared(local, upstream)
+        for row in rows:
+            if row[_TRID] not in referenced_trids and row not in referenced_rows:
+                yield self._missing_local(row)
+
+    def _compared(self, local, upstream):
+        differences = self._compare(local, upstream)
+        return ReconciliationResult(self.MISMATCHED if differences else self.MATCHED, _row_key(local),
+                                    local=self._as_dict(local), upstream=self._as_dict(upstream),
+                                    differences=differences)
+
+    def _missing_upstream(self, local):
+        return ReconciliationResult(self.MISSING_UPSTREAM, _row_key(local), local=self._as_dict(local))
+
+    def _missing_local(self, upstream):
+        return ReconciliationResult(self.MISSING_LOCAL, _row_key(upstream), upstream=self._as_dict(upstream))
+
+    @staticmethod
+    def _choose(candidates, local):
+        if len(candidates) == 1:
+            return candidates[0]
+        for field_index in (_PTN, _STATUS):
+            if local[field_index]:
+                for candidate in candidates:
+                    if candidate[field_index] == local[field_index]:
+                        return candidate
+        for candidate in candidates:
+            if candidate[_STATUS] == 'SUCCESS':
+                return candidate
+        return candidates[-1]
+
+    def _compare(self, local, upstream):
+        differences = []
+        if local[_PTN] and local[_PTN] != upstream[_PTN]:
+            differences.append('ptn')
+        if local[_AMOUNT] is not None and upstream[_AMOUNT] is not None \
+                and abs(local[_AMOUNT] - upstream[_AMOUNT]) > self.amount_tolerance:
+            differences.append('amount')
+        if local[_CURRENCY] and upstream[_CURRENCY] and local[_CURRENCY] != upstream[_CURRENCY]:
+            differences.append('currency')
+        if local[_STATUS] and local[_STATUS] != upstream[_STATUS]:
+            differences.append('status')
+        return differences
+
+    def _local_row(self, record):
+        field_map = self.field_map
+        currency = _value(record, field_map['currency'])
+        status = _value(record, field_map['status'])
+        if status:
+            status = str(status).upper()
+            status = self.status_map.get(status, status)
+        return (
+            _value(record, field_map['trid']) or None,
+            _value(record, field_map['ptn']) or None,
+            _amount(_value(record, field_map['amount'])),
+            str(currency).upper() if currency else None,
+            status or None
+        )
+
+    @staticmethod
+    def _upstream_row(record):
+        currency = _value(record, 'localCur')
+        status = _value(record, 'status')
+        return (
+            _value(record, 'trid') or None,
+            _value(record, 'ptn') or None,
+            _amount(_value(record, 'priceLocalCur')),
+            str(currency).upper() if currency else None,
+            str(status).upper() if status else None
+        )
+
+    @staticmethod
+    def _as_dict(row):
+        return dict(zip(_ROW_FIELDS, row))
@@ -1,18 +1,19 @@
 import requests
 from models.service_model import ServiceModel
 from s3_api_auth import S3ApiAuth
-from configuration import Configuration  # Import the configuration class
+from http_transport import get_transport
+from configuration import get_configuration
 import logging
 
-# Setup basic configuration for logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
 class ServiceApi:
+    SERVICE_NOT_FOUND = "Service does not exist."
+
     def __init__(self, public_token=None, secret_key=None):
-        self.config = Configuration()  # Create a configuration instance
+        self.config = get_configuration()  # Shared, loaded once per process
         self.public_token = public_token if public_token else self.config.get_api_key()
         self.secret_key = secret_key if secret_key else self.config.get_api_secret()
         self.api_version = self.config.api_version
+        self.http = get_transport(self.config)
 
     def fetch_services(self):
         url = f"{self.config.get_api_url()}/service"
@@ -33,12 +34,12 @@ class ServiceApi:
 
     def _make_request(self, url, headers, multiple=False):
         try:
-            response = requests.get(url, headers=headers)
+            response = self.http.get(url, headers=headers, sign=lambda: self._prepare_headers(url)['Authorization'])
             if response.status_code == 200:
                 return self._parse_response(response.json(), multiple)
             elif response.status_code == 404:
                 logging.error("Service not found for URL: %s", url)
-                return "Service does not exist."
+                return self.SERVICE_NOT_FOUND
             elif response.status_code == 401:
                 logging.error("Request could not be authenticated.")
                 return "Request could not be authenticated."
@@ -1,22 +1,21 @@
 import requests
 from s3_api_auth import S3ApiAuth
-from configuration import Configuration
+from http_transport import get_transport
+from configuration import get_configuration
 import logging
 from dataclasses import dataclass
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
 @dataclass
 class VerificationResult:
     is_valid: bool
 
 class ServiceNumberVerificationApi:
     def __init__(self, public_token=None, secret_key=None):
-        self.config = Configuration()  # Create and configure instance from environment variables
+        self.config = get_configuration()  # Shared, loaded once per process
         self.public_token = public_token or self.config.get_api_key()
         self.secret_key = secret_key or self.config.get_api_secret()
         self.api_version = self.config.api_version
+        self.http = get_transport(self.config)
         self.base_url = f"{self.config.get_api_url()}/verify"
         self.api_auth = S3ApiAuth(self.base_url, self.public_token, self.secret_key)  # Instantiate API auth
 
@@ -30,7 +29,8 @@ class ServiceNumberVerificationApi:
 
     def _make_request(self, params, headers):
         try:
-            response = requests.get(self.base_url, headers=headers, params=params)
+            response = self.http.get(self.base_url, headers=headers, params=params,
+                                     sign=lambda: self.api_auth.create_authorization_header('GET', params))
             if response.status_code == 200:
                 # Convert response JSON to VerificationResult assuming the response structure is {'is_valid': bool}
                 result_data = response.json()
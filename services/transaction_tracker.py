@@ -0,0 +1,197 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from configuration import get_configuration
+from services.payment_status_service import PaymentStatusService
+from ttl_cache import TTLCache
+
+
+@dataclass
+class TrackedTransaction:
+    ptn: Optional[str]
+    trid: Optional[str]
+    first_seen: float
+    next_poll: float
+    attempts: int = 0
+
+    @property
+    def key(self):
+        return ('ptn', self.ptn) if self.ptn else ('trid', self.trid)
+
+    @property
+    def lookup(self):
+        return {'ptn': self.ptn} if self.ptn else {'trid': self.trid}
+
+
+class TransactionTracker:
+    """
+    Follows pending transactions until they reach a terminal status.
+
+    A scheduler thread polls verifytx for every tracked PTN/TRID with
+    per-transaction exponential backoff. Polls that fall due together are sent
+    as one concurrent batch through PaymentStatusService.fetch_payment_statuses.
+    The latest PaymentStatusModel of each transaction is kept locally, so
+    callers can answer terminal transactions without an upstream call.
+    """
+
+    BACKOFF_FACTOR = 2
+    JITTER = 0.1
+
+    def __init__(self, payment_status_service=None, config=None, initial_delay=None, max_delay=None,
+                 max_age=None, batch_size=None, max_tracked=None, clock=time.monotonic):
+        self.config = config or get_configuration()
+        self.payment_status_service = payment_status_service or PaymentStatusService()
+        self.initial_delay = initial_delay or self.config.tracker_initial_delay
+        self.max_delay = max_delay or self.config.tracker_max_delay
+        self.max_age = max_age or self.config.tracker_max_age
+        self.batch_size = batch_size or self.config.tracker_batch_size
+        self.max_tracked = max_tracked or self.config.tracker_max_tracked
+        self.clock = clock
+
+        self._pending = {}
+        self._schedule = []
+        self._sequence = itertools.count()
+        self._latest = TTLCache(maxsize=self.max_tracked * 2, clock=clock)
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='transaction-tracker', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def track(self, ptn=None, trid=None):
+        """
+        Start following a transaction. Already tracked or terminal transactions are ignored.
+        """
+        if not ptn and not trid:
+            return
+        if self.get_terminal_status(ptn=ptn, trid=trid) is not None:
+            return
+        now = self.clock()
+        transaction = TrackedTransaction(ptn=ptn, trid=trid, first_seen=now, next_poll=now + self.initial_delay)
+        with self._condition:
+            if transaction.key in self._pending:
+                return
+            if len(self._pending) >= self.max_tracked:
+                logging.warning("Transaction tracker is full; not tracking PTN %s / TRID %s", ptn, trid)
+                return
+            self._pending[transaction.key] = transaction
+            self._schedule_poll(transaction)
+            self._condition.notify()
+        self.start()
+
+    def track_collection(self, collect_data):
+        """
+        Collect listener: track the transaction created by a collectstd call.
+        """
+        if isinstance(collect_data, dict):
+            self.track(ptn=collect_data.get('ptn'), trid=collect_data.get('trid'))
+
+    def record(self, statuses):
+        """
+        Store PaymentStatusModels obtained elsewhere and stop polling the terminal ones.
+        """
+        ttl = self.max_age
+        with self._condition:
+            for status in statuses:
+                if status.ptn:
+                    self._latest.set(('ptn', status.ptn), status, ttl)
+                if status.trid:
+                    self._latest.set(('trid', status.trid), status, ttl)
+                if status.is_terminal():
+                    self._pending.pop(('ptn', status.ptn), None)
+                    self._pending.pop(('trid', status.trid), None)
+
+    def get_status(self, ptn=None, trid=None):
+        """
+        Return the latest known PaymentStatusModel matching every identifier given, or None.
+        """
+        status = self._latest.get(('ptn', ptn)) if ptn else self._latest.get(('trid', trid)) if trid else None
+        if status is None or (ptn and status.ptn != ptn) or (trid and status.trid != trid):
+            return None
+        return status
+
+    def get_terminal_status(self, ptn=None, trid=None):
+        status = self.get_status(ptn=ptn, trid=trid)
+        return status if status is not None and status.is_terminal() else None
+
+    def stats(self):
+        with self._condition:
+            return {'tracked': len(self._pending), 'stored': len(self._latest)}
+
+    def _schedule_poll(self, transaction):
+        heapq.heappush(self._schedule, (transaction.next_poll, next(self._sequence), transaction.key))
+
+    def _pop_due(self, now):
+        due = []
+        while self._schedule and self._schedule[0][0] <= now and len(due) < self.batch_size:
+            next_poll, _, key = heapq.heappop(self._schedule)
+            transaction = self._pending.get(key)
+            # Skip entries that were rescheduled or finished since they were queued
+            if transaction is not None and transaction.next_poll == next_poll:
+                due.append(transaction)
+        return due
+
+    def _run(self):
+        while not self._stopped.is_set():
+            with self._condition:
+                now = self.clock()
+                due = self._pop_due(now)
+                if not due:
+                    timeout = self._schedule[0][0] - now if self._schedule else None
+                    self._condition.wait(timeout)
+                    continue
+            try:
+                self._poll(due)
+            except Exception as e:
+                logging.error("Transaction tracker poll failed: %s", str(e))
+                with self._condition:
+                    for transaction in due:
+                        if transaction.key in self._pending:
+                            self._reschedule(transaction)
+
+    def _poll(self, due):
+        by_lookup = {tuple(transaction.lookup.items())[0]: transaction for transaction in due}
+        ptns = [transaction.ptn for transaction in due if transaction.ptn]
+        trids = [transaction.trid for transaction in due if not transaction.ptn]
+        logging.debug("Polling %s tracked transaction(s)", len(due))
+        for lookup, result in self.payment_status_service.fetch_payment_statuses(ptns=ptns, trids=trids):
+            transaction = by_lookup[tuple(lookup.items())[0]]
+            if isinstance(result, list):
+                self.record(result)
+            else:
+                logging.warning("Polling %s failed: %s", transaction.lookup, result)
+            with self._condition:
+                if transaction.key in self._pending:
+                    self._reschedule(transaction)
+
+    def _reschedule(self, transaction):
+        now = self.clock()
+        if now - transaction.first_seen >= self.max_age:
+            logging.warning("Giving up tracking %s after %s attempts", transaction.lookup, transaction.attempts)
+            self._pending.pop(transaction.key, None)
+            return
+        transaction.attempts += 1
+        delay = min(self.initial_delay * self.BACKOFF_FACTOR ** transaction.attempts, self.max_delay)
+        delay *= random.uniform(1 - self.JITTER, 1 + self.JITTER)
+        transaction.next_poll = now + delay
+        self._schedule_poll(transaction)
+        self._condition.notify()
@@ -0,0 +1,11 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Services read these when they are first imported or built; no test calls the real API
+os.environ.setdefault('SMOBIL_PAY_API_URL', 'http://s3p.test/v2')
+os.environ.setdefault('SMOBIL_PAY_API_KEY', 'test-public-token')
+os.environ.setdefault('SMOBIL_PAY_API_SECRET', 'test-secret-key')
+os.environ.setdefault('SMOBILE_PAY_CASH_IN_MTN_MOMO_PAY_ID', 'S-20052-CASHIN')
+os.environ.setdefault('SMOBIL_PAY_LOG_ASYNC', 'False')
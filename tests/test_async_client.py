@@ -0,0 +1,47 @@
+import asyncio
+import uuid
+
+from services.async_client import AsyncSmobilpayClient
+from services.cashin_service import CashinService
+
+
+def _cashin(**overrides):
+    return dict({
+        'channel': 'MTN', 'amount': 100, 'serviceNumber': '690000000', 'customerPhonenumber': '237690000000',
+        'customerEmailaddress': 'payer@example.com', 'trid': f"test-{uuid.uuid4()}"
+    }, **overrides)
+
+
+def _client(sent):
+    client = AsyncSmobilpayClient()
+
+    async def send_form(path, payload, deadline=None):
+        sent.append(path)
+        if path == 'quotestd':
+            return {"success": True, "data": {'quoteId': 'quote-1'}}
+        return {"success": True, "data": {'ptn': 'ptn-1', 'trid': payload['trid'], 'status': 'PENDING'}}
+
+    client._send_form = send_form
+    return client
+
+
+def test_cashin_is_validated_as_by_cashin_service():
+    sent = []
+    client = _client(sent)
+    for cashin in (_cashin(channel='WAVE'), {k: v for k, v in _cashin().items() if k != 'trid'}):
+        assert asyncio.run(client.process_cashin(cashin)) == CashinService.validate_cashin(cashin)
+    assert sent == []
+
+
+def test_collect_listeners_get_each_successful_collect():
+    sent, collected = [], []
+    client = _client(sent)
+    client.add_collect_listener(collected.append)
+    cashin = _cashin()
+
+    assert asyncio.run(client.process_cashin(cashin))['status'] == 'success'
+    # A repeated trid is answered from the idempotency store and creates no new transaction
+    assert asyncio.run(client.process_cashin(cashin))['duplicate'] is True
+
+    assert sent == ['quotestd', 'collectstd']
+    assert collected == [{'ptn': 'ptn-1', 'trid': cashin['trid'], 'status': 'PENDING'}]
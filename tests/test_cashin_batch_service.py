@@ -0,0 +1,77 @@
+import pytest
+
+from models.payment_status_model import PaymentStatusModel
+from services.cashin_batch_service import CashinBatchService
+
+
+class StubCashinService:
+    """Sends collectstd for every row, then answers with the configured result or raises."""
+
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.sent = []
+
+    def validate_cashin(self, cashin_data):
+        return None
+
+    def process_cashin(self, cashin_data, on_collect=None):
+        self.sent.append(cashin_data['trid'])
+        on_collect('quote-1')
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+class StubPaymentStatusService:
+    def __init__(self, result):
+        self.result = result
+
+    def fetch_payment_status(self, ptn=None, trid=None):
+        return self.result
+
+
+def _status(status):
+    return PaymentStatusModel(
+        ptn='ptn-1', serviceid='20052', merchant='MTNMOMO', timestamp=None, receiptNumber='', veriCode='',
+        clearingDate=None, trid='row-1', priceLocalCur=100, priceSystemCur=100, localCur='XAF', systemCur='XAF',
+        pin='', status=status, payItemId='S-20052-CASHIN', payItemDescr='', errorCode=0, tag=''
+    )
+
+
+ROWS = [{'trid': 'row-1', 'channel': 'MTN', 'amount': 100}]
+
+
+def _resume(verifytx_result):
+    """Leave row-1 UNCERTAIN after its collect was sent, then run the batch again."""
+    batch = CashinBatchService(':memory:', cashin_service=StubCashinService(TimeoutError('read timed out')),
+                               payment_status_service=StubPaymentStatusService(verifytx_result), max_workers=1)
+    assert [row.status for row in batch.run(ROWS)] == [CashinBatchService.UNCERTAIN]
+    batch.cashin_service = StubCashinService({'status': 'success', 'result': {'ptn': 'ptn-2'}})
+    outcomes = list(batch.run(ROWS))
+    return batch, outcomes
+
+
+@pytest.mark.parametrize('status, expected', [
+    ('SUCCESS', CashinBatchService.SUCCEEDED),
+    ('ERRORED', CashinBatchService.FAILED),
+    ('PENDING', CashinBatchService.UNCERTAIN),
+    ('INPROCESS', CashinBatchService.UNCERTAIN),
+])
+def test_in_doubt_row_is_settled_from_its_verifytx_status(status, expected):
+    batch, outcomes = _resume([_status(status)])
+    assert [(row.status, row.resumed) for row in outcomes] == [(expected, True)]
+    assert outcomes[0].result['result']['status'] == status
+    assert batch.cashin_service.sent == []
+    assert batch.progress() == {expected: 1}
+
+
+def test_in_doubt_row_unknown_to_s3p_is_sent_again():
+    batch, outcomes = _resume([])
+    assert [(row.status, row.resumed) for row in outcomes] == [(CashinBatchService.SUCCEEDED, False)]
+    assert batch.cashin_service.sent == ['row-1']
+
+
+def test_in_doubt_row_stays_uncertain_when_verification_fails():
+    batch, outcomes = _resume("Network error occurred: timed out")
+    assert [row.status for row in outcomes] == [CashinBatchService.UNCERTAIN]
+    assert batch.cashin_service.sent == []
@@ -0,0 +1,60 @@
+import re
+import uuid
+
+from s3_api_auth import HMACSignature
+from services.cashin_service import CashinService
+
+
+class StubResponse:
+    def __init__(self, data, status_code=200):
+        self.data = data
+        self.status_code = status_code
+        self.text = str(data)
+
+    def json(self):
+        return self.data
+
+
+class StubTransport:
+    """Answers quotestd, collectstd and cashin, and records how each request was signed."""
+
+    def __init__(self):
+        self.requests = []
+
+    def timeout_for(self, url):
+        return (5.0, 30.0)
+
+    def post(self, url, data=None, headers=None, **kwargs):
+        self.requests.append(('POST', url, dict(data or {}), headers['Authorization']))
+        if url.endswith('/quotestd'):
+            return StubResponse({'quoteId': 'quote-1'})
+        return StubResponse({'ptn': 'ptn-1', 'trid': data.get('trid'), 'status': 'PENDING'})
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        self.requests.append(('GET', url, dict(params or {}), headers['Authorization']))
+        return StubResponse([])
+
+
+def _signature_matches(method, url, params, authorization, secret):
+    fields = dict(re.findall(r'(s3pAuth_\w+)="([^"]*)"', authorization))
+    signature = fields.pop('s3pAuth_signature')
+    return HMACSignature(method, url, dict(params, **fields)).generate(secret) == signature
+
+
+def test_each_endpoint_is_signed_with_its_own_url():
+    service = CashinService()
+    service.http = StubTransport()
+    cashin = {
+        'channel': 'MTN', 'amount': 100, 'serviceNumber': '690000000', 'customerPhonenumber': '237690000000',
+        'customerEmailaddress': 'payer@example.com', 'trid': f"test-{uuid.uuid4()}"
+    }
+
+    assert service.process_cashin(cashin)['status'] == 'success'
+    assert service.fetch_cashins() == []
+
+    assert [(method, url.rsplit('/', 1)[1]) for method, url, _, _ in service.http.requests] == [
+        ('POST', 'quotestd'), ('POST', 'collectstd'), ('GET', 'cashin')
+    ]
+    for method, url, params, authorization in service.http.requests:
+        assert _signature_matches(method, url, params, authorization, service.secret_key)
+    assert service.api_auth.api_url == service.base_url
@@ -0,0 +1,75 @@
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timezone
+from typing import List
+
+import pytest
+
+from models.columnar_batch import ColumnarBatch
+from models.payment_status_model import PaymentStatusModel, SlottedPaymentStatusModel
+from models.slotted import slotted_variant
+
+
+def _status(**values):
+    row = dict(
+        ptn='ptn-1', serviceid='20052', merchant='MTNMOMO', timestamp=datetime(2024, 3, 1, 12, 30, tzinfo=timezone.utc),
+        receiptNumber='R1', veriCode='V1', clearingDate=None, trid='order-1', priceLocalCur=100.5,
+        priceSystemCur=100.5, localCur='XAF', systemCur='XAF', pin='', status='SUCCESS', payItemId='S-20052',
+        payItemDescr='Cashin', errorCode=0, tag=''
+    )
+    row.update(values)
+    return PaymentStatusModel(**row)
+
+
+def _types(model):
+    return [(name.name, type(getattr(model, name.name))) for name in fields(model)]
+
+
+@pytest.mark.parametrize('values', [
+    {},
+    {'priceLocalCur': 100, 'priceSystemCur': None},  # ints in float fields stay ints
+    {'priceLocalCur': '100.50'},  # a string in a float field stays a string
+    {'errorCode': '703201'},  # a string in an int field stays a string
+    {'errorCode': None, 'timestamp': datetime(2024, 3, 1, 12, 30)},
+])
+def test_columnar_round_trip_keeps_values_and_types(values):
+    models = [_status(), _status(ptn='ptn-2', **values), _status(ptn='ptn-3')]
+    batch = ColumnarBatch.from_models(PaymentStatusModel, models)
+
+    assert batch.to_models() == models
+    assert [_types(model) for model in batch] == [_types(model) for model in models]
+
+
+def test_numeric_columns_stay_typed_when_values_fit():
+    batch = ColumnarBatch.from_models(PaymentStatusModel, [_status(priceLocalCur=100), _status(priceLocalCur=2.5)])
+
+    assert list(batch.column('priceLocalCur')) == [100.0, 2.5]
+    assert not isinstance(batch.column('priceLocalCur'), list)
+    assert not isinstance(batch.column('errorCode'), list)
+
+
+def test_slotted_variant_has_the_model_fields():
+    model = _status()
+    slotted = SlottedPaymentStatusModel.from_model(model)
+
+    assert [f.name for f in fields(SlottedPaymentStatusModel)] == [f.name for f in fields(PaymentStatusModel)]
+    assert SlottedPaymentStatusModel.__slots__ == tuple(f.name for f in fields(PaymentStatusModel))
+    assert not hasattr(slotted, '__dict__')
+    assert slotted.to_model() == model
+    assert slotted.is_terminal()
+
+
+def test_slotted_variant_keeps_defaults():
+    @dataclass
+    class Model:
+        name: str
+        amount: float = 0.0
+        tags: List[str] = field(default_factory=list)
+
+    @slotted_variant(Model)
+    class SlottedModel:
+        pass
+
+    first, second = SlottedModel('a'), SlottedModel('b')
+    first.tags.append('x')
+    assert (first.amount, first.tags, second.tags) == (0.0, ['x'], [])
+    assert SlottedModel.from_model(Model('c', 1.5)).to_model() == Model('c', 1.5)
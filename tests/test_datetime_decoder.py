@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+
+from datetime_decoder import DatetimeDecoder
+from models.payment_status_model import PaymentStatusModel
+
+
+def _record(**dates):
+    return dict({'ptn': 'ptn-1', 'timestamp': None, 'clearingDate': None}, **dates)
+
+
+def test_formats_with_zone_suffix_or_offset_are_timezone_aware():
+    decoder = DatetimeDecoder()
+
+    assert decoder.decode('2024-03-01T12:30:00Z') == datetime(2024, 3, 1, 12, 30, tzinfo=timezone.utc)
+    assert decoder.decode('2024-03-01T12:30:00+01:00') == \
+        datetime(2024, 3, 1, 12, 30, tzinfo=timezone(timedelta(hours=1)))
+    assert decoder.decode('2024-03-01 12:30:00') == datetime(2024, 3, 1, 12, 30)
+
+
+def test_learned_format_is_tried_first_and_falls_back_when_it_stops_matching():
+    decoder = DatetimeDecoder(formats=('iso', '%d/%m/%Y %H:%M', '%d.%m.%Y'))
+
+    record = decoder.decode_record(_record(timestamp='01/03/2024 12:30'), PaymentStatusModel)
+    assert record['timestamp'] == datetime(2024, 3, 1, 12, 30)
+    assert decoder.preferred_formats() == {'PaymentStatusModel.timestamp': '%d/%m/%Y %H:%M'}
+
+    record = decoder.decode_record(_record(timestamp='02/03/2024 08:00'), PaymentStatusModel)
+    assert record['timestamp'] == datetime(2024, 3, 2, 8, 0)
+
+    # The learned format no longer matches: the others are searched and the new match is remembered
+    record = decoder.decode_record(_record(timestamp='04.03.2024'), PaymentStatusModel)
+    assert record['timestamp'] == datetime(2024, 3, 4)
+    assert decoder.preferred_formats()['PaymentStatusModel.timestamp'] == '%d.%m.%Y'
+
+    record = decoder.decode_record(_record(timestamp='2024-03-05T00:00:00'), PaymentStatusModel)
+    assert record['timestamp'] == datetime(2024, 3, 5)
+
+
+def test_formats_are_learned_per_field():
+    decoder = DatetimeDecoder(formats=('iso', '%d/%m/%Y'))
+
+    decoder.decode_record(_record(timestamp='2024-03-01T12:30:00', clearingDate='01/03/2024'), PaymentStatusModel)
+    assert decoder.preferred_formats() == {'PaymentStatusModel.clearingDate': '%d/%m/%Y'}
+
+
+def test_empty_and_unparseable_values_become_none(caplog):
+    decoder = DatetimeDecoder()
+
+    record = decoder.decode_record(_record(timestamp='', clearingDate='not a date'), PaymentStatusModel)
+    assert record['timestamp'] is None
+    assert record['clearingDate'] is None
+    assert record['ptn'] == 'ptn-1'
+    assert "not a date" in caplog.text
+    assert decoder.decode('not a date', 'PaymentStatusModel.clearingDate') is None
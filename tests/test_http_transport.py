@@ -0,0 +1,85 @@
+import types
+
+import pytest
+import requests
+
+from http_transport import HttpTransport
+
+API_URL = 'http://s3p.test/v2'
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _transport(responses, config=None, retry_endpoints=('verifytx',)):
+    transport = HttpTransport(base_url=API_URL, retry_endpoints=retry_endpoints, max_retries=2,
+                              retry_base_delay=0, retry_max_delay=0, config=config)
+    sent = []
+
+    def request(method, url, **kwargs):
+        sent.append((method, url, dict(kwargs.get('headers') or {})))
+        response = responses.pop(0)
+        if isinstance(response, BaseException):
+            raise response
+        return response
+
+    transport.session.request = request
+    return transport, sent
+
+
+def _signer():
+    count = iter(range(1, 100))
+    return lambda: f"s3pAuth nonce={next(count)}"
+
+
+def test_retried_get_is_signed_again():
+    sign = _signer()
+    transport, sent = _transport([FakeResponse(503), requests.ConnectionError('reset'), FakeResponse(200)])
+    response = transport.get(f"{API_URL}/verifytx", headers={'Authorization': sign()}, sign=sign)
+    assert response.status_code == 200
+    assert [headers['Authorization'] for _, _, headers in sent] == [
+        's3pAuth nonce=1', 's3pAuth nonce=2', 's3pAuth nonce=3'
+    ]
+    assert transport.pool_stats()['retries'] == 2
+
+
+def test_gives_up_after_max_retries():
+    sign = _signer()
+    transport, sent = _transport([FakeResponse(503), FakeResponse(503), FakeResponse(503)])
+    response = transport.get(f"{API_URL}/verifytx", headers={'Authorization': sign()}, sign=sign)
+    assert response.status_code == 503
+    assert len(sent) == 3
+
+
+def test_not_retried_without_sign():
+    transport, sent = _transport([FakeResponse(503), FakeResponse(200)])
+    assert transport.get(f"{API_URL}/verifytx", headers={'Authorization': 'once'}).status_code == 503
+    assert len(sent) == 1
+
+
+def test_money_moving_endpoints_are_never_retried():
+    transport, sent = _transport([requests.ConnectionError('reset'), FakeResponse(200)],
+                                 retry_endpoints=('verifytx', 'collectstd'))
+    with pytest.raises(requests.ConnectionError):
+        transport.get(f"{API_URL}/collectstd", sign=_signer())
+    assert len(sent) == 1
+
+
+def test_interrupted_call_releases_the_probe():
+    config = types.SimpleNamespace(circuit_failure_threshold=1, circuit_recovery_timeout=0)
+    transport, sent = _transport([requests.ConnectionError('reset'), KeyboardInterrupt(), FakeResponse(200)],
+                                 config=config)
+    # An endpoint of its own, so the process-wide breaker is not shared with other tests
+    url = f"{API_URL}/probe-release"
+    with pytest.raises(requests.ConnectionError):
+        transport.get(url)
+    with pytest.raises(KeyboardInterrupt):
+        transport.get(url)
+    assert transport.get(url).status_code == 200
+    assert len(sent) == 3
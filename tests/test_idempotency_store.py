@@ -0,0 +1,154 @@
+import sqlite3
+
+import pytest
+
+from idempotency_store import IdempotencyStore, IdempotencyStoreError
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'idempotency.db')
+
+
+def _store(clock, path=None, **kwargs):
+    kwargs.setdefault('ttl', 3600)
+    kwargs.setdefault('claim_timeout', 120)
+    return IdempotencyStore(path=path, clock=clock, **kwargs)
+
+
+def _stored_keys(path):
+    with sqlite3.connect(path) as connection:
+        return sorted(key for key, in connection.execute("SELECT key FROM idempotency_keys"))
+
+
+def test_claim_states(clock):
+    store = _store(clock)
+    assert store.claim('trid-1', 'fp').state == IdempotencyStore.OWNER
+    waiting = store.claim('trid-1', 'fp')
+    assert waiting.state == IdempotencyStore.IN_FLIGHT
+    assert store.claim('trid-1', 'other').state == IdempotencyStore.CONFLICT
+
+    store.complete('trid-1', {'status': 'success'})
+    assert waiting.future.result(timeout=1) == {'status': 'success'}
+    done = store.claim('trid-1', 'fp')
+    assert (done.state, done.result) == (IdempotencyStore.DONE, {'status': 'success'})
+    assert store.claim('trid-1', 'other').state == IdempotencyStore.CONFLICT
+
+    clock.now += 3601
+    assert store.claim('trid-1', 'other').state == IdempotencyStore.OWNER
+
+
+@pytest.mark.parametrize('durable', [False, True])
+def test_released_key_can_be_claimed_again(clock, path, durable):
+    store = _store(clock, path if durable else None)
+    assert store.claim('trid-1', 'fp').state == IdempotencyStore.OWNER
+    waiting = store.claim('trid-1', 'fp')
+    store.release('trid-1')
+    assert waiting.future.result(timeout=1) is None
+    assert store.claim('trid-1', 'fp').state == IdempotencyStore.OWNER
+
+
+def test_finished_result_survives_a_restart(clock, path):
+    first = _store(clock, path)
+    assert first.claim('trid-1', 'fp').state == IdempotencyStore.OWNER
+    first.complete('trid-1', {'status': 'success'})
+
+    restarted = _store(clock, path)
+    claim = restarted.claim('trid-1', 'fp')
+    assert (claim.state, claim.result) == (IdempotencyStore.DONE, {'status': 'success'})
+    assert restarted.claim('trid-1', 'other').state == IdempotencyStore.CONFLICT
+
+
+def test_pending_claim_is_taken_over_after_claim_timeout(clock, path):
+    dead = _store(clock, path)
+    assert dead.claim('trid-1', 'fp').state == IdempotencyStore.OWNER
+    other = _store(clock, path)
+    assert other.claim('trid-1', 'fp').state == IdempotencyStore.IN_PROGRESS
+
+    clock.now += 121
+    assert other.claim('trid-1', 'fp').state == IdempotencyStore.OWNER
+    with pytest.raises(IdempotencyStoreError):
+        dead.mark('trid-1')
+    other.mark('trid-1')
+
+    # The first owner's late result must not replace the row of the one that took over
+    dead.complete('trid-1', {'status': 'error', 'message': 'late'})
+    other.complete('trid-1', {'status': 'success'})
+    claim = _store(clock, path).claim('trid-1', 'fp')
+    assert (claim.state, claim.result) == (IdempotencyStore.DONE, {'status': 'success'})
+
+
+def test_late_complete_leaves_the_new_claim_in_progress(clock, path):
+    dead = _store(clock, path)
+    dead.claim('trid-1', 'fp')
+    clock.now += 121
+    other = _store(clock, path)
+    assert other.claim('trid-1', 'fp').state == IdempotencyStore.OWNER
+
+    dead.complete('trid-1', {'status': 'error', 'message': 'late'})
+    assert _store(clock, path).claim('trid-1', 'fp').state == IdempotencyStore.IN_PROGRESS
+
+
+def test_marked_claim_is_never_taken_over_before_ttl(clock, path):
+    crashed = _store(clock, path)
+    crashed.claim('trid-1', 'fp')
+    crashed.mark('trid-1')
+
+    clock.now += 3599
+    assert _store(clock, path).claim('trid-1', 'fp').state == IdempotencyStore.IN_PROGRESS
+    clock.now += 2
+    assert _store(clock, path).claim('trid-1', 'fp').state == IdempotencyStore.OWNER
+
+
+def test_marked_claim_completes(clock, path):
+    store = _store(clock, path)
+    store.claim('trid-1', 'fp')
+    clock.now += 1
+    store.mark('trid-1')
+    clock.now += 1
+    store.complete('trid-1', {'status': 'success'})
+    claim = _store(clock, path).claim('trid-1', 'fp')
+    assert (claim.state, claim.result) == (IdempotencyStore.DONE, {'status': 'success'})
+
+
+def test_mark_without_file_is_a_no_op(clock):
+    store = _store(clock)
+    store.claim('trid-1', 'fp')
+    store.mark('trid-1')
+
+
+def test_purge_by_age(clock, path):
+    store = _store(clock, path)
+    store.PURGE_EVERY = 1
+    for key in ('old', 'new'):
+        store.claim(key, 'fp')
+        store.complete(key, {'status': 'success'})
+        clock.now += 3000
+    store.claim('newest', 'fp')
+    store.complete('newest', {'status': 'success'})
+    assert _stored_keys(path) == ['new', 'newest']
+
+
+def test_purge_by_size(clock, path):
+    store = _store(clock, path, max_stored=2)
+    store.PURGE_EVERY = 1
+    store.claim('pending', 'fp')
+    for key in ('a', 'b', 'c'):
+        clock.now += 1
+        store.claim(key, 'fp')
+        store.complete(key, {'status': 'success'})
+    # Only finished rows are purged; a live claim is kept whatever its age
+    assert _stored_keys(path) == ['b', 'c', 'pending']
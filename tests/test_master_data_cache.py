@@ -0,0 +1,80 @@
+import time
+
+from models.service_model import ServiceModel
+from services.master_data_cache import MasterDataCache
+from services.service_api import ServiceApi
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class StubServiceApi:
+    def __init__(self):
+        self.calls = []
+        self.services = [_service(20053)]
+
+    def fetch_services(self):
+        self.calls.append('services')
+        return list(self.services)
+
+    def fetch_service_by_id(self, service_id):
+        self.calls.append(service_id)
+        for service in self.services:
+            if service.serviceid == service_id:
+                return service
+        return ServiceApi.SERVICE_NOT_FOUND
+
+
+def _service(service_id, title='Service'):
+    return ServiceModel(
+        serviceid=service_id, merchant='MTNMOMO', title=title, description='', category='', country='CM',
+        localCur='XAF', type='CASHIN', status='ACTIVE', isReqCustomerName=False, isReqCustomerAddress=False,
+        isReqCustomerNumber=True, isReqServiceNumber=True, isVerifiable=False, validationMask='', denomination=0
+    )
+
+
+def _cache(service_api, clock):
+    return MasterDataCache(service_api=service_api, ttls={'service': 60}, clock=clock)
+
+
+def test_read_through_serves_from_memory():
+    service_api, clock = StubServiceApi(), FakeClock()
+    cache = _cache(service_api, clock)
+
+    assert cache.fetch_services()[0].serviceid == 20053
+    assert cache.fetch_services()[0].serviceid == 20053
+    assert cache.get_service(20053).serviceid == 20053
+    assert service_api.calls == ['services']
+
+
+def test_expired_entry_is_served_stale_and_refreshed_in_background():
+    service_api, clock = StubServiceApi(), FakeClock()
+    cache = _cache(service_api, clock)
+    cache.fetch_services()
+    service_api.services = [_service(20053, title='Renamed')]
+
+    clock.now += 61
+    assert cache.fetch_services()[0].title == 'Service'
+    deadline = time.monotonic() + 5
+    while service_api.calls.count('services') < 2 or cache.fetch_services()[0].title != 'Renamed':
+        assert time.monotonic() < deadline, "background refresh did not happen"
+        time.sleep(0.01)
+    assert cache.get_service(20053).title == 'Renamed'
+
+
+def test_missing_service_is_negatively_cached():
+    service_api, clock = StubServiceApi(), FakeClock()
+    cache = _cache(service_api, clock)
+
+    assert cache.get_service(99999) is None
+    assert cache.get_service(99999) is None
+    assert service_api.calls.count(99999) == 1
+
+    clock.now += cache.negative_ttl + 1
+    assert cache.get_service(99999) is None
+    assert service_api.calls.count(99999) == 2
@@ -0,0 +1,56 @@
+from services.reconciliation_service import ReconciliationService
+
+UPSTREAM = [
+    {'trid': 'order-1', 'ptn': 'ptn-1', 'priceLocalCur': 100, 'localCur': 'XAF', 'status': 'SUCCESS'},
+    {'trid': 'order-2', 'ptn': 'ptn-2a', 'priceLocalCur': 200, 'localCur': 'XAF', 'status': 'ERRORED'},
+    {'trid': 'order-2', 'ptn': 'ptn-2b', 'priceLocalCur': 200, 'localCur': 'XAF', 'status': 'SUCCESS'},
+    {'trid': 'order-3', 'ptn': 'ptn-3', 'priceLocalCur': 300, 'localCur': 'XAF', 'status': 'SUCCESS'},
+    {'trid': 'order-4', 'ptn': 'ptn-4', 'priceLocalCur': 400, 'localCur': 'XAF', 'status': 'SUCCESS'},
+    {'trid': None, 'ptn': 'ptn-5', 'priceLocalCur': 500, 'localCur': 'XAF', 'status': 'SUCCESS'},
+    {'trid': 'order-9', 'ptn': 'ptn-9', 'priceLocalCur': 900, 'localCur': 'XAF', 'status': 'SUCCESS'},
+]
+
+LOCAL = [
+    {'trid': 'order-1', 'amount': 100, 'currency': 'XAF', 'status': 'SUCCESS'},
+    {'trid': 'order-2', 'amount': 200, 'currency': 'XAF', 'status': 'SUCCESS'},
+    {'trid': 'order-3', 'amount': 350, 'currency': 'XAF', 'status': 'SUCCESS'},
+    # Only the ptn is known locally; upstream has a trid for it
+    {'ptn': 'ptn-4', 'amount': 400, 'currency': 'XAF', 'status': 'SUCCESS'},
+    # Our trid differs from the one upstream, but the ptn matches
+    {'trid': 'order-5', 'ptn': 'ptn-5', 'amount': 500, 'currency': 'XAF', 'status': 'SUCCESS'},
+    {'trid': 'order-6', 'amount': 600, 'currency': 'XAF', 'status': 'SUCCESS'},
+]
+
+EXPECTED = sorted([
+    ('matched', 'order-1'),
+    ('matched', 'order-2'),
+    ('mismatched', 'order-3'),
+    ('matched', 'ptn-4'),
+    ('matched', 'order-5'),
+    ('missing_upstream', 'order-6'),
+    ('missing_local', 'order-9'),
+])
+
+
+def _outcomes(results):
+    return sorted((result.outcome, result.key) for result in results)
+
+
+def test_local_record_with_only_a_ptn_matches_upstream_record_with_a_trid():
+    service = ReconciliationService()
+    results = list(service.reconcile(LOCAL, UPSTREAM))
+
+    assert _outcomes(results) == EXPECTED
+    by_key = {result.key: result for result in results}
+    assert by_key['order-2'].upstream['ptn'] == 'ptn-2b'
+    assert by_key['order-3'].differences == ['amount']
+    assert by_key['ptn-4'].upstream['trid'] == 'order-4'
+
+
+def test_partitioned_join_gives_the_same_results():
+    in_memory = ReconciliationService()
+    partitioned = ReconciliationService(max_in_memory=2, partitions=3)
+
+    expected = sorted(repr(result.to_dict()) for result in in_memory.reconcile(LOCAL, UPSTREAM))
+    assert sorted(repr(result.to_dict()) for result in partitioned.reconcile(LOCAL, UPSTREAM)) == expected
+    assert _outcomes(partitioned.reconcile(LOCAL, UPSTREAM)) == EXPECTED
@@ -0,0 +1,77 @@
+import logging
+
+import pytest
+
+import sdk_logging
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    configured = getattr(root, '_smobilpay_logging_configured', False)
+    for handler in handlers:
+        root.removeHandler(handler)
+    root._smobilpay_logging_configured = False
+    root.setLevel(logging.INFO)
+    yield root
+    sdk_logging.stop_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+    root._smobilpay_logging_configured = configured
+
+
+def test_redact_masks_signatures_headers_and_secrets():
+    text = ('Authorization: s3pAuth_signature="sig-value", s3pAuth_token="token-value" '
+            "{'Authorization': 'raw'} Bearer xyz key=my-key")
+    redacted = sdk_logging.redact(text, secrets=('my-key',))
+    for value in ('sig-value', 'token-value', 'raw', 'xyz', 'my-key'):
+        assert value not in redacted
+
+
+@pytest.mark.parametrize('use_queue', [True, False])
+def test_records_are_redacted_for_every_handler(root_logger, use_queue):
+    output = ListHandler()
+    root_logger.addHandler(output)
+    sdk_logging.configure_logging(use_queue=use_queue, secrets=('api-secret',))
+
+    logging.getLogger('smobilpay.test').info("Signing with %s", 'api-secret')
+    sdk_logging.stop_logging()
+
+    assert output.messages == ["Signing with ***"]
+
+
+def test_queued_records_are_redacted_before_they_are_enqueued(root_logger):
+    root_logger.addHandler(ListHandler())
+    sdk_logging.configure_logging(use_queue=True, secrets=('api-secret',))
+    sdk_logging.stop_logging()
+    queue_handler = root_logger.handlers[0]
+
+    logging.getLogger('smobilpay.test').info("Signing with %s", 'api-secret')
+
+    record = queue_handler.queue.get_nowait()
+    assert record.getMessage() == "Signing with ***"
+
+
+def test_request_records_are_sampled(root_logger):
+    output = ListHandler()
+    root_logger.addHandler(output)
+    sdk_logging.configure_logging(use_queue=False, request_sample_rate=0)
+
+    sdk_logging.request_logger.info("sampled out")
+    sdk_logging.request_logger.warning("kept")
+    logging.getLogger('smobilpay.test').info("other logger")
+
+    assert output.messages == ["kept", "other logger"]
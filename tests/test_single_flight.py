@@ -0,0 +1,38 @@
+import asyncio
+
+from single_flight import AsyncSingleFlight
+
+
+def test_async_calls_share_one_task():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return ['status']
+
+    async def main():
+        single_flight = AsyncSingleFlight()
+        results = await asyncio.gather(*(single_flight.do('key', fetch) for _ in range(5)))
+        return single_flight, results
+
+    single_flight, results = asyncio.run(main())
+    assert results == [['status']] * 5
+    assert len(calls) == 1
+    assert single_flight.in_flight() == 0
+
+
+def test_async_cancelled_caller_does_not_cancel_the_others():
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return 'result'
+
+    async def main():
+        single_flight = AsyncSingleFlight()
+        first = asyncio.ensure_future(single_flight.do('key', fetch))
+        second = asyncio.ensure_future(single_flight.do('key', fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(main()) == ('result', True)
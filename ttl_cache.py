@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    expires_at: float
+    stale_until: float
+
+    def is_fresh(self, now):
+        return now < self.expires_at
+
+    def is_usable(self, now):
+        return now < self.stale_until
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory cache with per-entry TTLs and optional LRU bound.
+
+    Each entry is fresh until its TTL elapses and may then be served as stale
+    for stale_ttl more seconds while the owner refreshes it. When maxsize is
+    set, the least recently used entry is evicted once the cache is full.
+    """
+
+    def __init__(self, maxsize=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_entry(self, key) -> Optional[CacheEntry]:
+        """
+        Return the entry for key, or None if it is missing or past its stale window.
+        """
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not entry.is_usable(now):
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def get(self, key, default=None):
+        """
+        Return the cached value if it is still fresh, otherwise default.
+        """
+        entry = self.get_entry(key)
+        if entry is None or not entry.is_fresh(self.clock()):
+            return default
+        return entry.value
+
+    def set(self, key, value, ttl, stale_ttl=0):
+        now = self.clock()
+        entry = CacheEntry(value=value, expires_at=now + ttl, stale_until=now + ttl + stale_ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return entry.value if entry is not None else default
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}